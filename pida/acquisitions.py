@@ -5,8 +5,54 @@ de alguna de las interfaces de adquisición de datos
 disponibles.
 """
 from abc import ABCMeta, abstractmethod
-from threading import Thread, Lock
-from pida.clock import time, sleep
+from threading import Thread, Lock, Event, Condition
+from collections import deque, namedtuple
+import multiprocessing
+import ctypes
+import mmap
+from pida.clock import time, sleep, time_ns, sleep_until_ns
+from pida.buffers import SampleBuffer, SharedSampleBuffer, DEFAULT_CAPACITY
+from pida.statistics import TimingStatistics, ChannelStatistics
+from pida.timers import PrecisionTimer, default_timer
+from pida.realtime import RealtimeProfile
+from pida.decimation import Decimator
+from pida.sinks import Sink
+try:
+    from pida.sampling import sample
+except ImportError:
+    sample = None
+
+NATIVE_BLOCK_TIME = 0.1
+"""Tiempo máximo en segundos que el motor de muestreo nativo trabaja sin
+devolver el control a Python. Acota el retardo con el que se atiende
+:meth:`Acquisition.stop`."""
+
+NATIVE_BLOCK_SIZE = 1000
+"""Número de muestras que toma el motor de muestreo nativo en cada bloque
+cuando se muestrea a la máxima tasa posible."""
+
+TRIGGER_BLOCK_SIZE = 256
+"""Número máximo de muestras nuevas tras las que una
+:class:`TriggeredAcquisition` evalúa su condición de disparo. Acota el
+retardo con el que se detecta cada disparo."""
+
+DEFAULT_MAX_CAPTURES = 16
+"""Número máximo por defecto de capturas que conserva una
+:class:`TriggeredAcquisition`."""
+
+EDGE_POLL_TIME = 0.1
+"""Tiempo máximo en segundos de cada espera de un flanco de GPIO. Acota el
+retardo con el que se atiende :meth:`Acquisition.stop` mientras se espera
+un flanco."""
+
+PROCESS_POLL_TIME = 0.01
+"""Intervalo en segundos con el que el proceso principal de una
+:class:`ProcessAcquisition` comprueba si el proceso hijo ha tomado
+muestras nuevas. Acota el retardo con el que se entregan a los lectores,
+a las esperas y a las funciones de bloque del proceso principal."""
+
+# Sample count of a publication that is never due
+_NEVER = float('inf')
 
 class Acquisition(Thread):
     """Clase base abstracta para controlar una adquisición de datos.
@@ -15,6 +61,25 @@ class Acquisition(Thread):
         cual se toman los datos.
     :param max_count: Número máximo de muestras a tomar en la
         adquisición. El valor por defecto (0) indica que no hay límite.
+    :param capacity: Número máximo de muestras que se conservan en
+        memoria. Cuando se alcanza, cada nueva muestra sobrescribe la más
+        antigua. El valor por defecto (0) reserva espacio para
+        :attr:`max_count` muestras, hasta un máximo de
+        :data:`pida.buffers.DEFAULT_CAPACITY` muestras; en adquisiciones
+        más largas sólo se conservan las últimas. Toda la memoria se
+        reserva al crear la adquisición, por lo que una capacidad
+        explícita muy grande puede elevar :exc:`MemoryError`.
+    :param sinks: Lista de sumideros (:class:`pida.sinks.Sink`) a los que
+        se envían las muestras a medida que se toman, en bloques de
+        :attr:`pida.sinks.Sink.chunk_size` muestras.
+    :param nanoseconds: Si es verdadero, los instantes de las muestras se
+        guardan como enteros en nanosegundos (ver
+        :class:`pida.buffers.SampleBuffer`).
+    :param realtime: Perfil de tiempo real
+        (:class:`pida.realtime.RealtimeProfile`) que se aplica al hilo de
+        la adquisición al comenzar. Si es ``True`` se usa el perfil por
+        defecto. Si el perfil no puede aplicarse se emite un aviso y la
+        adquisición continúa sin él.
 
     .. method:: start()
     
@@ -22,17 +87,39 @@ class Acquisition(Thread):
     """
     __metaclass__ = ABCMeta
 
-    def __init__(self, channel=None, max_count=0):
+    def __init__(self, channel=None, max_count=0, capacity=0, sinks=None, nanoseconds=False,
+                 realtime=None):
         Thread.__init__(self)
         self._channel = None
         self._max_count = 0
         self.channel = channel
         self.max_count = max_count
-        self._data = []
+        if capacity < 0:
+            raise ValueError("Positive number expected")
+        self._nanoseconds = nanoseconds
+        if realtime is True:
+            realtime = RealtimeProfile()
+        self._realtime = realtime or None
+        self._data = self._new_buffer(capacity or min(self._max_count or DEFAULT_CAPACITY,
+                                                      DEFAULT_CAPACITY))
+        self._sinks = list(sinks or [])
+        # Count of the first sample not yet handed to each sink
+        self._sink_positions = [0] * len(self._sinks)
+        # Publish at least every _chunk_size samples, for the acquisition itself
+        self._chunk_size = 0
+        self._published = 0
+        # Counts of samples awaited by Reader.wait
+        self._wait_targets = []
+        # Count of samples at which the sampling loop has to publish next
+        self._due = _NEVER
+        # Notified whenever new samples are published and at the end
+        self._data_condition = Condition()
+        self._schedule()
         self._status = 'waiting'
         self._elapsed_time = 0.0
         self._running = True
         self._start_time = 0.0
+        self._start_ns = 0
         # Lock to access start_time
         self.start_time_lock = Lock()
         """Cierre de exclusión mútua para acceder a :attr:`start_time`. El
@@ -44,6 +131,9 @@ class Acquisition(Thread):
 
         self.LOCK = Lock()
 
+    def _new_buffer(self, capacity):
+        return SampleBuffer(capacity, nanoseconds=self._nanoseconds)
+
     # Channel
     @property
     def channel(self):
@@ -83,15 +173,194 @@ class Acquisition(Thread):
     def max_count(self):
         raise AttributeError("Can't delete attribute")
 
+    # Capacity
+    @property
+    def capacity(self):
+        """Número máximo de muestras que se conservan en memoria.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._data.capacity
+
+    # Channels
+    @property
+    def channels(self):
+        """Lista de canales de los que se toman las muestras, en el orden
+        de las columnas de los datos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return [self._channel]
+
+    # Realtime
+    @property
+    def realtime(self):
+        """Perfil de tiempo real que se aplica al hilo de la adquisición, o
+        ``None`` si no se aplica ninguno.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._realtime
+
+    def _apply_realtime(self):
+        if self._realtime is not None:
+            self._realtime.try_apply()
+
+    # Sinks
+    @property
+    def sinks(self):
+        """Lista de sumideros a los que se envían las muestras.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._sinks)
+
+    def _open_sinks(self):
+        for sink in self._sinks:
+            sink.open(self)
+
+    def _publish(self, flush=False):
+        # Hand every sink the samples taken since its last block, once it
+        # has a complete chunk or when flushing, and wake up the waiters
+        data = self._data
+        count = data.count
+        for index, sink in enumerate(self._sinks):
+            position = self._sink_positions[index]
+            if count - position >= sink.chunk_size or (flush and count > position):
+                self._sink_positions[index] = count
+                sink.write(data.view_since(position))
+        self._published = count
+        with self._data_condition:
+            self._schedule()
+            self._data_condition.notify_all()
+
+    def _close_sinks(self):
+        self._publish(flush=True)
+        for sink in self._sinks:
+            sink.close()
+
+    def _notify(self):
+        with self._data_condition:
+            self._data_condition.notify_all()
+
+    def _schedule(self):
+        # Update the count of samples at which the next block of a sink,
+        # the next evaluation of the acquisition or a waiter is due. Must
+        # be called with _data_condition held
+        due = [position + sink.chunk_size
+               for sink, position in zip(self._sinks, self._sink_positions)]
+        due.extend(self._wait_targets)
+        if self._chunk_size:
+            due.append(self._published + self._chunk_size)
+        self._due = min(due or [_NEVER])
+
+    def _request_chunk(self, n_count):
+        # Publish at least every n_count samples from now on
+        with self._data_condition:
+            self._chunk_size = int(n_count)
+            self._schedule()
+
+    def _await(self, target):
+        # Register a waiter for the first target samples; call with
+        # _data_condition held and release with _release
+        self._wait_targets.append(target)
+        self._schedule()
+
+    def _release(self, target):
+        self._wait_targets.remove(target)
+        self._schedule()
+
+    def on_block(self, n_count, callback):
+        """Registra una función que se invoca cada vez que se toman
+        ``n_count`` muestras nuevas, con una vista
+        (:class:`pida.buffers.SampleView`) de esas muestras con el mismo
+        formato que :meth:`get_data`.
+
+        La función se invoca desde el hilo de la adquisición, por lo que
+        no debe bloquearse. Si se registra con la adquisición en marcha,
+        recibe las muestras tomadas a partir de ese momento. Las últimas
+        muestras que no completan un bloque no se entregan.
+
+        :param n_count: Número de muestras de cada bloque.
+        :param callback: Función que recibe cada bloque.
+        """
+        if n_count <= 0:
+            raise ValueError("Positive number expected")
+        return self._add_sink(_BlockCallback(n_count, callback))
+
+    def running_statistics(self, window=0):
+        """Devuelve un objeto (:class:`pida.statistics.ChannelStatistics`)
+        que mantiene la media, el valor cuadrático medio, la desviación
+        típica, el mínimo y el máximo en voltios de cada canal, acumulados
+        y en una ventana deslizante, sin copiar las muestras.
+
+        Si se invoca con la adquisición en marcha, las estadísticas
+        comienzan con las muestras tomadas a partir de ese momento.
+
+        :param window: Número de muestras de la ventana deslizante. El
+            valor por defecto 0 sólo mantiene las estadísticas acumuladas.
+        """
+        return self._add_sink(ChannelStatistics(window))
+
+    def _add_sink(self, sink):
+        # Add a sink once the acquisition may have started
+        if self._status != 'waiting':
+            sink.open(self)
+        with self._data_condition:
+            self._sink_positions.append(self._data.count)
+            self._sinks.append(sink)
+            self._schedule()
+        return sink
+
     # Data
+    @property
+    def count(self):
+        """Número total de muestras tomadas, incluidas las que ya no se
+        conservan en memoria.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._data.count
+
+    def _converters(self):
+        # Conversion from codes to volts of each column
+        return self._channel.to_volts
+
     def get_data(self, n_count=0):
-        """Devuelve una lista con los últimos datos adquiridos.
+        """Devuelve los últimos datos adquiridos como una secuencia cuyos
+        elementos son listas ``[elapsed_time, value]``.
 
-        :param n_count: Número de muestras a incluir en la lista
+        El resultado es una vista (:class:`pida.buffers.SampleView`) que no
+        copia las muestras, por lo que su coste no depende del número de
+        muestras devueltas.
+
+        :param n_count: Número de muestras a incluir en la secuencia
             devuelta. El valor por defecto 0 incluye todos los datos
-            adquiridos hasta ese momento.
+            conservados hasta ese momento.
+        """
+        return self._data.view(n_count, self._converters())
+
+    def get_data_since(self, position):
+        """Devuelve, con el formato de :meth:`get_data`, las muestras
+        tomadas a partir de la muestra número ``position`` (ver
+        :attr:`count`). Si alguna ya no se conserva en memoria, el
+        resultado empieza en la más antigua conservada (ver
+        :attr:`pida.buffers.SampleView.start`).
+
+        Su coste no depende del número de muestras devueltas.
+
+        :param position: Número de la primera muestra a devolver.
+        """
+        return self._data.view_since(position, self._converters())
+
+    def reader(self, position=0):
+        """Devuelve un lector (:class:`Reader`) que recorre las muestras
+        de la adquisición a medida que se toman.
+
+        :param position: Número de la primera muestra que se lee. El valor
+            por defecto 0 comienza por la muestra más antigua conservada.
         """
-        return self._data[-n_count:]
+        return Reader(self, position)
 
     def print_data(self, n_count=0):
         """Escribe en pantalla un listado de los últimos datos adquiridos.
@@ -100,9 +369,9 @@ class Acquisition(Thread):
             valor por defecto 0 incluye todos los datos adquiridos hasta
             ese momento.
         """
-        print "Elapsed Time\tValue"
-        for [elapsed_time, adc_value] in self.get_data(n_count):
-            print "{:.6f}".format(elapsed_time) + "\t" + str(adc_value)
+        print "\t".join(["Elapsed Time"] + ["Value"] * self._data.width)
+        for row in self.get_data(n_count):
+            print "\t".join(["{:.6f}".format(row[0])] + [str(value) for value in row[1:]])
 
     # Status
     @property
@@ -167,6 +436,20 @@ class Acquisition(Thread):
         """Detiene la adquisición de datos."""
         self._running = False
 
+def _group_channels(channels):
+    # List of (converter, converter channels, columns) of the channels,
+    # grouped by converter so that each group is read in one batch
+    groups = []
+    for column, channel in enumerate(channels):
+        for converter, converter_channels, columns in groups:
+            if converter is channel.converter:
+                converter_channels.append(channel.converter_channel)
+                columns.append(column)
+                break
+        else:
+            groups.append((channel.converter, [channel.converter_channel], [column]))
+    return groups
+
 class SynchronousAcquisition(Acquisition):
     """Gestiona una adquisición de datos síncrona en la que a través de un canal
     de una interfaz de adquisición de datos se toman valores con una frecuencia
@@ -179,13 +462,69 @@ class SynchronousAcquisition(Acquisition):
     :param sampling_rate: Frecuencia de muestreo en hertzios. El valor
         por defecto (0) provoca que las muestras se tomen a la máxima
         tasa posible.
+    :param capacity: Número máximo de muestras que se conservan en
+        memoria (ver :class:`Acquisition`).
+    :param native: Si es verdadero (valor por defecto) y el canal lo
+        permite (ver :meth:`pida.interfaces.InputChannel.sampling_source`),
+        el bucle de muestreo se ejecuta en código nativo
+        (:mod:`pida.sampling`) sin retener el GIL. El enlace de datos se
+        reserva durante cada bloque de muestras (ver
+        :meth:`pida.links.FullDuplexDataLink.acquire`), por lo que otros
+        usuarios del enlace esperan entre bloques.
+    :param sinks: Lista de sumideros a los que se envían las muestras
+        (ver :class:`Acquisition`).
+    :param nanoseconds: Si es verdadero, los instantes de las muestras se
+        guardan y calculan como enteros en nanosegundos (ver
+        :class:`Acquisition`).
+    :param precise: Si es verdadero, las esperas entre muestras se hacen
+        con el temporizador de precisión compartido
+        (:func:`pida.timers.default_timer`), cuyo margen se calibra al
+        comenzar la primera adquisición que lo usa. También puede ser un
+        :class:`pida.timers.PrecisionTimer` con un margen concreto.
+    :param realtime: Perfil de tiempo real del hilo de muestreo (ver
+        :class:`Acquisition`).
+    :param decimation: Etapa de diezmado (:class:`pida.decimation.Decimator`),
+        o número de conversiones que se promedian en cada muestra. Las
+        conversiones de cada muestra se leen en una única transferencia
+        por lotes, por lo que la frecuencia de conversión es
+        :attr:`conversion_rate`. Las adquisiciones con diezmado no usan el
+        bucle de muestreo nativo.
+    :param arm: GPIO (:class:`pida.gpio.GPIO`) cuyo siguiente flanco
+        (ver :attr:`pida.gpio.GPIO.edge`) comienza la adquisición. El
+        instante del flanco es el origen de tiempos de las muestras, lo
+        que permite alinear adquisiciones con una señal de sincronismo
+        externa. Mientras se espera el flanco el estado sigue siendo
+        ``'waiting'``.
+    :param external_clock: GPIO cuyos flancos marcan los instantes de
+        muestreo en lugar de ``sampling_rate``: cada flanco provoca la
+        lectura de una muestra, cuyo tiempo es el del flanco. Los flancos
+        que llegan mientras se lee una muestra se pierden.
+
+    Durante la adquisición se registra la temporización de cada muestra
+    (ver :attr:`timing`), lo que permite comprobar si la frecuencia de
+    muestreo solicitada puede mantenerse.
     """
 
-    def __init__(self, channel=None, max_count=0, sampling_rate=0):
-        Acquisition.__init__(self, channel, max_count)
+    def __init__(self, channel=None, max_count=0, sampling_rate=0, capacity=0, native=True,
+                 sinks=None, nanoseconds=False, precise=False, realtime=None, decimation=None,
+                 arm=None, external_clock=None):
+        if decimation is not None and not isinstance(decimation, Decimator):
+            decimation = Decimator(decimation)
+        self._decimation = decimation
+        Acquisition.__init__(self, channel, max_count, capacity, sinks, nanoseconds, realtime)
+        self._envelope = None
+        if decimation is not None and decimation.envelope:
+            self._envelope = SampleBuffer(self._data.capacity, 2 * self._data.width,
+                                          nanoseconds)
         self._sampling_rate = 0.0
         self._sampling_period = 0.0
         self.sampling_rate = sampling_rate
+        self._native = native
+        self._precise = precise
+        self._timer = None
+        self._timing = TimingStatistics(self._sampling_rate)
+        self._arm = arm
+        self._external_clock = external_clock
 
     # Sampling rate
     @property
@@ -215,28 +554,828 @@ class SynchronousAcquisition(Acquisition):
     def sampling_rate(self):
         raise AttributeError("Can't delete attribute")
 
-    def run(self):
+    # Decimation
+    @property
+    def decimation(self):
+        """Etapa de diezmado (:class:`pida.decimation.Decimator`) de la
+        adquisición, o ``None`` si cada muestra es una única conversión.
+        Su propiedad :attr:`pida.decimation.Decimator.bit_gain` indica los
+        bits de resolución que se ganan.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._decimation
+
+    @property
+    def conversion_rate(self):
+        """Frecuencia nominal de conversión en hertzios: la frecuencia de
+        muestreo multiplicada por el factor de diezmado. Las conversiones
+        de cada muestra se hacen consecutivamente, a la máxima tasa del
+        enlace de datos.
+
+        Es una propiedad de sólo lectura.
+        """
+        if self._decimation is None:
+            return self._sampling_rate
+        return self._sampling_rate * self._decimation.factor
+
+    def _converters(self):
+        converters = [channel.to_volts for channel in self.channels]
+        if self._decimation is not None:
+            converters = [self._decimation.scaled(convert) for convert in converters]
+        return converters
+
+    def get_envelope(self, n_count=0):
+        """Devuelve la envolvente de las últimas muestras como una
+        secuencia cuyos elementos son listas ``[elapsed_time, minimum,
+        maximum, ...]``, con el valor mínimo y el máximo en voltios de las
+        conversiones de cada muestra para cada canal.
+
+        Eleva una excepción :exc:`ValueError` si la etapa de diezmado no
+        guarda la envolvente (ver :class:`pida.decimation.Decimator`).
+
+        :param n_count: Número de muestras a incluir (ver :meth:`get_data`).
+        """
+        if self._envelope is None:
+            raise ValueError("Envelope not recorded")
+        converters = [channel.to_volts for channel in self.channels for _ in range(2)]
+        return self._envelope.view(n_count, converters)
+
+    # Timing
+    @property
+    def timing(self):
+        """Estadísticas de temporización de las muestras
+        (:class:`pida.statistics.TimingStatistics`): retraso de cada
+        muestra respecto a su instante previsto, desbordamientos,
+        frecuencia conseguida y tiempo dedicado a transferencias y a
+        esperas.
+
+        Se actualizan mientras la adquisición está en marcha; use
+        :meth:`pida.statistics.TimingStatistics.snapshot` para obtener una
+        copia que no cambie.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._timing
+
+    def _sampling_source(self):
+        if not self._native or sample is None or self._decimation is not None:
+            return None
+        if self._external_clock is not None:
+            return None
+        sampling_source = getattr(self.channel, 'sampling_source', None)
+        if sampling_source is None:
+            return None
+        return sampling_source()
+
+    def _open(self):
         self.channel.open()
-        self._status = 'running'
 
-        self._start_time = time()
-        self.start_time_lock.release()
+    def _close(self):
+        self.channel.close()
+
+    def run(self):
+        opened = released = False
+        try:
+            self._apply_realtime()
+            self._open()
+            opened = True
+            edge = self._wait_edge(self._arm) if self._arm is not None else None
+            self._status = 'running'
+
+            source = self._sampling_source()
+            if isinstance(self._precise, PrecisionTimer):
+                self._timer = self._precise
+            elif self._precise:
+                self._timer = default_timer()
+            self._open_sinks()
+            self._timing = TimingStatistics(self._sampling_rate)
+
+            self._start_ns = edge if edge is not None else time_ns()
+            self._start_time = self._start_ns * 1e-9
+            self.start_time_lock.release()
+            released = True
+
+            if self._external_clock is not None:
+                self._run_external(_group_channels(self.channels))
+            elif source is None:
+                self._run_interpreted()
+            else:
+                self._run_native(source)
+
+            self._elapsed_time = time() - self._start_time
+        finally:
+            # Waiters, readers and streams only return once the
+            # acquisition stops, so stop it even if sampling fails
+            if not released:
+                self.start_time_lock.release()
+            try:
+                self._close_sinks()
+                if opened:
+                    self._close()
+            finally:
+                self._status = 'stopped'
+                self._notify()
+
+    def _clock(self):
+        # Clock functions, start instant, function that returns the
+        # scheduled instant of sample i and scale to seconds, all in the
+        # time units of the buffer. Instants are computed from the sample
+        # number, as in the native engine, so rounding errors do not
+        # accumulate
+        period = self._sampling_period
+        if self._nanoseconds:
+            start = self._start_ns
+            period_ns = period * 1e9
+            return (time_ns, self._timer.sleep_until_ns if self._timer else sleep_until_ns,
+                    start, lambda i: start + int(round(i * period_ns)), 1e-9)
+        start = self._start_time
+        return (time, self._timer.sleep if self._timer else sleep,
+                start, lambda i: start + i * period, 1.0)
+
+    def _run_interpreted(self):
+        if self._decimation is not None:
+            self._run_periodic(self._scan_reader(_group_channels(self.channels)))
+            return
+        read_code = self.channel.read_code
+        append = self._data.append
+        self._run_periodic(lambda time: append(time, read_code()))
+
+    def _scan_reader(self, groups):
+        # Function that reads a scan of the groups of channels and appends it
+        data = self._data
+        row = [0] * data.width
+        decimation = self._decimation
+        if decimation is None:
+            def read_scan(time):
+                for converter, converter_channels, columns in groups:
+                    for column, code in zip(columns, converter.read_codes(converter_channels)):
+                        row[column] = code
+                data.append_row(time, row)
+            return read_scan
 
-        request = self._start_time
+        # Every request holds the oversampled channels of a converter
+        factor = decimation.factor
+        requests = [(converter, converter_channels * factor, columns)
+                    for converter, converter_channels, columns in groups]
+        filters = [decimation.filter() for _ in row]
+        envelope = self._envelope
+        bounds = [0] * (2 * len(row))
+        def read_scan(time):
+            for converter, converter_channels, columns in requests:
+                codes = converter.read_codes(converter_channels)
+                width = len(columns)
+                for offset, column in enumerate(columns):
+                    block = codes[offset::width]
+                    row[column] = filters[column](block)
+                    if envelope is not None:
+                        bounds[2 * column] = min(block)
+                        bounds[2 * column + 1] = max(block)
+            if envelope is not None:
+                envelope.append_row(time, bounds)
+            data.append_row(time, row)
+        return read_scan
+
+    def _run_periodic(self, read):
+        # Sampling loop with absolute deadlines; read(time) takes a sample
+        # or scan and appends it with that time
+        clock, sleep_until, start, schedule, scale = self._clock()
+        paced = self._sampling_rate > 0
+        request = start
+        data = self._data
         i = 0
+        record = self._timing.record
         while self._running and (self._max_count == 0 or i < self._max_count):
             # Calculate iteration end time
-            request += self._sampling_period
+            scheduled = request
+            request = schedule(i + 1)
 
-            # Add new data poing
-            self._elapsed_time = time() - self._start_time
-            value = self.channel.read()
-            self._data.append([self._elapsed_time, value])
+            # Add new sample
+            now = clock()
+            read(now - start)
+            done = clock()
+            self._elapsed_time = (now - start) * scale
+            if data.count >= self._due:
+                self._publish()
 
             # Sleep till iteration end time
-            sleep(request)
+            sleep_until(request)
+            record((now - scheduled) * scale if paced else 0.0, (done - now) * scale,
+                   (clock() - done) * scale, paced and done >= request,
+                   self._elapsed_time)
             i = i + 1
 
-        self._elapsed_time = time() - self._start_time
-        self.channel.close()
+    def _wait_edge(self, gpio):
+        # Instant of the next edge, or None if the acquisition is stopped
+        while self._running:
+            edge = gpio.wait_edge(EDGE_POLL_TIME)
+            if edge is not None:
+                return edge
+        return None
+
+    def _run_external(self, groups):
+        read_scan = self._scan_reader(groups)
+        data = self._data
+        gpio = self._external_clock
+        start = self._start_ns
+        scale = 1 if self._nanoseconds else 1e-9
+        previous = time_ns()
+        i = 0
+        record = self._timing.record
+        while self._running and (self._max_count == 0 or i < self._max_count):
+            edge = self._wait_edge(gpio)
+            if edge is None:
+                break
+
+            # Add new scan at the time of the edge
+            now = time_ns()
+            read_scan((edge - start) * scale)
+            done = time_ns()
+            self._elapsed_time = (edge - start) * 1e-9
+            if data.count >= self._due:
+                self._publish()
+
+            record((now - edge) * 1e-9, (done - now) * 1e-9, max(edge - previous, 0) * 1e-9,
+                   False, self._elapsed_time)
+            previous = done
+            i = i + 1
+
+    def _run_native(self, source):
+        fd, request, shift, mask = source
+        # The engine transfers through fd, so other users of the link wait
+        # between blocks
+        link = self.channel.converter.data_link
+        times, columns = self._data.storage
+        capacity = self._data.capacity
+        if self._sampling_rate > 0:
+            block = max(int(self._sampling_rate * NATIVE_BLOCK_TIME), 1)
+        else:
+            block = NATIVE_BLOCK_SIZE
+
+        i = 0
+        while self._running and (self._max_count == 0 or i < self._max_count):
+            count = block
+            if self._max_count > 0:
+                count = min(count, self._max_count - i)
+            count = min(count, max(self._due - self._data.count, 1))
+            link.acquire()
+            try:
+                # The engine schedules sample i at _start_ns + i * period
+                taken = sample(fd, request, shift, mask, self._start_ns,
+                               self._sampling_period, i, times, columns[0],
+                               self._data.count % capacity, count,
+                               self._timing.accumulators, self._nanoseconds,
+                               self._timer.margin if self._timer else 0.0)
+            finally:
+                link.release()
+            self._data.advance(taken)
+            self._elapsed_time = time() - self._start_time
+            if self._data.count >= self._due:
+                self._publish()
+            i = i + taken
+
+class ScanAcquisition(SynchronousAcquisition):
+    """Gestiona una adquisición de datos síncrona en la que, con una
+    frecuencia de muestreo específica, se leen todos los canales de
+    entrada de una interfaz de adquisición de datos.
+
+    En cada instante de muestreo (barrido) los canales se leen uno tras
+    otro, agrupados por conversor, de forma que las lecturas de cada
+    conversor se realizan en una única transferencia por lotes de su
+    enlace de datos (ver :meth:`pida.converters.ADC.read_codes`). Cada
+    barrido se almacena con un único instante de tiempo y un valor por
+    canal, por lo que :meth:`get_data` devuelve listas
+    ``[elapsed_time, value_0, value_1, ...]``.
+
+    :param channels: Interfaz de adquisición de datos
+        (:class:`pida.interfaces.Interface`) cuyos canales de entrada se
+        leen, o lista de canales de entrada.
+    :param max_count: Número máximo de barridos a realizar en la
+        adquisición. El valor por defecto (0) indica que no hay límite.
+    :param sampling_rate: Frecuencia de barrido en hertzios. El valor
+        por defecto (0) provoca que los barridos se realicen a la máxima
+        tasa posible.
+    :param capacity: Número máximo de barridos que se conservan en
+        memoria (ver :class:`Acquisition`).
+    :param sinks: Lista de sumideros a los que se envían los barridos
+        (ver :class:`Acquisition`).
+    :param nanoseconds: Si es verdadero, los instantes de los barridos se
+        guardan como enteros en nanosegundos (ver :class:`Acquisition`).
+    :param precise: Usa un temporizador de precisión para las esperas
+        entre barridos (ver :class:`SynchronousAcquisition`).
+    :param realtime: Perfil de tiempo real del hilo de muestreo (ver
+        :class:`Acquisition`).
+    :param decimation: Etapa de diezmado de cada canal (ver
+        :class:`SynchronousAcquisition`). Las conversiones de todos los
+        canales de un conversor se leen en una única transferencia.
+    :param arm: GPIO cuyo flanco comienza la adquisición (ver
+        :class:`SynchronousAcquisition`).
+    :param external_clock: GPIO cuyos flancos provocan cada barrido (ver
+        :class:`SynchronousAcquisition`).
+    """
+
+    def __init__(self, channels=None, max_count=0, sampling_rate=0, capacity=0, sinks=None,
+                 nanoseconds=False, precise=False, realtime=None, decimation=None, arm=None,
+                 external_clock=None):
+        channels = getattr(channels, 'channel_list', channels) or []
+        self._channels = [channel for channel in channels if hasattr(channel, 'read_code')]
+        if not self._channels:
+            raise ValueError("Input channels expected")
+        self._groups = _group_channels(self._channels)
+        SynchronousAcquisition.__init__(self, None, max_count, sampling_rate, capacity,
+                                        native=False, sinks=sinks, nanoseconds=nanoseconds,
+                                        precise=precise, realtime=realtime,
+                                        decimation=decimation, arm=arm,
+                                        external_clock=external_clock)
+
+    def _new_buffer(self, capacity):
+        return SampleBuffer(capacity, len(self._channels), self._nanoseconds)
+
+    @property
+    def channels(self):
+        """Lista de canales de entrada que se leen en cada barrido, en el
+        orden de las columnas de los datos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._channels)
+
+    def get_data(self, n_count=0):
+        """Devuelve los últimos barridos adquiridos como una secuencia cuyos
+        elementos son listas ``[elapsed_time, value_0, value_1, ...]``,
+        con un valor en voltios por canal.
+
+        El resultado es una vista (:class:`pida.buffers.SampleView`) que no
+        copia las muestras.
+
+        :param n_count: Número de barridos a incluir en la secuencia
+            devuelta. El valor por defecto 0 incluye todos los barridos
+            conservados hasta ese momento.
+        """
+        return self._data.view(n_count, self._converters())
+
+    def _open(self):
+        for converter, _, _ in self._groups:
+            converter.open()
+
+    def _close(self):
+        for converter, _, _ in self._groups:
+            converter.close()
+
+    def _sampling_source(self):
+        return None
+
+    def _run_interpreted(self):
+        self._run_periodic(self._scan_reader(self._groups))
+
+Capture = namedtuple('Capture', ['index', 'trigger_time', 'pre_trigger', 'times', 'codes'])
+"""Captura de una :class:`TriggeredAcquisition`: número de orden del
+disparo, instante de la muestra que lo provocó, número de muestras
+anteriores a ella (puede ser menor que el configurado si el disparo se
+produce al comienzo de la adquisición), vector (:class:`array.array`)
+con los instantes de las muestras y vector con sus códigos."""
+
+class TriggeredAcquisition(SynchronousAcquisition):
+    """Gestiona una adquisición síncrona que sólo conserva las muestras
+    próximas a los eventos que cumplen una condición de disparo.
+
+    Las muestras se toman continuamente en un búfer circular de capacidad
+    acotada y la condición (:class:`pida.triggers.Trigger`) se evalúa
+    sobre sus códigos a medida que llegan. Cuando se cumple, la
+    adquisición espera a tomar ``post_trigger`` muestras y guarda una
+    captura (:class:`Capture`) con las ``pre_trigger`` muestras anteriores
+    al disparo y las ``post_trigger`` siguientes, empezando por la que lo
+    provocó. Después vuelve a armarse a partir de la última muestra
+    capturada.
+
+    La memoria usada no depende de la duración de la adquisición: se
+    conservan como mucho ``max_captures`` capturas, descartando las más
+    antiguas.
+
+    :param channel: Canal de una interfaz de adquisición a través del
+        cual se toman los datos.
+    :param trigger: Condición de disparo (:class:`pida.triggers.Trigger`).
+    :param pre_trigger: Número de muestras anteriores al disparo que se
+        capturan.
+    :param post_trigger: Número de muestras que se capturan a partir del
+        disparo.
+    :param sampling_rate: Frecuencia de muestreo en hertzios (ver
+        :class:`SynchronousAcquisition`).
+    :param max_count: Número máximo de muestras a tomar, incluidas las no
+        capturadas. El valor por defecto (0) indica que no hay límite.
+    :param rearm: Si es falso, la adquisición se detiene tras la primera
+        captura.
+    :param max_captures: Número máximo de capturas que se conservan.
+
+    El resto de parámetros son los de :class:`SynchronousAcquisition`.
+
+    Ejemplo de captura de 1ms antes y 4ms después de cada flanco de
+    subida que cruce el código 2048, muestreando a 100kHz:
+
+    >>> from pida.triggers import LevelTrigger
+    >>> acquisition = TriggeredAcquisition(channel, LevelTrigger(2048), 100, 400, 100000)
+    >>> acquisition.start()
+    >>> acquisition.wait_captures(1)
+    True
+    >>> capture = acquisition.captures[0]
+    """
+
+    def __init__(self, channel=None, trigger=None, pre_trigger=0, post_trigger=1,
+                 sampling_rate=0, max_count=0, rearm=True, max_captures=DEFAULT_MAX_CAPTURES,
+                 native=True, sinks=None, nanoseconds=False, precise=False, realtime=None):
+        if trigger is None:
+            raise ValueError("Trigger expected")
+        if pre_trigger < 0 or post_trigger <= 0 or max_captures <= 0:
+            raise ValueError("Positive number expected")
+        self._trigger = trigger
+        self._pre_trigger = int(pre_trigger)
+        self._post_trigger = int(post_trigger)
+        block = min(self._post_trigger, TRIGGER_BLOCK_SIZE)
+        # The ring keeps the pre-trigger samples until the block that
+        # completes the post-trigger samples is evaluated
+        capacity = self._pre_trigger + self._post_trigger + block
+        SynchronousAcquisition.__init__(self, channel, max_count, sampling_rate, capacity,
+                                        native, sinks, nanoseconds, precise, realtime)
+        self._request_chunk(block)
+        self._rearm = rearm
+        self._captures = deque(maxlen=int(max_captures))
+        self._capture_count = 0
+        self._armed = True
+        # Next sample to evaluate, code before it and sample that fired
+        self._position = 0
+        self._previous = None
+        self._fired = None
+
+    @property
+    def trigger(self):
+        """Condición de disparo de la adquisición.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._trigger
+
+    @property
+    def pre_trigger(self):
+        """Número de muestras anteriores al disparo que se capturan.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._pre_trigger
+
+    @property
+    def post_trigger(self):
+        """Número de muestras que se capturan a partir del disparo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._post_trigger
+
+    @property
+    def captures(self):
+        """Lista de las capturas (:class:`Capture`) conservadas, de la más
+        antigua a la más reciente.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._captures)
+
+    @property
+    def capture_count(self):
+        """Número total de capturas, incluidas las ya descartadas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._capture_count
+
+    def wait_captures(self, n_count=1, timeout=None):
+        """Espera, sin consultas periódicas, a que el número total de
+        capturas alcance ``n_count`` o a que termine la adquisición.
+        Devuelve verdadero si se han alcanzado.
+
+        :param n_count: Número total de capturas a esperar.
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        deadline = None if timeout is None else time() + timeout
+        with self._data_condition:
+            while self._capture_count < n_count and self._status != 'stopped':
+                if deadline is None:
+                    self._data_condition.wait()
+                elif time() < deadline:
+                    self._data_condition.wait(deadline - time())
+                else:
+                    break
+        return self._capture_count >= n_count
+
+    def _publish(self, flush=False):
+        self._evaluate()
+        SynchronousAcquisition._publish(self, flush)
+
+    def _evaluate(self):
+        # Look for triggers in the samples taken since the last call and
+        # store the captures whose post-trigger samples are complete
+        data = self._data
+        count = data.count
+        while self._armed:
+            if self._fired is None:
+                start = max(self._position, count - data.capacity)
+                if start >= count:
+                    return
+                codes = data.view_since(start).codes()
+                index = self._trigger.find(codes, self._previous)
+                if index < 0:
+                    self._position = count
+                    self._previous = codes[-1]
+                    return
+                self._fired = start + index
+            end = self._fired + self._post_trigger
+            if count < end:
+                return
+            self._capture(end)
+            if not self._rearm:
+                self._armed = False
+                self.stop()
+                return
+            self._position = end
+            self._previous = data.view_since(end - 1)[0][1]
+            self._fired = None
+
+    def _capture(self, end):
+        start = max(self._fired - self._pre_trigger, 0)
+        view = self._data.view_since(start)[:end - start]
+        times = view.times()
+        self._captures.append(Capture(self._capture_count, times[self._fired - view.start],
+                                      self._fired - view.start, times, view.codes()))
+        self._capture_count += 1
+
+WAITING, RUNNING, STOPPED = range(3)
+
+class _Control(ctypes.Structure):
+    # State shared between a ProcessAcquisition and its sampling process
+    _fields_ = [
+        ('status', ctypes.c_int32),
+        ('start_time', ctypes.c_double),
+        ('elapsed_time', ctypes.c_double),
+    ]
+
+class ProcessAcquisition(Acquisition):
+    """Ejecuta una adquisición de datos en un proceso hijo, de forma que los
+    hilos que consumen sus datos en el proceso principal no compiten por
+    el GIL con el bucle de muestreo.
+
+    Las muestras se publican en un búfer circular en memoria compartida
+    (:class:`pida.buffers.SharedSampleBuffer`) en el que sólo escribe el
+    proceso hijo, sin cierres. El objeto ofrece la misma interfaz que la
+    adquisición que ejecuta: :attr:`status`, :meth:`get_data`,
+    :meth:`stop`, etc.
+
+    Los sumideros y el perfil de tiempo real de la adquisición se usan en
+    el proceso hijo. El arranque y :meth:`stop` se comunican entre los
+    procesos con eventos y se atienden sin retardo, pero las muestras
+    nuevas llegan al proceso principal con un retardo de hasta
+    :data:`PROCESS_POLL_TIME` segundos.
+
+    :param acquisition: Adquisición
+        (:class:`SynchronousAcquisition` o :class:`ScanAcquisition`) a
+        ejecutar, configurada pero sin comenzar.
+
+    Ejemplo de adquisición a 10kHz en un proceso hijo:
+
+    >>> from pida.acquisitions import SynchronousAcquisition, ProcessAcquisition
+    >>> acquisition = ProcessAcquisition(SynchronousAcquisition(channel, 0, 10000))
+    >>> acquisition.start()
+    >>> acquisition.get_data(5)
+    """
+
+    def __init__(self, acquisition):
+        self._acquisition = acquisition
+        data = acquisition._data
+        self._shared = SharedSampleBuffer(data.capacity, data.width, data.nanoseconds)
+        acquisition._data = self._shared
+        envelope = getattr(acquisition, '_envelope', None)
+        if envelope is not None:
+            acquisition._envelope = SharedSampleBuffer(envelope.capacity, envelope.width,
+                                                       envelope.nanoseconds)
+        Acquisition.__init__(self, acquisition.channel, acquisition.max_count,
+                             data.capacity)
+        self._map = mmap.mmap(-1, ctypes.sizeof(_Control))
+        self._control = _Control.from_buffer(self._map)
+        self._process = None
+        self._started = Event()
+        # Created before the fork, so both processes share them
+        self._start_notice = multiprocessing.Event()
+        self._stop_request = multiprocessing.Event()
+
+    def _new_buffer(self, capacity):
+        return self._shared
+
+    @property
+    def acquisition(self):
+        """Adquisición que se ejecuta en el proceso hijo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._acquisition
+
+    @property
+    def channels(self):
+        return self._acquisition.channels
+
+    @property
+    def elapsed_time(self):
+        if self._status == 'running':
+            return time() - self._start_time
+        return self._elapsed_time
+
+    def _converters(self):
+        return self._acquisition._converters()
+
+    def get_data(self, n_count=0):
+        return self._acquisition.get_data(n_count)
+
+    def get_envelope(self, n_count=0):
+        return self._acquisition.get_envelope(n_count)
+
+    def run(self):
+        control = self._control
+        self._process = multiprocessing.Process(target=self._serve)
+        self._process.daemon = True
+        self._process.start()
+
+        # Wait till the sampling loop starts, or the child dies without
+        # notifying it
+        while not self._start_notice.wait(PROCESS_POLL_TIME) and self._process.is_alive():
+            pass
+        self._start_time = control.start_time
+        if control.status == RUNNING:
+            self._status = 'running'
+        self._open_sinks()
+        self.start_time_lock.release()
+
+        # Publish the samples of the child to the readers and block
+        # callbacks of this process
+        while self._process.is_alive():
+            self._process.join(PROCESS_POLL_TIME)
+            if self._data.count >= self._due:
+                self._publish()
+        self._elapsed_time = control.elapsed_time
+        self._close_sinks()
         self._status = 'stopped'
+        self._notify()
+
+    def stop(self):
+        self._running = False
+        self._stop_request.set()
+
+    def _serve(self):
+        # Sampling process
+        acquisition = self._acquisition
+        control = self._control
+        monitor = Thread(target=self._monitor)
+        monitor.daemon = True
+        monitor.start()
+        try:
+            acquisition.run()
+        finally:
+            if acquisition.status != 'waiting':
+                # Let the monitor publish the start first
+                self._started.wait()
+            control.elapsed_time = acquisition.elapsed_time
+            control.status = STOPPED
+            self._start_notice.set()
+
+    def _monitor(self):
+        # Thread of the sampling process that relays the start and stop
+        acquisition = self._acquisition
+        control = self._control
+        acquisition.start_time_lock.acquire()
+        control.start_time = acquisition.start_time
+        control.status = RUNNING
+        self._start_notice.set()
+        self._started.set()
+        self._stop_request.wait()
+        acquisition.stop()
+
+class _BlockCallback(Sink):
+    # Sink that hands fixed-size blocks of converted samples to a callback
+
+    def __init__(self, n_count, callback):
+        self.chunk_size = int(n_count)
+        self._callback = callback
+        self._acquisition = None
+        self._position = 0
+
+    def open(self, acquisition):
+        self._acquisition = acquisition
+        self._position = acquisition.count
+
+    def write(self, view):
+        acquisition = self._acquisition
+        size = self.chunk_size
+        while acquisition.count - self._position >= size:
+            block = acquisition.get_data_since(self._position)[:size]
+            self._position = block.stop
+            self._callback(block)
+
+class Reader(object):
+    """Lector incremental de las muestras de una adquisición. Cada lectura
+    devuelve sólo las muestras tomadas desde la anterior, con un coste que
+    no depende del número de muestras de la adquisición.
+
+    Normalmente se obtiene con :meth:`Acquisition.reader`. Cada lector
+    guarda su propia posición, por lo que varios consumidores pueden leer
+    la misma adquisición de forma independiente.
+
+    Ejemplo de procesado de bloques de 100 muestras:
+
+    >>> reader = acquisition.reader()
+    >>> while reader.wait(100):
+    ...     process(reader.read_new(100))
+
+    :param acquisition: Adquisición cuyas muestras se leen.
+    :param position: Número de la primera muestra que se lee.
+    """
+
+    def __init__(self, acquisition, position=0):
+        if position < 0:
+            raise ValueError("Positive number expected")
+        self._acquisition = acquisition
+        self._position = int(position)
+        self._lost = 0
+
+    @property
+    def acquisition(self):
+        """Adquisición cuyas muestras se leen.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._acquisition
+
+    @property
+    def position(self):
+        """Número de la siguiente muestra que se lee.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._position
+
+    @property
+    def available(self):
+        """Número de muestras tomadas que todavía no se han leído.
+
+        Es una propiedad de sólo lectura.
+        """
+        return max(self._acquisition.count - self._position, 0)
+
+    @property
+    def lost(self):
+        """Número de muestras que se han sobrescrito en memoria antes de
+        leerlas, porque el lector se ha retrasado más que la capacidad de
+        la adquisición.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._lost
+
+    def read_new(self, max_count=0):
+        """Devuelve las muestras tomadas desde la anterior lectura, con el
+        formato de :meth:`Acquisition.get_data`, y avanza la posición del
+        lector.
+
+        :param max_count: Número máximo de muestras a devolver. El valor
+            por defecto 0 devuelve todas las disponibles.
+        """
+        view = self._acquisition.get_data_since(self._position)
+        self._lost += view.start - self._position
+        if max_count > 0:
+            view = view[:max_count]
+        self._position = view.stop
+        return view
+
+    def wait(self, n_count=1, timeout=None):
+        """Espera, sin consultas periódicas, a que haya ``n_count``
+        muestras sin leer o a que termine la adquisición. Devuelve
+        verdadero si hay ``n_count`` muestras disponibles.
+
+        :param n_count: Número de muestras a esperar.
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        if n_count <= 0:
+            raise ValueError("Positive number expected")
+        acquisition = self._acquisition
+        deadline = None if timeout is None else time() + timeout
+        with acquisition._data_condition:
+            target = self._position + n_count
+            acquisition._await(target)
+            try:
+                while self.available < n_count and acquisition.status != 'stopped':
+                    if deadline is None:
+                        acquisition._data_condition.wait()
+                    elif time() < deadline:
+                        acquisition._data_condition.wait(deadline - time())
+                    else:
+                        break
+            finally:
+                acquisition._release(target)
+        return self.available >= n_count
@@ -0,0 +1,525 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye un banco de pruebas de rendimiento de la librería:
+velocidad de las peticiones SPI según la frecuencia de reloj, resolución
+del reloj, precisión de las esperas, máxima frecuencia de muestreo
+sostenible, coste de la lectura de datos y velocidad de las operaciones
+sobre GPIO.
+
+Los resultados se guardan en formato JSON junto con los datos del
+entorno en que se midieron, y pueden compararse con los de una medida
+anterior (línea base) para detectar regresiones. Si no hay hardware
+SPI disponible, las pruebas se ejecutan sobre enlaces emulados
+(:mod:`pida.emulation`). Las pruebas de GPIO se ejecutan siempre sobre
+una réplica en memoria del directorio ``sysfs`` de las GPIO
+(:func:`pida.emulation.emulate_gpio`), de forma que miden el coste de
+las llamadas al sistema de la librería.
+
+Uso desde la línea de órdenes::
+
+    $ python -m pida.benchmarks --output baseline.json
+    $ python -m pida.benchmarks --baseline baseline.json --threshold 0.2
+
+La segunda orden termina con código de salida 1 si alguna medida
+empeora más de un 20% respecto a la línea base.
+"""
+from collections import namedtuple
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+from pida.clock import time, sleep, timestamps
+from pida.buffers import SampleBuffer
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.links import SPIDataLink, SPIDataLinkConfiguration
+from pida.acquisitions import SynchronousAcquisition
+from pida.timers import default_timer
+from pida.emulation import (EmulatedSPIDataLink, MCP3202Device, EmulatedEdgeSource,
+                            emulate_gpio, emulate_gpio_registers)
+from pida.gpio import GPIO, GPIOEventLoop, GPIORegisters, Status
+from pida.logic import LogicCapture
+from pida.patterns import PatternOutput, clock_pattern
+
+FORMAT_VERSION = 1
+"""Versión del formato JSON de los resultados."""
+
+DEFAULT_THRESHOLD = 0.1
+"""Empeoramiento relativo por defecto a partir del cual una medida se
+considera una regresión respecto a la línea base."""
+
+DEFAULT_REPEAT = 3
+"""Número por defecto de veces que se repite cada medida. El resultado
+de cada caso es la mediana de las repeticiones."""
+
+SPI_DEVICE = '/dev/spidev0.0'
+
+class Case(object):
+    """Caso del banco de pruebas.
+
+    :param name: Nombre del caso.
+    :param function: Función que realiza una medida. Recibe el contexto
+        (:class:`Context`) y, si el caso tiene parámetros, el valor del
+        parámetro, y devuelve el valor medido.
+    :param unit: Unidad del valor medido.
+    :param higher_is_better: Verdadero si un valor mayor es una mejora.
+    :param parameters: Lista de valores del parámetro del caso. Por
+        defecto el caso no tiene parámetros.
+    """
+
+    def __init__(self, name, function, unit, higher_is_better=True, parameters=None):
+        self.name = name
+        self.function = function
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+        self.parameters = parameters
+
+    def measure(self, context, parameter=None):
+        """Realiza una medida del caso.
+
+        :param context: Contexto de la medida.
+        :param parameter: Valor del parámetro de la medida.
+        """
+        if self.parameters is None:
+            return self.function(context)
+        return self.function(context, parameter)
+
+CASES = []
+"""Lista de casos registrados con :func:`benchmark`, en orden de registro."""
+
+def benchmark(name, unit, higher_is_better=True, parameters=None):
+    """Decorador que registra una función como caso del banco de pruebas
+    (ver :class:`Case`)."""
+    def register(function):
+        CASES.append(Case(name, function, unit, higher_is_better, parameters))
+        return function
+    return register
+
+def hardware_available():
+    """Indica si hay un dispositivo SPI disponible para las medidas."""
+    return os.path.exists(SPI_DEVICE) and os.access(SPI_DEVICE, os.R_OK | os.W_OK)
+
+class Context(object):
+    """Contexto de ejecución de los casos. Proporciona los enlaces de datos
+    y canales, reales o emulados, con que se realizan las medidas.
+
+    :param emulated: Si es verdadero las medidas se realizan sobre
+        enlaces emulados; si es falso, sobre el dispositivo SPI 0.0.
+    """
+
+    def __init__(self, emulated):
+        self.emulated = emulated
+
+    def link(self, max_speed_hz=1000000):
+        """Devuelve un enlace de datos SPI (sin abrir) a un MCP3202.
+
+        :param max_speed_hz: Frecuencia del reloj SPI en hertzios.
+        """
+        configuration = SPIDataLinkConfiguration(0, int(max_speed_hz))
+        if self.emulated:
+            return EmulatedSPIDataLink(MCP3202Device(3.3), configuration)
+        return SPIDataLink(0, 0, configuration)
+
+    def channel(self, max_speed_hz=1000000):
+        """Devuelve el canal 0 de un MCP3202 conectado a :meth:`link`.
+
+        :param max_speed_hz: Frecuencia del reloj SPI en hertzios.
+        """
+        return InputChannel(MCP3202(3.3, self.link(max_speed_hz)), 0)
+
+def environment(emulated):
+    """Devuelve un diccionario con los datos del entorno de ejecución.
+
+    :param emulated: Verdadero si las medidas se realizan sobre enlaces
+        emulados.
+    """
+    return {
+        'date': datetime.datetime.utcnow().isoformat() + 'Z',
+        'emulated': emulated,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu': _cpu_model(),
+        'cpus': _cpu_count(),
+        'clocksource': _read_first_line('/sys/devices/system/clocksource/clocksource0/current_clocksource'),
+        'governor': _read_first_line('/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor'),
+    }
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except (IOError, OSError):
+        return None
+
+def _cpu_model():
+    try:
+        with open('/proc/cpuinfo') as f:
+            lines = f.readlines()
+    except (IOError, OSError):
+        return platform.processor() or None
+    model = None
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key.strip() in ('Model', 'Hardware', 'model name'):
+            model = value.strip()
+            if key.strip() == 'Model':
+                break
+    return model
+
+def _cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return None
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+class Runner(object):
+    """Ejecuta los casos del banco de pruebas.
+
+    :param cases: Lista de casos (:class:`Case`) o de nombres de casos
+        registrados a ejecutar. Por defecto, todos los casos registrados.
+    :param emulated: Si es verdadero las medidas se realizan sobre
+        enlaces emulados. Por defecto se emulan si no hay hardware SPI
+        disponible (ver :func:`hardware_available`).
+    :param repeat: Número de veces que se repite cada medida.
+    """
+
+    def __init__(self, cases=None, emulated=None, repeat=DEFAULT_REPEAT):
+        if repeat <= 0:
+            raise ValueError("Positive number expected")
+        if cases is None:
+            cases = CASES
+        registered = dict((case.name, case) for case in CASES)
+        self._cases = []
+        for case in cases:
+            if not isinstance(case, Case):
+                if case not in registered:
+                    raise ValueError("Unknown benchmark {}".format(case))
+                case = registered[case]
+            self._cases.append(case)
+        if emulated is None:
+            emulated = not hardware_available()
+        self._context = Context(emulated)
+        self._repeat = repeat
+
+    @property
+    def context(self):
+        """Contexto de ejecución de los casos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._context
+
+    def run(self):
+        """Ejecuta los casos y devuelve un diccionario con los datos del
+        entorno (``'environment'``) y la lista de resultados
+        (``'results'``), apto para guardarse en formato JSON. Cada
+        resultado tiene el nombre del caso, el valor del parámetro, la
+        unidad, si un valor mayor es una mejora, la mediana de las
+        medidas y la lista de medidas.
+        """
+        results = []
+        for case in self._cases:
+            for parameter in case.parameters or [None]:
+                samples = [case.measure(self._context, parameter) for _ in range(self._repeat)]
+                results.append({
+                    'name': case.name,
+                    'parameter': parameter,
+                    'unit': case.unit,
+                    'higher_is_better': case.higher_is_better,
+                    'value': _median(samples),
+                    'samples': samples,
+                })
+        return {
+            'version': FORMAT_VERSION,
+            'environment': environment(self._context.emulated),
+            'results': results,
+        }
+
+Regression = namedtuple('Regression', ['name', 'parameter', 'baseline', 'value', 'change'])
+"""Medida que empeora respecto a la línea base. ``change`` es el
+empeoramiento relativo (0.25 indica un 25% peor)."""
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compara unos resultados con los de una línea base y devuelve la lista
+    de regresiones (:data:`Regression`), medidas que empeoran más de
+    ``threshold`` en términos relativos. Las medidas que no están en la
+    línea base se ignoran.
+
+    :param report: Resultados devueltos por :meth:`Runner.run`.
+    :param baseline: Resultados de la línea base.
+    :param threshold: Empeoramiento relativo admisible.
+    """
+    reference = dict(((result['name'], result['parameter']), result['value'])
+                     for result in baseline['results'])
+    regressions = []
+    for result in report['results']:
+        key = (result['name'], result['parameter'])
+        if key not in reference or not reference[key]:
+            continue
+        change = (result['value'] - reference[key]) / abs(reference[key])
+        if result['higher_is_better']:
+            change = -change
+        if change > threshold:
+            regressions.append(Regression(result['name'], result['parameter'],
+                                          reference[key], result['value'], change))
+    return regressions
+
+def save(report, filename):
+    """Guarda unos resultados en un fichero JSON.
+
+    :param report: Resultados devueltos por :meth:`Runner.run`.
+    :param filename: Ruta del fichero.
+    """
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+def load(filename):
+    """Lee unos resultados de un fichero JSON.
+
+    :param filename: Ruta del fichero.
+
+    Eleva una excepción :exc:`ValueError` si la versión del formato no es
+    la esperada.
+    """
+    with open(filename) as f:
+        report = json.load(f)
+    if report.get('version') != FORMAT_VERSION:
+        raise ValueError("Unknown file format")
+    return report
+
+# Cases
+
+SPI_SPEEDS = [int(100e3), int(200e3), int(500e3), int(1e6), int(2e6), int(4e6),
+              int(8e6), int(16e6), int(32e6), int(48e6)]
+
+@benchmark('spi_request_rate', 'requests/s', parameters=SPI_SPEEDS)
+def spi_request_rate(context, max_speed_hz, n_requests=1000):
+    request = [0x01, 0x80, 0x00]
+    with context.link(max_speed_hz) as link:
+        start = time()
+        for _ in range(n_requests):
+            link.transfer(request)
+        end = time()
+    return n_requests / (end - start)
+
+@benchmark('clock_resolution', 's', higher_is_better=False)
+def clock_resolution(context, n_samples=10000):
+    times = timestamps(n_samples)
+    diffs = [j - i for i, j in zip(times[:-1], times[1:]) if j > i]
+    return min(diffs) * 1e-9
+
+@benchmark('sleep_lateness', 's', higher_is_better=False, parameters=[100e-6, 1e-3])
+def sleep_lateness(context, period, n_samples=100, sleep=sleep):
+    lateness = 0.0
+    request = time()
+    for _ in range(n_samples):
+        request += period
+        sleep(request)
+        lateness += time() - request
+    return lateness / n_samples
+
+MAX_OVERRUN_RATIO = 0.01
+"""Fracción máxima de muestras con desbordamiento (ver
+:attr:`pida.statistics.TimingStatistics.overruns`) con la que se
+considera que una frecuencia de muestreo es sostenible."""
+
+@benchmark('precise_sleep_lateness', 's', higher_is_better=False, parameters=[100e-6, 1e-3])
+def precise_sleep_lateness(context, period, n_samples=100):
+    return sleep_lateness(context, period, n_samples, default_timer().sleep)
+
+SAMPLING_RATES = [500, 1000, 2000, 5000, 10000, 20000, 50000]
+
+@benchmark('acquisition_sustainable_rate', 'Hz')
+def acquisition_sustainable_rate(context, duration=0.2):
+    sustained = 0
+    for sampling_rate in SAMPLING_RATES:
+        acquisition = SynchronousAcquisition(context.channel(), int(sampling_rate * duration),
+                                             sampling_rate)
+        acquisition.start()
+        acquisition.join()
+        timing = acquisition.timing
+        if timing.overruns > timing.count * MAX_OVERRUN_RATIO:
+            break
+        sustained = sampling_rate
+    return sustained
+
+@benchmark('acquisition_max_rate', 'Hz')
+def acquisition_max_rate(context, n_samples=2000):
+    acquisition = SynchronousAcquisition(context.channel(), n_samples)
+    acquisition.start()
+    acquisition.join()
+    return acquisition.timing.achieved_rate
+
+@benchmark('get_data', 's', higher_is_better=False, parameters=[100, 10000, 100000])
+def get_data(context, n_count):
+    channel = context.channel()
+    data = SampleBuffer(n_count)
+    for i in range(n_count):
+        data.append(i * 1e-3, i & 0xFFF)
+    start = time()
+    data.view(n_count, channel.to_volts).tolist()
+    return time() - start
+
+@benchmark('concurrent_acquisitions', 'samples/s', parameters=[1, 2, 4])
+def concurrent_acquisitions(context, n_acquisitions, n_samples=1000):
+    # Interpreted loops, so that on hardware every sample is a SpiDev.xfer
+    # call; emulated links only measure their own GIL-free waits
+    acquisitions = [SynchronousAcquisition(context.channel(), n_samples, native=False)
+                    for _ in range(n_acquisitions)]
+    for acquisition in acquisitions:
+        acquisition.start()
+    start = time()
+    for acquisition in acquisitions:
+        acquisition.join()
+    end = time()
+    return n_acquisitions * n_samples / (end - start)
+
+GPIO_PIN = 18
+
+GPIO_ACCESSES = ['open_close', 'persistent', 'pattern', 'registers']
+
+def _write_file(filename, value):
+    with open(filename, 'w') as f:
+        f.write(value)
+
+@benchmark('gpio_toggle_rate', 'toggles/s', parameters=GPIO_ACCESSES)
+def gpio_toggle_rate(context, access, n_toggles=2000):
+    if access == 'registers':
+        return _register_toggle_rate(n_toggles)
+    root = emulate_gpio([GPIO_PIN])
+    try:
+        gpio = GPIO(GPIO_PIN, root)
+        value = root + 'gpio{}/value'.format(GPIO_PIN)
+        start = time()
+        if access == 'open_close':
+            # One open and close per write, as sysfs is usually driven
+            for _ in range(n_toggles):
+                _write_file(value, '1')
+                _write_file(value, '0')
+        elif access == 'persistent':
+            for _ in range(n_toggles):
+                gpio.status = Status.HIGH
+                gpio.status = Status.LOW
+        else:
+            gpio.write_pattern(bytearray([1, 0]) * n_toggles)
+        end = time()
+        gpio.close()
+    finally:
+        shutil.rmtree(root)
+    return n_toggles / (end - start)
+
+def _register_toggle_rate(n_toggles):
+    # Register stores on a file-backed map instead of /dev/gpiomem
+    path = emulate_gpio_registers()
+    try:
+        gpio = GPIO(GPIO_PIN, backend=GPIORegisters(path))
+        start = time()
+        for _ in range(n_toggles):
+            gpio.status = Status.HIGH
+            gpio.status = Status.LOW
+        end = time()
+    finally:
+        os.remove(path)
+    return n_toggles / (end - start)
+
+@benchmark('gpio_event_rate', 'events/s', parameters=[1, 4])
+def gpio_event_rate(context, n_pins, n_events=2000):
+    # Edges of emulated sources, handled by a single event loop
+    sources = [EmulatedEdgeSource(GPIO_PIN + pin) for pin in range(n_pins)]
+    loop = GPIOEventLoop(capacity=n_events)
+    try:
+        for source in sources:
+            loop.add(source)
+        count = 0
+        start = time()
+        while count < n_events:
+            for source in sources:
+                source.drive(Status.HIGH)
+            count += loop.poll()
+        end = time()
+    finally:
+        loop.close()
+        for source in sources:
+            source.close()
+    return count / (end - start)
+
+@benchmark('logic_capture_rate', 'samples/s')
+def logic_capture_rate(context, n_samples=20000):
+    # Unpaced capture of two pins from a file-backed register block
+    path = emulate_gpio_registers()
+    try:
+        registers = GPIORegisters(path)
+        capture = LogicCapture([GPIO(GPIO_PIN, backend=registers),
+                                GPIO(GPIO_PIN + 1, backend=registers)], 0, max_count=n_samples)
+        start = time()
+        capture.start()
+        capture.join()
+        end = time()
+    finally:
+        os.remove(path)
+    return n_samples / (end - start)
+
+@benchmark('pattern_output_lateness', 's', higher_is_better=False, parameters=[1e3, 1e4])
+def pattern_output_lateness(context, frequency, n_steps=2000):
+    # Mean lateness of the writes of a clock on a file-backed register block
+    path = emulate_gpio_registers()
+    try:
+        output = PatternOutput([GPIO(GPIO_PIN, backend=GPIORegisters(path))],
+                               clock_pattern(frequency), repeat=n_steps // 2)
+        output.start()
+        output.join()
+    finally:
+        os.remove(path)
+    return output.mean_lateness
+
+def main(argv=None):
+    """Ejecuta el banco de pruebas desde la línea de órdenes."""
+    parser = argparse.ArgumentParser(prog='python -m pida.benchmarks',
+                                     description="Banco de pruebas de rendimiento de pida.")
+    parser.add_argument('cases', nargs='*', metavar='case',
+                        help="casos a ejecutar (por defecto, todos)")
+    parser.add_argument('-o', '--output', help="fichero JSON en el que guardar los resultados")
+    parser.add_argument('-b', '--baseline', help="fichero JSON con la línea base")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="empeoramiento relativo admisible (por defecto %(default)s)")
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="repeticiones de cada medida (por defecto %(default)s)")
+    parser.add_argument('-e', '--emulated', action='store_true', default=None,
+                        help="usar enlaces emulados aunque haya hardware")
+    parser.add_argument('-l', '--list', action='store_true', help="lista los casos disponibles")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for case in CASES:
+            sys.stdout.write(case.name + '\n')
+        return 0
+
+    report = Runner(args.cases or None, args.emulated, args.repeat).run()
+    if args.output:
+        save(report, args.output)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+
+    if args.baseline:
+        regressions = compare(report, load(args.baseline), args.threshold)
+        for regression in regressions:
+            sys.stderr.write("{0.name}[{0.parameter}]: {0.baseline:g} -> {0.value:g} ({0.change:+.0%})\n".format(
+                regression))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye estructuras para almacenar de forma compacta las
+muestras tomadas durante las adquisiciones de datos.
+"""
+from array import array
+import ctypes
+import mmap
+
+try:
+    from pida.sampling import load_count, store_count
+except ImportError:
+    load_count = store_count = None
+
+DEFAULT_CAPACITY = 2 ** 20
+"""Capacidad máxima por defecto en número de muestras de los búferes de
+las adquisiciones: la de las que no fijan un límite de muestras o lo
+fijan por encima de este valor."""
+
+class SampleBuffer(object):
+    """Búfer circular de capacidad fija que almacena muestras formadas por
+    un instante de tiempo y uno o varios códigos.
+
+    Los instantes se guardan en un vector contiguo de números en coma
+    flotante de 64 bits y los códigos en un vector de enteros por cada
+    columna. Toda la memoria se reserva al crear el búfer; cuando está
+    lleno, cada nueva muestra sobrescribe la más antigua.
+
+    Si se indica ``nanoseconds``, los instantes se guardan como enteros de
+    64 bits en nanosegundos, lo que conserva la resolución completa del
+    reloj en adquisiciones de cualquier duración. Las vistas siguen
+    devolviendo los instantes en segundos (ver :meth:`SampleView.times_ns`).
+
+    :param capacity: Número máximo de muestras que se conservan.
+    :param width: Número de códigos (columnas) de cada muestra.
+    :param nanoseconds: Si es verdadero, los instantes se guardan en
+        nanosegundos enteros.
+
+    Eleva una excepción :exc:`ValueError` si la capacidad o el número de
+    columnas no son números positivos.
+    """
+
+    def __init__(self, capacity, width=1, nanoseconds=False):
+        if capacity <= 0 or width <= 0:
+            raise ValueError("Positive number expected")
+        self._capacity = int(capacity)
+        self._width = int(width)
+        self._nanoseconds = bool(nanoseconds)
+        self._times, self._columns = self._allocate()
+        self._count = 0
+
+    def _allocate(self):
+        if self._nanoseconds:
+            # array.array has no 64 bit integer type in Python 2
+            times = (ctypes.c_int64 * self._capacity)()
+        else:
+            times = array('d', [0.0]) * self._capacity
+        return times, [array('i', [0]) * self._capacity for _ in range(self._width)]
+
+    @property
+    def capacity(self):
+        """Número máximo de muestras que se conservan en el búfer.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._capacity
+
+    @property
+    def width(self):
+        """Número de códigos (columnas) de cada muestra.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._width
+
+    @property
+    def nanoseconds(self):
+        """Verdadero si los instantes se guardan en nanosegundos enteros.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._nanoseconds
+
+    @property
+    def count(self):
+        """Número total de muestras añadidas al búfer, incluidas las que
+        ya se han sobrescrito.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def storage(self):
+        """Tupla ``(times, columns)`` con el vector de instantes y la lista
+        de vectores de códigos en los que se guardan las muestras. La
+        muestra número ``n`` ocupa la posición ``n % capacity``. Si el
+        búfer guarda los instantes en nanosegundos, ``times`` es un
+        vector :mod:`ctypes` de ``int64``.
+
+        Permite a los motores de muestreo nativos escribir directamente
+        en el búfer; tras hacerlo deben invocar :meth:`advance`.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._times, self._columns
+
+    def __len__(self):
+        return min(self._count, self._capacity)
+
+    def advance(self, n_count):
+        """Da por añadidas las siguientes ``n_count`` muestras, que ya se han
+        escrito directamente en :attr:`storage`.
+
+        :param n_count: Número de muestras escritas.
+        """
+        self._count += n_count
+
+    def append(self, time, code):
+        """Añade una muestra con un único código a la primera columna.
+
+        :param time: Instante de la muestra (en nanosegundos enteros si
+            el búfer guarda los instantes en nanosegundos).
+        :param code: Código de la muestra.
+        """
+        index = self._count % self._capacity
+        self._times[index] = time
+        self._columns[0][index] = code
+        # The sample becomes visible once it has been completely written
+        self._count += 1
+
+    def append_row(self, time, codes):
+        """Añade una muestra con un código por columna.
+
+        :param time: Instante de la muestra (ver :meth:`append`).
+        :param codes: Secuencia con los códigos de cada columna.
+        """
+        index = self._count % self._capacity
+        self._times[index] = time
+        for column, code in zip(self._columns, codes):
+            column[index] = code
+        self._count += 1
+
+    def view(self, n_count=0, convert=None):
+        """Devuelve una vista de las últimas muestras del búfer, sin copiar
+        los datos.
+
+        :param n_count: Número de muestras a incluir en la vista. El valor
+            por defecto 0 incluye todas las muestras conservadas.
+        :param convert: Función que se aplica a cada código al leer la
+            vista. Puede ser una única función o una lista con una
+            función por columna.
+        """
+        stop = self._count
+        start = max(stop - self._capacity, 0)
+        if n_count > 0:
+            start = max(stop - n_count, start)
+        return SampleView(self, start, stop, convert)
+
+    def view_since(self, position, convert=None):
+        """Devuelve una vista, sin copiar los datos, de las muestras
+        añadidas a partir de la muestra número ``position`` (ver
+        :attr:`count`). Si alguna de ellas ya se ha sobrescrito, la vista
+        empieza en la muestra conservada más antigua.
+
+        :param position: Número de la primera muestra de la vista.
+        :param convert: Función que se aplica a cada código al leer la
+            vista (ver :meth:`view`).
+        """
+        stop = self._count
+        start = max(position, stop - self._capacity, 0)
+        return SampleView(self, min(start, stop), stop, convert)
+
+class SharedSampleBuffer(SampleBuffer):
+    """Búfer circular como :class:`SampleBuffer` cuya memoria, incluido el
+    número de muestras añadidas, se proyecta en memoria compartida
+    anónima. Los procesos hijos creados después del búfer (por ejemplo con
+    :mod:`multiprocessing`) comparten su contenido con el proceso padre.
+
+    El búfer no usa cierres: un único proceso debe añadir muestras y el
+    resto sólo leerlas. Cada muestra se escribe por completo antes de
+    incrementar :attr:`count`, y el nuevo valor se publica tras una barrera
+    de memoria (ver :func:`pida.sampling.store_count`), por lo que los
+    lectores de otros procesos nunca ven muestras a medio escribir, aunque
+    sí pueden ver sobrescritas las más antiguas (ver :class:`SampleView`).
+
+    .. note:: Las barreras requieren el módulo nativo :mod:`pida.sampling`.
+        Sin él, sólo es seguro leer el búfer desde otro proceso en
+        arquitecturas que no reordenan las escrituras, como x86.
+
+    :param capacity: Número máximo de muestras que se conservan.
+    :param width: Número de códigos (columnas) de cada muestra.
+    :param nanoseconds: Si es verdadero, los instantes se guardan en
+        nanosegundos enteros.
+    """
+
+    def __init__(self, capacity, width=1, nanoseconds=False):
+        if capacity <= 0 or width <= 0:
+            raise ValueError("Positive number expected")
+        count_size = ctypes.sizeof(ctypes.c_int64)
+        size = count_size + int(capacity) * (8 + int(width) * ctypes.sizeof(ctypes.c_int))
+        self._map = mmap.mmap(-1, size)
+        self._shared_count = ctypes.c_int64.from_buffer(self._map, 0)
+        SampleBuffer.__init__(self, capacity, width, nanoseconds)
+
+    def _allocate(self):
+        time_type = ctypes.c_int64 if self._nanoseconds else ctypes.c_double
+        offset = ctypes.sizeof(ctypes.c_int64)
+        times = (time_type * self._capacity).from_buffer(self._map, offset)
+        offset += ctypes.sizeof(times)
+        columns = []
+        for _ in range(self._width):
+            columns.append((ctypes.c_int * self._capacity).from_buffer(self._map, offset))
+            offset += ctypes.sizeof(columns[-1])
+        return times, columns
+
+    @property
+    def _count(self):
+        if load_count is None:
+            return self._shared_count.value
+        return load_count(self._shared_count)
+
+    @_count.setter
+    def _count(self, count):
+        if store_count is None:
+            self._shared_count.value = count
+        else:
+            store_count(self._shared_count, count)
+
+class SampleView(object):
+    """Vista de un rango de muestras de un :class:`SampleBuffer`.
+
+    Crear una vista tiene un coste constante: la vista comparte la
+    memoria del búfer y cada muestra se lee cuando se accede a ella. Se
+    comporta como una secuencia cuyos elementos son listas
+    ``[tiempo, valor, ...]`` con un valor por columna.
+
+    .. warning:: La vista no impide que el búfer siga recibiendo muestras.
+        Si se añaden más muestras que su capacidad, las más antiguas de la
+        vista se sobrescriben. Use :meth:`tolist`, :meth:`times` o
+        :meth:`codes` para obtener una copia.
+    """
+
+    def __init__(self, buffer, start, stop, convert=None):
+        self._buffer = buffer
+        self._start = start
+        self._stop = stop
+        if convert is None:
+            convert = int
+        if callable(convert):
+            convert = [convert] * buffer.width
+        self._convert = convert
+
+    def __len__(self):
+        return self._stop - self._start
+
+    @property
+    def start(self):
+        """Número de la primera muestra de la vista en el búfer (ver
+        :attr:`SampleBuffer.count`).
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._start
+
+    @property
+    def stop(self):
+        """Número de la muestra siguiente a la última de la vista.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._stop
+
+    def _row(self, position):
+        buffer = self._buffer
+        index = position % buffer.capacity
+        if buffer._nanoseconds:
+            row = [buffer._times[index] * 1e-9]
+        else:
+            row = [buffer._times[index]]
+        for column, convert in zip(buffer._columns, self._convert):
+            row.append(convert(column[index]))
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("Slice step not supported")
+            stop = max(start, stop)
+            return SampleView(self._buffer, self._start + start,
+                              self._start + stop, self._convert)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Sample index out of range")
+        return self._row(self._start + key)
+
+    def __iter__(self):
+        for position in range(self._start, self._stop):
+            yield self._row(position)
+
+    def _copy(self, source, typecode):
+        capacity = self._buffer.capacity
+        first = self._start % capacity
+        last = first + len(self)
+        if last <= capacity:
+            result = source[first:last]
+        else:
+            result = source[first:] + source[:last - capacity]
+        if not isinstance(result, array):
+            # ctypes storage (SharedSampleBuffer) slices into lists
+            result = array(typecode, result)
+        return result
+
+    def times(self):
+        """Devuelve un vector (:class:`array.array`) con una copia de los
+        instantes en segundos de las muestras de la vista."""
+        if self._buffer._nanoseconds:
+            return array('d', [t * 1e-9 for t in self.times_ns()])
+        return self._copy(self._buffer._times, 'd')
+
+    def times_ns(self):
+        """Devuelve un vector :mod:`ctypes` de ``int64`` con una copia de los
+        instantes en nanosegundos de las muestras de la vista.
+
+        Eleva una excepción :exc:`ValueError` si el búfer no guarda los
+        instantes en nanosegundos.
+        """
+        buffer = self._buffer
+        if not buffer._nanoseconds:
+            raise ValueError("Buffer does not store nanoseconds")
+        size = ctypes.sizeof(ctypes.c_int64)
+        result = (ctypes.c_int64 * len(self))()
+        first = self._start % buffer.capacity
+        head = min(len(self), buffer.capacity - first)
+        ctypes.memmove(result, ctypes.addressof(buffer._times) + first * size, head * size)
+        ctypes.memmove(ctypes.addressof(result) + head * size, buffer._times,
+                       (len(self) - head) * size)
+        return result
+
+    def codes(self, column=0):
+        """Devuelve un vector (:class:`array.array`) con una copia de los
+        códigos de una columna de la vista.
+
+        :param column: Columna cuyos códigos se devuelven.
+        """
+        return self._copy(self._buffer._columns[column], 'i')
+
+    def tolist(self):
+        """Devuelve una lista con una copia de las muestras de la vista."""
+        return list(self)
@@ -105,13 +105,48 @@ class ADC(Converter):
         """
         pass
 
+    def read_codes(self, channels):
+        """Realiza una lectura de varios canales del conversor
+        analógico/digital y devuelve la lista de códigos leídos.
+
+        :param channels: Lista de canales del conversor que quieren
+            leerse. Un mismo canal puede aparecer varias veces.
+
+        La implementación por defecto invoca :meth:`read_code` por cada
+        canal. Los conversores cuyas lecturas puedan agruparse en una
+        única transferencia del enlace de datos deben redefinirlo.
+        """
+        return [self.read_code(channel) for channel in channels]
+
+    def sampling_frame(self, channel):
+        """Describe la lectura de un canal del conversor para los motores
+        de muestreo nativos (ver :mod:`pida.sampling`).
+
+        Devuelve una tupla ``(request, shift, mask)`` con la trama a
+        enviar y la forma de extraer el código de la respuesta: ésta se
+        interpreta como un entero big-endian, se desplaza ``shift`` bits
+        a la derecha y se le aplica la máscara ``mask``. Devuelve
+        ``None`` si las lecturas del conversor no pueden describirse así,
+        que es el comportamiento por defecto.
+
+        :param channel: Canal del conversor que quiere leerse.
+        """
+        return None
+
     def read(self, channel):
         """Realiza una lectura de un canal del conversor analógico/digital
         y devuelve su valor en voltios.
 
         :param channel: Canal del conversor que quiere leerse.
         """
-        return self.read_code(channel) * self.vref / self.levels
+        return self.to_volts(self.read_code(channel))
+
+    def to_volts(self, code):
+        """Convierte un código leído del conversor en su valor en voltios.
+
+        :param code: Código a convertir.
+        """
+        return code * self.vref / self.levels
 
 class DAC(Converter):
     """Clase base abstracta para controlar convertidores de datos
@@ -146,7 +181,30 @@ class DAC(Converter):
         :param channel: Canal del conversor que quiere escribirse.
         :type channel: :class:`Number`
         """
-        return self.write_code(int(value * self.vref / self.levels), channel)
+        return self.write_code(self.to_code(value), channel)
+
+    def to_code(self, value):
+        """Convierte un valor en voltios en el código más próximo que puede
+        escribirse en el conversor, limitado a su rango.
+
+        :param value: Valor a convertir en voltios.
+        """
+        code = int(round(value * self.levels / self.vref))
+        return min(max(code, 0), self.levels - 1)
+
+    def output_frame(self, code, channel):
+        """Describe la escritura de un código para los motores de
+        reproducción nativos (ver :mod:`pida.playback`).
+
+        Devuelve la trama (``bytes``) que fija el código en el canal con una
+        única transferencia del enlace de datos, o ``None`` si las
+        escrituras del conversor no pueden describirse así, que es el
+        comportamiento por defecto.
+
+        :param code: Código del valor a escribir.
+        :param channel: Canal del conversor que quiere escribirse.
+        """
+        return None
 
 class MCP3002(ADC):
     """Clase para gestionar el convertidor analógico/digital Microchip
@@ -157,11 +215,27 @@ class MCP3002(ADC):
     """
     def __init__(self, vref, data_link=None):
         ADC.__init__(self, 2, 10, vref, data_link)
+        self._requests = [bytes(bytearray(self._request(channel)))
+                          for channel in range(self.channels)]
 
-    def read_code(self, channel):
-        result = self._data_link.transfer([1, (2+channel) << 6, 0])
+    def _request(self, channel):
+        return [1, (2+channel) << 6, 0]
+
+    def _decode(self, result):
         return ((result[1] & 0b00011111) << 6) + (result[2]>>2)
 
+    def read_code(self, channel):
+        result = bytearray(3)
+        self._data_link.transfer_into(self._requests[channel], result)
+        return self._decode(result)
+
+    def read_codes(self, channels):
+        requests = [self._request(channel) for channel in channels]
+        return [self._decode(result) for result in self._data_link.transfer_batch(requests)]
+
+    def sampling_frame(self, channel):
+        return (self._requests[channel], 2, 0b11111111111)
+
 class MCP3202(ADC):
     """Clase para gestionar el convertidor analógico/digital Microchip
     MCP3202.
@@ -199,11 +273,27 @@ class MCP3202(ADC):
     """
     def __init__(self, vref, data_link=None):
         ADC.__init__(self, 2, 12, vref, data_link)
+        self._requests = [bytes(bytearray(self._request(channel)))
+                          for channel in range(self.channels)]
 
-    def read_code(self, channel):
-        result = self._data_link.transfer([1, (2+channel) << 6, 0])
+    def _request(self, channel):
+        return [1, (2+channel) << 6, 0]
+
+    def _decode(self, result):
         return ((result[1] & 0b00001111) << 8) + result[2]
 
+    def read_code(self, channel):
+        result = bytearray(3)
+        self._data_link.transfer_into(self._requests[channel], result)
+        return self._decode(result)
+
+    def read_codes(self, channels):
+        requests = [self._request(channel) for channel in channels]
+        return [self._decode(result) for result in self._data_link.transfer_batch(requests)]
+
+    def sampling_frame(self, channel):
+        return (self._requests[channel], 0, 0b111111111111)
+
 class MCP4802(DAC):
     """Clase para gestionar el convertidor digital/analógico Microchip
     MCP4802.
@@ -215,6 +305,9 @@ class MCP4802(DAC):
         DAC.__init__(self, 2, 8, vref, data_link)
 
     def write_code(self, value, channel):
-        byte1 = (channel << 7) + (0b011 << 4) + (value >> 4)
-        byte2 = (value << 4) & 0xFF
-        self._data_link.transfer([byte1, byte2])
+        self._data_link.transfer(list(bytearray(self.output_frame(value, channel))))
+
+    def output_frame(self, code, channel):
+        byte1 = (channel << 7) + (0b011 << 4) + (code >> 4)
+        byte2 = (code << 4) & 0xFF
+        return bytes(bytearray([byte1, byte2]))
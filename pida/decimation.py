@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye la etapa de sobremuestreo y diezmado de las
+adquisiciones de datos.
+
+Promediar ``K`` conversiones de un conversor cuyo ruido es mayor que un
+nivel de cuantificación divide el ruido por la raíz cuadrada de ``K``, lo
+que equivale a ganar ``log2(K) / 2`` bits de resolución:
+con ``K = 16`` un MCP3202 de 12 bits se comporta como un conversor de 14
+bits, a cambio de dividir por 16 la frecuencia de muestreo.
+
+Ejemplo de adquisición a 100Hz en la que cada muestra es la media de 64
+conversiones, guardando además su envolvente::
+
+    decimation = Decimator(64, envelope=True)
+    acquisition = SynchronousAcquisition(channel, 0, 100, decimation=decimation)
+"""
+import math
+
+CIC_REGISTER_BITS = 64
+"""Número de bits de los registros de los filtros CIC. Las sumas se hacen
+en aritmética modular, por lo que los integradores nunca desbordan el
+resultado siempre que éste quepa en el registro."""
+
+class Decimator(object):
+    """Configuración de la etapa de diezmado de una adquisición: cada
+    muestra guardada se calcula a partir de ``factor`` conversiones leídas
+    en una única transferencia por lotes del enlace de datos.
+
+    Con ``order`` 1 cada muestra es la media de su bloque de conversiones
+    (un filtro de media móvil diezmado). Con un orden mayor se usa un
+    filtro CIC (*cascaded integrator-comb*) de ese orden, que atenúa más
+    el ruido fuera de banda; sus primeras ``order - 1`` muestras son
+    transitorias.
+
+    Las muestras se guardan como códigos escalados por ``factor`` (la
+    suma del bloque, en el caso de orden 1), de forma que no se pierde la
+    resolución ganada. :meth:`pida.acquisitions.Acquisition.get_data`
+    deshace el escalado al convertir a voltios.
+
+    :param factor: Número de conversiones de cada muestra.
+    :param order: Orden del filtro.
+    :param envelope: Si es verdadero, se guardan también el código mínimo
+        y el máximo de cada bloque de conversiones (ver
+        :meth:`pida.acquisitions.SynchronousAcquisition.get_envelope`).
+    """
+
+    def __init__(self, factor, order=1, envelope=False):
+        if factor <= 0 or order <= 0:
+            raise ValueError("Positive number expected")
+        self._factor = int(factor)
+        self._order = int(order)
+        self._envelope = bool(envelope)
+
+    @property
+    def factor(self):
+        """Número de conversiones de cada muestra.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._factor
+
+    @property
+    def order(self):
+        """Orden del filtro.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._order
+
+    @property
+    def envelope(self):
+        """Indica si se guarda la envolvente de cada bloque de conversiones.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._envelope
+
+    @property
+    def bit_gain(self):
+        """Bits de resolución efectiva que se ganan al promediar
+        :attr:`factor` conversiones, suponiendo un ruido blanco mayor que
+        un nivel de cuantificación. La resolución efectiva de un conversor
+        es ``converter.bits + bit_gain``.
+
+        Es una propiedad de sólo lectura.
+        """
+        return 0.5 * math.log(self._factor, 2)
+
+    def effective_bits(self, bits):
+        """Devuelve la resolución efectiva en bits de las muestras de un
+        conversor de ``bits`` bits.
+
+        :param bits: Resolución del conversor.
+        """
+        return bits + self.bit_gain
+
+    def filter(self):
+        """Devuelve un filtro nuevo, con su propio estado, para una columna
+        de muestras. El filtro es una función que recibe la lista de
+        :attr:`factor` códigos de un bloque y devuelve la muestra
+        escalada.
+        """
+        if self._order == 1:
+            return sum
+        return _CICFilter(self._factor, self._order)
+
+    def scaled(self, to_volts):
+        """Devuelve la función que convierte las muestras escaladas en
+        voltios.
+
+        :param to_volts: Función de conversión de los códigos del canal
+            (ver :meth:`pida.interfaces.InputChannel.to_volts`).
+        """
+        factor = float(self._factor)
+        return lambda code: to_volts(code / factor)
+
+class _CICFilter(object):
+    # Cascaded integrator-comb decimator with unit differential delay,
+    # normalised to a gain equal to the decimation factor
+
+    def __init__(self, factor, order):
+        self._integrators = [0] * order
+        self._combs = [0] * order
+        self._mask = (1 << CIC_REGISTER_BITS) - 1
+        self._divisor = factor ** (order - 1)
+
+    def __call__(self, codes):
+        integrators = self._integrators
+        mask = self._mask
+        stages = range(len(integrators))
+        for code in codes:
+            value = code
+            for stage in stages:
+                value = integrators[stage] = (integrators[stage] + value) & mask
+        value = integrators[-1]
+        combs = self._combs
+        for stage in stages:
+            value, combs[stage] = (value - combs[stage]) & mask, value
+        return (value + self._divisor // 2) // self._divisor
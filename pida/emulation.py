@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye emuladores software de los conversores de datos y
+de sus enlaces de datos. Permiten usar las adquisiciones, los
+conversores y las interfaces sin hardware, por ejemplo para medir su
+rendimiento o en pruebas automáticas.
+
+Ejemplo de uso de la interfaz Gertboard emulada, con una señal senoidal
+de 50Hz en el canal 0 del ADC:
+
+>>> from pida.interfaces import InterfaceBuilder
+>>> from pida.emulation import EmulatedLinkFactory, Sine, DC
+>>> factory = EmulatedLinkFactory({(0, 0): [Sine(1.0, 50, 1.5), DC(3.0)]})
+>>> gertboard = InterfaceBuilder(factory).build("Gertboard")
+>>> acquisition = gertboard.get_channel_by_id(0).acquire(1000, 10000)
+"""
+from abc import ABCMeta, abstractmethod
+from math import pi, sin
+import os
+import random
+import select
+import tempfile
+from pida.clock import time, sleep
+from pida.links import FullDuplexDataLink, SPIDataLinkConfiguration
+from pida.converters import MCP3002, MCP3202, MCP4802
+from pida.gpio import REGISTERS_SIZE
+
+# Waveforms
+
+class Waveform(object):
+    """Clase base abstracta para la definición de señales analógicas que
+    se aplican a las entradas de los conversores emulados.
+    """
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def __call__(self, t):
+        """Devuelve el valor en voltios de la señal en un instante.
+
+        :param t: Instante en segundos desde que se abrió el enlace de datos.
+
+        .. warning:: Es un método abstracto que debe ser implementado por todas las clases que hereden de ésta.
+        """
+        pass
+
+class DC(Waveform):
+    """Señal continua.
+
+    :param value: Valor en voltios de la señal.
+    """
+
+    def __init__(self, value):
+        self._value = value
+
+    def __call__(self, t):
+        return self._value
+
+class Sine(Waveform):
+    """Señal senoidal.
+
+    :param amplitude: Amplitud en voltios.
+    :param frequency: Frecuencia en hertzios.
+    :param offset: Componente continua en voltios.
+    :param phase: Fase inicial en radianes.
+    """
+
+    def __init__(self, amplitude, frequency, offset=0.0, phase=0.0):
+        self._amplitude = amplitude
+        self._frequency = frequency
+        self._offset = offset
+        self._phase = phase
+
+    def __call__(self, t):
+        return self._offset + self._amplitude * sin(2 * pi * self._frequency * t + self._phase)
+
+class Noise(Waveform):
+    """Ruido blanco gaussiano.
+
+    :param mean: Valor medio en voltios.
+    :param deviation: Desviación típica en voltios.
+    :param seed: Semilla del generador de números aleatorios, para
+        obtener secuencias reproducibles.
+    """
+
+    def __init__(self, mean, deviation, seed=None):
+        self._mean = mean
+        self._deviation = deviation
+        self._random = random.Random(seed)
+
+    def __call__(self, t):
+        return self._random.gauss(self._mean, self._deviation)
+
+class Recording(Waveform):
+    """Señal grabada previamente, muestreada a una frecuencia constante.
+
+    :param values: Secuencia de valores en voltios.
+    :param sampling_rate: Frecuencia de muestreo de la grabación en hertzios.
+    :param loop: Si es verdadero la grabación se repite indefinidamente;
+        si no, tras el último valor la señal se mantiene en él.
+    """
+
+    def __init__(self, values, sampling_rate, loop=True):
+        if not values:
+            raise ValueError("Empty recording")
+        self._values = list(values)
+        self._sampling_rate = sampling_rate
+        self._loop = loop
+
+    @classmethod
+    def from_file(cls, filename, sampling_rate, loop=True):
+        """Crea una señal a partir de un fichero de texto con un valor por
+        línea. Si las líneas tienen varias columnas se usa la última, por
+        lo que se admite la salida de
+        :meth:`pida.acquisitions.Acquisition.print_data`. Las líneas que no
+        terminan en un número se ignoran.
+
+        :param filename: Ruta del fichero.
+        :param sampling_rate: Frecuencia de muestreo de la grabación en hertzios.
+        :param loop: Si es verdadero la grabación se repite indefinidamente.
+        """
+        values = []
+        with open(filename) as fd:
+            for line in fd:
+                fields = line.replace(',', ' ').split()
+                try:
+                    values.append(float(fields[-1]))
+                except (IndexError, ValueError):
+                    pass
+        return cls(values, sampling_rate, loop)
+
+    def __call__(self, t):
+        index = int(t * self._sampling_rate)
+        if self._loop:
+            return self._values[index % len(self._values)]
+        return self._values[min(index, len(self._values) - 1)]
+
+# Devices
+
+class Device(object):
+    """Clase base abstracta para la definición de dispositivos emulados
+    conectados a un enlace de datos.
+
+    :param vref: Tensión de referencia del dispositivo.
+    :param bits: Resolución en bits del dispositivo.
+    """
+    __metaclass__ = ABCMeta
+
+    def __init__(self, vref, bits):
+        self._vref = vref * 1.0
+        self._levels = 2 ** bits
+
+    @abstractmethod
+    def respond(self, frame, t):
+        """Procesa una trama recibida por el dispositivo y devuelve la
+        respuesta.
+
+        :param frame: Trama recibida. Es una secuencia de bytes.
+        :param t: Instante de la transferencia en segundos desde que se
+            abrió el enlace de datos.
+
+        Eleva una excepción :exc:`ValueError` si la trama no es una orden
+        válida para el dispositivo.
+
+        .. warning:: Es un método abstracto que debe ser implementado por todas las clases que hereden de ésta.
+        """
+        pass
+
+    def to_code(self, value):
+        """Convierte un valor en voltios en el código del dispositivo,
+        saturándolo a sus niveles mínimo y máximo.
+
+        :param value: Valor a convertir.
+        """
+        code = int(round(value * self._levels / self._vref))
+        return min(max(code, 0), self._levels - 1)
+
+class MCP3x02Device(Device):
+    """Clase base para los ADC emulados de la familia MCP3x02.
+
+    :param vref: Tensión de referencia del conversor.
+    :param bits: Resolución en bits del conversor.
+    :param waveforms: Lista con la señal aplicada a cada canal. Los canales
+        sin señal se mantienen a 0V.
+    """
+
+    def __init__(self, vref, bits, waveforms=None):
+        Device.__init__(self, vref, bits)
+        waveforms = list(waveforms or [])
+        self._waveforms = waveforms + [DC(0.0)] * (2 - len(waveforms))
+
+    def _channel(self, frame):
+        # Start bit, then single-ended mode and channel in the second byte
+        if len(frame) != 3 or frame[0] != 1 or not frame[1] & 0x80:
+            raise ValueError("Unexpected frame")
+        return (frame[1] >> 6) & 1
+
+    def _code(self, frame, t):
+        return self.to_code(self._waveforms[self._channel(frame)](t))
+
+class MCP3002Device(MCP3x02Device):
+    """ADC Microchip MCP3002 emulado.
+
+    :param vref: Tensión de referencia del conversor.
+    :param waveforms: Lista con la señal aplicada a cada canal.
+    """
+
+    def __init__(self, vref, waveforms=None):
+        MCP3x02Device.__init__(self, vref, 10, waveforms)
+
+    def respond(self, frame, t):
+        code = self._code(frame, t)
+        return [0, (code >> 6) & 0b00011111, (code << 2) & 0xFF]
+
+class MCP3202Device(MCP3x02Device):
+    """ADC Microchip MCP3202 emulado.
+
+    :param vref: Tensión de referencia del conversor.
+    :param waveforms: Lista con la señal aplicada a cada canal.
+    """
+
+    def __init__(self, vref, waveforms=None):
+        MCP3x02Device.__init__(self, vref, 12, waveforms)
+
+    def respond(self, frame, t):
+        code = self._code(frame, t)
+        return [0, (code >> 8) & 0b00001111, code & 0xFF]
+
+class MCP4802Device(Device):
+    """DAC Microchip MCP4802 emulado. Guarda el último código escrito en
+    cada canal.
+
+    :param vref: Tensión de referencia del conversor.
+    """
+
+    def __init__(self, vref, waveforms=None):
+        Device.__init__(self, vref, 8)
+        self._codes = [0, 0]
+        self._writes = 0
+
+    @property
+    def codes(self):
+        """Lista con el último código escrito en cada canal.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._codes)
+
+    @property
+    def writes(self):
+        """Número de escrituras recibidas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._writes
+
+    def respond(self, frame, t):
+        if len(frame) != 2:
+            raise ValueError("Unexpected frame")
+        self._codes[frame[0] >> 7] = ((frame[0] & 0x0F) << 4) + (frame[1] >> 4)
+        self._writes += 1
+        return [0, 0]
+
+DEVICES = {
+    MCP3002: MCP3002Device,
+    MCP3202: MCP3202Device,
+    MCP4802: MCP4802Device,
+}
+"""Dispositivo emulado que corresponde a cada clase de conversor."""
+
+def emulate(converter, waveforms=None):
+    """Devuelve el dispositivo emulado que corresponde a un conversor.
+
+    :param converter: Conversor (:class:`pida.converters.Converter`) a emular.
+    :param waveforms: Lista con la señal aplicada a cada canal, si el
+        conversor es un ADC.
+
+    Eleva una excepción :exc:`ValueError` si no hay emulador para el conversor.
+    """
+    for converter_class, device_class in DEVICES.items():
+        if isinstance(converter, converter_class):
+            return device_class(converter.vref, waveforms)
+    raise ValueError("Unknown converter")
+
+# GPIO
+
+TMPFS_DIR = '/dev/shm'
+"""Directorio de un sistema de ficheros en memoria (``tmpfs``) en el que
+se crean por defecto las réplicas de :func:`emulate_gpio`."""
+
+def emulate_gpio(numbers, directory=None):
+    """Crea una réplica del directorio ``sysfs`` de las GPIO con los
+    ficheros ``export``, ``unexport`` y, para cada GPIO, ``value``,
+    ``direction`` y ``edge``, y devuelve su ruta terminada en ``/``. Se
+    puede usar como ``root`` de :class:`pida.gpio.GPIO` para medir el
+    coste de sus operaciones o probarlas sin hardware. Las esperas de
+    flancos no pueden emularse con estos ficheros (ver
+    :class:`EmulatedEdgeSource`).
+
+    :param numbers: Lista de números de las GPIO.
+    :param directory: Directorio en el que se crea la réplica. Por
+        defecto, :data:`TMPFS_DIR` si existe o el directorio temporal del
+        sistema.
+    """
+    if directory is None and os.path.isdir(TMPFS_DIR):
+        directory = TMPFS_DIR
+    root = tempfile.mkdtemp(prefix='gpio', dir=directory)
+    files = {'export': '', 'unexport': ''}
+    for number in numbers:
+        os.mkdir(os.path.join(root, 'gpio{}'.format(number)))
+        files['gpio{}/value'.format(number)] = '0\n'
+        files['gpio{}/direction'.format(number)] = 'in\n'
+        files['gpio{}/edge'.format(number)] = 'none\n'
+    for name, content in files.items():
+        with open(os.path.join(root, name), 'w') as f:
+            f.write(content)
+    return root + '/'
+
+def emulate_gpio_registers(directory=None):
+    """Crea un fichero a cero del tamaño del bloque de registros de GPIO y
+    devuelve su ruta. Se puede proyectar con
+    :class:`pida.gpio.GPIORegisters` para probar la implementación
+    :data:`pida.gpio.GPIOMEM` o medir su rendimiento sin hardware.
+
+    :param directory: Directorio en el que se crea el fichero (ver
+        :func:`emulate_gpio`).
+    """
+    if directory is None and os.path.isdir(TMPFS_DIR):
+        directory = TMPFS_DIR
+    fd, path = tempfile.mkstemp(prefix='gpiomem', dir=directory)
+    try:
+        os.write(fd, b'\0' * REGISTERS_SIZE)
+    finally:
+        os.close(fd)
+    return path
+
+class EmulatedEdgeSource(object):
+    """Fuente de flancos emulada sobre una tubería, que puede registrarse
+    en un :class:`pida.gpio.GPIOEventLoop` en lugar de una GPIO. Cada
+    llamada a :meth:`drive` señala un flanco.
+
+    :param number: Número de la GPIO emulada.
+    """
+
+    epoll_events = select.EPOLLIN
+
+    def __init__(self, number):
+        self._number = number
+        self._read_fd, self._write_fd = os.pipe()
+        self.edge = None
+
+    @property
+    def number(self):
+        """Número de la GPIO emulada.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._number
+
+    def fileno(self):
+        """Devuelve el descriptor del extremo de lectura de la tubería."""
+        return self._read_fd
+
+    def drive(self, status):
+        """Cambia el nivel de la GPIO emulada, señalando un flanco.
+
+        :param status: Nuevo nivel (:class:`pida.gpio.Status`).
+        """
+        os.write(self._write_fd, status.value)
+
+    def close(self):
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+# Links
+
+DEFAULT_OVERHEAD = 100e-6
+"""Coste fijo por defecto de cada transferencia en segundos. Se
+corresponde con el tiempo por petición a altas velocidades de reloj
+SPI medido en Raspberry Pi (``spi_avrg.dat``)."""
+
+DEFAULT_BIT_COST = 2.1
+"""Número por defecto de periodos del reloj SPI que cuesta cada bit
+transferido, ajustado a las medidas de ``spi_avrg.dat``."""
+
+class EmulatedSPIDataLink(FullDuplexDataLink):
+    """Enlace de datos SPI emulado, conectado a un dispositivo emulado.
+
+    Cada transferencia tarda ``overhead`` segundos más el tiempo de
+    transmitir sus bits, cada uno de ``bit_cost`` periodos del reloj SPI.
+    La espera se hace sin retener el GIL, igual que la llamada al sistema
+    de un enlace real. Una transferencia por lotes paga el coste fijo una
+    única vez.
+
+    :param device: Dispositivo emulado (:class:`Device`).
+    :param configuration: Configuración (:class:`pida.links.SPIDataLinkConfiguration`)
+        del enlace. Por defecto, modo 0 a 1MHz.
+    :param overhead: Coste fijo de cada transferencia en segundos.
+    :param bit_cost: Periodos del reloj SPI que cuesta cada bit.
+    """
+
+    def __init__(self, device, configuration=None, overhead=DEFAULT_OVERHEAD,
+                 bit_cost=DEFAULT_BIT_COST):
+        self._device = device
+        self._configuration = configuration or SPIDataLinkConfiguration(0, 1000000)
+        self._overhead = overhead
+        self._bit_cost = bit_cost
+        self._open_time = None
+        self._transfers = 0
+
+    @property
+    def device(self):
+        """Dispositivo emulado conectado al enlace.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._device
+
+    @property
+    def transfers(self):
+        """Número de transferencias (llamadas al sistema emuladas)
+        realizadas por el enlace.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._transfers
+
+    @property
+    def max_speed_hz(self):
+        return self._configuration.max_speed_hz
+
+    @property
+    def mode(self):
+        return self._configuration.mode
+
+    def open(self):
+        self._open_time = time()
+
+    def close(self):
+        self._open_time = None
+
+    def _elapse(self, start, n_bytes):
+        self._transfers += 1
+        duration = self._overhead + 8 * n_bytes * self._bit_cost / self.max_speed_hz
+        if duration > 0:
+            sleep(start + duration)
+
+    def transfer(self, data):
+        if self._open_time is None:
+            raise IOError("Link not open")
+        start = time()
+        response = self._device.respond(data, start - self._open_time)
+        self._elapse(start, len(data))
+        return response
+
+    def transfer_batch(self, frames):
+        if self._open_time is None:
+            raise IOError("Link not open")
+        start = time()
+        responses = [self._device.respond(frame, start - self._open_time) for frame in frames]
+        self._elapse(start, sum(len(frame) for frame in frames))
+        return responses
+
+    def transfer_into(self, data, response):
+        data = bytearray(data)
+        if len(response) < len(data):
+            raise ValueError("Response buffer is shorter than data")
+        for index, byte in enumerate(self.transfer(data)):
+            response[index] = byte
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+class EmulatedLinkFactory(object):
+    """Fábrica de enlaces de datos emulados para
+    :class:`pida.interfaces.InterfaceBuilder`. Conecta cada conversor de
+    la interfaz a un enlace emulado con el dispositivo que le corresponde.
+
+    :param waveforms: Diccionario que asocia a cada par ``(bus, device)``
+        del enlace la lista de señales aplicadas a los canales del ADC
+        conectado a él. Los canales sin señal se mantienen a 0V.
+    :param overhead: Coste fijo de cada transferencia en segundos.
+    :param bit_cost: Periodos del reloj SPI que cuesta cada bit.
+    """
+
+    def __init__(self, waveforms=None, overhead=DEFAULT_OVERHEAD, bit_cost=DEFAULT_BIT_COST):
+        self._waveforms = dict(waveforms or {})
+        self._overhead = overhead
+        self._bit_cost = bit_cost
+
+    def __call__(self, bus, device, configuration, converter):
+        emulated = emulate(converter, self._waveforms.get((bus, device)))
+        return EmulatedSPIDataLink(emulated, configuration, self._overhead, self._bit_cost)
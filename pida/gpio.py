@@ -1,11 +1,47 @@
 # -*- coding: utf-8 -*-
-"""Este módulo incluye clases para gestionar las E/S de propósito general."""
+"""Este módulo incluye clases para gestionar las E/S de propósito general.
+
+Las GPIO pueden gestionarse a través de dos implementaciones (*backends*):
+
+* :data:`SYSFS`, la interfaz ``/sys/class/gpio`` del núcleo. Permite
+  esperar flancos, pero cada operación es una llamada al sistema.
+* :data:`GPIOMEM`, los registros del controlador de GPIO del BCM2835
+  proyectados en memoria a través de ``/dev/gpiomem``
+  (:class:`GPIORegisters`). Cada operación es un acceso a memoria, y
+  varias GPIO pueden cambiarse con una única escritura en un registro.
+
+Ejemplo de uso de los registros::
+
+    with GPIO(18, backend=GPIOMEM) as led:
+        led.direction = Direction.OUTPUT
+        led.status = Status.HIGH
+"""
+from array import array
+from collections import namedtuple
 from enum import Enum
+from threading import Condition, Thread
+import ctypes
+import errno
+import mmap
+import os
 import select
-from pida.clock import sleep
+from pida.clock import sleep, time, time_ns
+try:
+    from pida import gpiocore
+except ImportError:
+    gpiocore = None
 
 SYSFS_GPIO_DIR = "/sys/class/gpio/"
 
+SYSFS = 'sysfs'
+"""Implementación de las GPIO sobre ``/sys/class/gpio``."""
+
+GPIOMEM = 'gpiomem'
+"""Implementación de las GPIO sobre los registros proyectados en memoria
+(ver :class:`GPIORegisters`)."""
+
+GPIOMEM_DEVICE = "/dev/gpiomem"
+
 class Direction(Enum):
     INPUT = "in"
     OUTPUT = "out"
@@ -20,16 +56,53 @@ class Edge(Enum):
     FALLING = "falling"
     BOTH = "both"
     
+STATUSES = (Status.LOW, Status.HIGH)
+
+MAX_WAIT_TIME = (2 ** 31 - 1) / 1000.0
+"""Tiempo máximo en segundos de una espera de flancos (unos 24,8 días),
+el mayor que admite ``epoll_wait`` en milisegundos. Los tiempos de espera
+mayores se limitan a este valor."""
+
+def _epoll_timeout(timeout):
+    # Timeout argument of epoll.poll for a timeout in seconds or None
+    return -1 if timeout is None else min(timeout, MAX_WAIT_TIME)
+
+EDGE_EVENTS = select.EPOLLPRI | select.EPOLLERR
+"""Sucesos de ``epoll`` con los que el núcleo señala los flancos en el
+fichero ``value`` de una GPIO."""
+
 class GPIO(object):
     """Clase para gestionar una entrada/salida de propósito general
     (GPIO = General Purpose Input/Output).
+
+    Los ficheros ``value``, ``direction`` y ``edge`` de la GPIO se abren
+    la primera vez que se usan y permanecen abiertos hasta :meth:`close`,
+    de forma que cada lectura o escritura es una única llamada al
+    sistema en la posición 0 del fichero.
     
     :param id: identificador de la entrada/salida de propósito general.
+    :param root: directorio del sistema de ficheros ``sysfs`` de las GPIO.
+        Puede apuntar a una réplica en otro sistema de ficheros (ver
+        :func:`pida.emulation.emulate_gpio`).
+    :param backend: implementación: :data:`SYSFS` (por defecto),
+        :data:`GPIOMEM` o un bloque de registros (:class:`GPIORegisters`).
+        Con una implementación distinta de :data:`SYSFS` se crea un
+        :class:`RegisterGPIO`.
     """
 
-    def __init__(self, number):
+    def __new__(cls, number, root=SYSFS_GPIO_DIR, backend=SYSFS):
+        if cls is GPIO and backend != SYSFS:
+            cls = RegisterGPIO
+        return object.__new__(cls)
+
+    epoll_events = EDGE_EVENTS
+
+    def __init__(self, number, root=SYSFS_GPIO_DIR, backend=SYSFS):
         self._number = number
-        self._path = SYSFS_GPIO_DIR + "gpio" + str(number) + "/"
+        self._root = root
+        self._path = root + "gpio" + str(number) + "/"
+        self._fds = {}
+        self._poller = None
 
     def _write(self, filename, value):
         with open(filename, "w") as fd:
@@ -38,37 +111,134 @@ class GPIO(object):
     def _read(self, filename):
         with open(filename, "r") as fd:
             return fd.read().rstrip()
+
+    def _fd(self, name):
+        # Persistent descriptor of a file of the GPIO
+        fd = self._fds.get(name)
+        if fd is None:
+            try:
+                fd = os.open(self._path + name, os.O_RDWR)
+            except OSError as error:
+                if error.errno != errno.EACCES:
+                    raise
+                fd = os.open(self._path + name, os.O_RDONLY)
+            self._fds[name] = fd
+        return fd
+
+    def _get(self, name):
+        fd = self._fd(name)
+        os.lseek(fd, 0, os.SEEK_SET)
+        return os.read(fd, 64).split("\n", 1)[0].strip()
+
+    def _set(self, name, value):
+        fd = self._fd(name)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, value + "\n")
+
+    @property
+    def number(self):
+        """Número de la GPIO.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._number
+
+    def fileno(self):
+        """Devuelve el descriptor del fichero ``value`` de la GPIO."""
+        return self._fd("value")
     
     def open(self):
-        self._write(SYSFS_GPIO_DIR + "export", self._number)
+        self._write(self._root + "export", self._number)
         sleep(0.25)
 
     def close(self):
-        self._write(SYSFS_GPIO_DIR + "unexport", self._number)
+        if self._poller is not None:
+            self._poller.close()
+            self._poller = None
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        self._write(self._root + "unexport", self._number)
 
     @property
     def direction(self):
-        return Direction(self._read(self._path + "direction"))
+        return Direction(self._get("direction"))
 
     @direction.setter
     def direction(self, direction):
-        self._write(self._path + "direction", direction.value)
+        self._set("direction", direction.value)
 
     @property
     def status(self):
-        return Status(self._read(self._path + "value"))
+        if gpiocore is not None:
+            return STATUSES[gpiocore.read_value(self._fd("value"))]
+        return Status(self._get("value"))
 
     @status.setter
     def status(self, status):
-        self._write(self._path + "value", status.value)
+        if gpiocore is not None:
+            gpiocore.write_value(self._fd("value"), status is Status.HIGH)
+        else:
+            self._set("value", status.value)
 
     @property
     def edge(self):
-        return Edge(self._read(self._path + "edge"))
+        return Edge(self._get("edge"))
 
     @edge.setter
     def edge(self, edge):
-        self._write(self._path + "edge", edge.value)
+        self._set("edge", edge.value)
+
+    def write_pattern(self, bits):
+        """Escribe consecutivamente una secuencia de valores en la GPIO,
+        sin retener el GIL entre escrituras.
+
+        :param bits: Secuencia de valores (0 o 1). Un ``bytearray`` se
+            escribe sin copiarlo.
+        """
+        if not isinstance(bits, bytearray):
+            bits = bytearray(1 if bit else 0 for bit in bits)
+        fd = self._fd("value")
+        if gpiocore is not None:
+            gpiocore.write_pattern(fd, bits)
+            return
+        for bit in bits:
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, "1" if bit else "0")
+
+    def read_many(self, n_count):
+        """Lee consecutivamente ``n_count`` valores de la GPIO, sin retener
+        el GIL entre lecturas, y los devuelve en un ``bytearray`` con un
+        byte (0 o 1) por lectura.
+
+        :param n_count: Número de lecturas.
+        """
+        fd = self._fd("value")
+        if gpiocore is not None:
+            return gpiocore.read_many(fd, n_count)
+        return bytearray(self._get("value") == "1" for _ in range(n_count))
+
+    def wait_edge(self, timeout=None):
+        """Espera un flanco de la GPIO (ver :attr:`edge`) y devuelve el
+        instante en que se detectó, en nanosegundos del reloj de
+        :mod:`pida.clock` (ver :func:`pida.clock.time_ns`), o ``None`` si
+        se agota el tiempo de espera. La espera se hace sin retener el
+        GIL.
+
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        fd = self._fd("value")
+        if self._poller is None:
+            self._poller = select.epoll()
+            self._poller.register(fd, self.epoll_events)
+        if gpiocore is not None:
+            return gpiocore.wait_edge(self._poller.fileno(), fd,
+                                      -1 if timeout is None else timeout)
+        self._get("value")
+        if not self._poller.poll(_epoll_timeout(timeout)):
+            return None
+        return time_ns()
 
     def __enter__(self):
         self.open()
@@ -104,20 +274,291 @@ class GPIO(object):
         return self.GPIOStreamWriter(self._path + "value")
 
     def wait_for_edge(self):
-        poller = select.epoll()
-        with open(self._path + "value", 'r') as fd:
-            poller.register(fd, select.EPOLLIN | select.EPOLLET | select.EPOLLPRI)
-            for _ in range(2):
-                poller.poll()
-        sleep(0.001)
-        poller.close()            
-        
+        """Espera indefinidamente un flanco de la GPIO. Equivale a
+        :meth:`wait_edge` sin tiempo máximo de espera; para esperar
+        flancos de varias GPIO se usa :class:`GPIOEventLoop`."""
+        return self.wait_edge()
+
+
+# BCM2835 GPIO registers, as indexes of 32 bit words
+GPFSEL0 = 0
+GPSET0 = 7
+GPCLR0 = 10
+GPLEV0 = 13
+GPEDS0 = 16
+GPREN0 = 19
+GPFEN0 = 22
+
+REGISTERS_SIZE = 4096
+"""Tamaño en bytes de la proyección del bloque de registros de GPIO."""
+
+PINS = 54
+"""Número de GPIO del BCM2835."""
+
+FUNCTIONS = {Direction.INPUT: 0, Direction.OUTPUT: 1}
+
+class GPIORegisters(object):
+    """Bloque de registros del controlador de GPIO del BCM2835 proyectado
+    en memoria.
+
+    Los registros de activación (``GPSET``) y desactivación (``GPCLR``)
+    cambian a la vez todas las GPIO de una máscara con una única
+    escritura de 32 bits, sin afectar al resto. Las GPIO 0 a 31 están en
+    el banco 0 y las 32 a 53 en el banco 1.
+
+    :param path: Fichero que se proyecta. Por defecto, ``/dev/gpiomem``,
+        que no requiere privilegios de superusuario. Puede ser un fichero
+        normal de al menos :data:`REGISTERS_SIZE` bytes (ver
+        :func:`pida.emulation.emulate_gpio_registers`) para probar la
+        lógica y medir el rendimiento fuera de una Raspberry Pi; en ese
+        caso escribir en ``GPSET`` no modifica ``GPLEV``.
+    """
+
+    def __init__(self, path=GPIOMEM_DEVICE):
+        self._path = path
+        fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        try:
+            self._map = mmap.mmap(fd, REGISTERS_SIZE, mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+        self._words = (ctypes.c_uint32 * (REGISTERS_SIZE // 4)).from_buffer(self._map)
+
+    @property
+    def path(self):
+        """Fichero proyectado.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._path
+
+    @property
+    def words(self):
+        """Vector :mod:`ctypes` de enteros de 32 bits con los registros.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._words
+
+    @staticmethod
+    def mask(numbers):
+        """Devuelve la máscara de bits de un banco que corresponde a una
+        lista de GPIO.
+
+        Eleva una excepción :exc:`ValueError` si las GPIO no están todas en
+        el mismo banco.
+
+        :param numbers: Lista de números de GPIO.
+        """
+        banks = set(number // 32 for number in numbers)
+        if len(banks) > 1:
+            raise ValueError("GPIO of different banks")
+        mask = 0
+        for number in numbers:
+            mask |= 1 << (number % 32)
+        return mask
+
+    def set(self, mask, bank=0):
+        """Pone a nivel alto las GPIO de una máscara con una única escritura.
+
+        :param mask: Máscara de bits de las GPIO (ver :meth:`mask`).
+        :param bank: Banco de las GPIO.
+        """
+        self._words[GPSET0 + bank] = mask
+
+    def clear(self, mask, bank=0):
+        """Pone a nivel bajo las GPIO de una máscara con una única escritura.
+
+        :param mask: Máscara de bits de las GPIO (ver :meth:`mask`).
+        :param bank: Banco de las GPIO.
+        """
+        self._words[GPCLR0 + bank] = mask
+
+    def write(self, mask, value, bank=0):
+        """Fija el nivel de las GPIO de una máscara: las de los bits a 1 de
+        ``value`` a nivel alto y el resto a nivel bajo, con una escritura
+        en cada registro.
+
+        :param mask: Máscara de bits de las GPIO.
+        :param value: Niveles de las GPIO, como máscara de bits.
+        :param bank: Banco de las GPIO.
+        """
+        self._words[GPSET0 + bank] = mask & value
+        self._words[GPCLR0 + bank] = mask & ~value
+
+    def levels(self, bank=0):
+        """Devuelve los niveles de las GPIO de un banco como máscara de bits.
+
+        :param bank: Banco de las GPIO.
+        """
+        return self._words[GPLEV0 + bank]
+
+    def get_function(self, number):
+        """Devuelve el código de 3 bits de la función de una GPIO (0
+        entrada, 1 salida, el resto funciones alternativas).
+
+        :param number: Número de la GPIO.
+        """
+        return (self._words[GPFSEL0 + number // 10] >> (number % 10 * 3)) & 7
+
+    def set_function(self, number, function):
+        """Fija la función de una GPIO. La escritura lee y modifica el
+        registro, por lo que no debe cambiarse a la vez desde otro hilo o
+        proceso la función de otra GPIO del mismo registro.
+
+        :param number: Número de la GPIO.
+        :param function: Código de 3 bits de la función.
+        """
+        index = GPFSEL0 + number // 10
+        shift = number % 10 * 3
+        self._words[index] = (self._words[index] & ~(7 << shift)) | (function << shift)
+
+    def _get_bit(self, register, number):
+        return (self._words[register + number // 32] >> (number % 32)) & 1
+
+_registers = {}
+
+def registers(path=GPIOMEM_DEVICE):
+    """Devuelve el bloque de registros (:class:`GPIORegisters`) de un
+    fichero, compartido por todas las GPIO que lo usan. El fichero se
+    proyecta la primera vez que se invoca esta función.
+
+    :param path: Fichero que se proyecta.
+    """
+    if path not in _registers:
+        _registers[path] = GPIORegisters(path)
+    return _registers[path]
+
+class RegisterGPIO(GPIO):
+    """GPIO gestionada a través de los registros del controlador
+    proyectados en memoria, con la misma interfaz que :class:`GPIO`.
+    Normalmente se crea con ``GPIO(number, backend=GPIOMEM)``.
+
+    No necesita exportarse, por lo que :meth:`open` y :meth:`close` no
+    hacen nada. La detección de flancos pertenece al controlador GPIO
+    del núcleo, que gestiona la interrupción del banco, por lo que esta
+    implementación no puede configurarla ni esperar flancos: :attr:`edge`
+    sólo puede leerse, y :meth:`fileno` y :meth:`wait_edge` elevan una
+    excepción :exc:`IOError` con ``errno`` :data:`errno.EOPNOTSUPP`. Use
+    la implementación :data:`SYSFS` para esperar flancos. Tampoco hay
+    fichero ``value`` para :meth:`get_stream_writer`; :meth:`write_pattern`
+    escribe secuencias de valores directamente en los registros.
+
+    :param number: Número de la GPIO.
+    :param root: No se usa; existe por compatibilidad con :class:`GPIO`.
+    :param backend: :data:`GPIOMEM` o un bloque de registros
+        (:class:`GPIORegisters`).
+    """
+
+    def __init__(self, number, root=SYSFS_GPIO_DIR, backend=GPIOMEM):
+        if not 0 <= number < PINS:
+            raise ValueError("Unknown GPIO")
+        self._number = number
+        if backend == GPIOMEM:
+            backend = registers()
+        self._registers = backend
+        self._words = backend.words
+        self._bank = number // 32
+        self._bit = 1 << (number % 32)
+
+    @property
+    def registers(self):
+        """Bloque de registros (:class:`GPIORegisters`) de la GPIO.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._registers
+
+    def fileno(self):
+        """No hay descriptor de fichero con esta implementación.
+
+        Eleva siempre una excepción :exc:`IOError`.
+        """
+        raise IOError(errno.EOPNOTSUPP, "No file descriptor with the register backend")
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    @property
+    def direction(self):
+        function = self._registers.get_function(self._number)
+        for direction, code in FUNCTIONS.items():
+            if code == function:
+                return direction
+        raise ValueError("Alternate function {}".format(function))
+
+    @direction.setter
+    def direction(self, direction):
+        self._registers.set_function(self._number, FUNCTIONS[direction])
+
+    @property
+    def status(self):
+        return STATUSES[(self._words[GPLEV0 + self._bank] & self._bit) != 0]
+
+    @status.setter
+    def status(self, status):
+        if status is Status.HIGH:
+            self._words[GPSET0 + self._bank] = self._bit
+        else:
+            self._words[GPCLR0 + self._bank] = self._bit
+
+    @property
+    def edge(self):
+        """Flancos que detecta el controlador en la GPIO, configurados por
+        el núcleo (por ejemplo, a través de sysfs).
+
+        Al fijarla se eleva una excepción :exc:`IOError`: los registros de
+        detección pertenecen al controlador del núcleo, que no borra los
+        eventos de las GPIO que no gestiona, por lo que activarlos
+        provocaría una tormenta de interrupciones.
+        """
+        rising = self._registers._get_bit(GPREN0, self._number)
+        falling = self._registers._get_bit(GPFEN0, self._number)
+        return [[Edge.NONE, Edge.FALLING], [Edge.RISING, Edge.BOTH]][rising][falling]
+
+    @edge.setter
+    def edge(self, edge):
+        raise IOError(errno.EOPNOTSUPP, "Edge detection requires the sysfs backend")
+
+    def write_pattern(self, bits):
+        words = self._words
+        bit = self._bit
+        set_index = GPSET0 + self._bank
+        clear_index = GPCLR0 + self._bank
+        for value in bits:
+            if value:
+                words[set_index] = bit
+            else:
+                words[clear_index] = bit
+
+    def read_many(self, n_count):
+        words = self._words
+        index = GPLEV0 + self._bank
+        bit = self._bit
+        return bytearray((words[index] & bit) != 0 for _ in range(n_count))
+
+    def wait_edge(self, timeout=None):
+        """No pueden esperarse flancos con esta implementación.
+
+        Eleva siempre una excepción :exc:`IOError`.
+        """
+        raise IOError(errno.EOPNOTSUPP, "Edge waits require the sysfs backend")
+
+    def get_stream_writer(self):
+        """No hay fichero ``value`` con esta implementación.
+
+        Eleva siempre una excepción :exc:`IOError`.
+        """
+        raise IOError(errno.EOPNOTSUPP, "Stream writers require the sysfs backend")
 
 class LED(object):
 
-    def __init__(self, number):
+    def __init__(self, number, root=SYSFS_GPIO_DIR, backend=SYSFS):
         self._number = number
-        self._gpio = GPIO(number)
+        self._gpio = GPIO(number, root, backend)
 
     def open(self):
         self._gpio.open()
@@ -144,3 +585,282 @@ class LED(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+# Edge events
+
+DEFAULT_EVENT_CAPACITY = 65536
+"""Número máximo por defecto de flancos que conserva en memoria un
+:class:`GPIOEventLoop`."""
+
+EVENT_BATCH_SIZE = 64
+"""Número máximo de flancos que se recogen en cada espera de
+:class:`GPIOEventLoop`."""
+
+EVENT_POLL_TIME = 0.1
+"""Tiempo máximo en segundos de cada espera del hilo de
+:class:`GPIOEventLoop`, que determina cuánto tarda en terminar tras
+:meth:`GPIOEventLoop.stop`."""
+
+GPIOEvent = namedtuple('GPIOEvent', ['pin', 'edge', 'time'])
+"""Flanco detectado por :class:`GPIOEventLoop`: número de la GPIO, flanco
+(:attr:`Edge.RISING` o :attr:`Edge.FALLING`, según el nivel leído al
+detectarlo) e instante en segundos del reloj de :mod:`pida.clock`."""
+
+EVENT_EDGES = (Edge.FALLING, Edge.RISING)
+
+class GPIOEventLoop(Thread):
+    """Bucle que espera los flancos de varias GPIO con un único ``epoll``.
+
+    Las GPIO se registran una vez con :meth:`add`. Cada espera se hace
+    sin retener el GIL y recoge a la vez los flancos de todas las GPIO
+    que los hayan señalado, con el instante en que se despertó. Los
+    flancos se guardan en un búfer circular compacto (un entero, un byte
+    y un real por flanco) del que se leen con :meth:`get_events` y
+    :meth:`get_events_since`, y sobre el que se calculan
+    :meth:`frequency` y :meth:`pulse_widths`.
+
+    El bucle se ejecuta en su propio hilo con :meth:`start` y termina con
+    :meth:`stop`, o en el hilo que lo invoca con :meth:`poll`.
+
+    Ejemplo de medida de la frecuencia de una señal en la GPIO 17::
+
+        with GPIO(17) as gpio, GPIOEventLoop() as loop:
+            loop.add(gpio, Edge.RISING)
+            loop.start()
+            sleep(time() + 1)
+            print loop.frequency(17)
+
+    :param capacity: Número máximo de flancos que se conservan. Cuando se
+        alcanza, cada flanco nuevo sobrescribe el más antiguo.
+    :param batch: Número máximo de flancos que se recogen en cada espera.
+    """
+
+    def __init__(self, capacity=DEFAULT_EVENT_CAPACITY, batch=EVENT_BATCH_SIZE):
+        Thread.__init__(self)
+        if capacity <= 0 or batch <= 0:
+            raise ValueError("Positive number expected")
+        self.daemon = True
+        self._capacity = int(capacity)
+        self._poller = select.epoll()
+        self._pins = {}
+        self._running = False
+        self._condition = Condition()
+        self._count = 0
+        self._event_pins = array('i', [0]) * self._capacity
+        self._event_levels = array('b', [0]) * self._capacity
+        self._event_times = array('d', [0]) * self._capacity
+        self._batch_fds = array('i', [0]) * batch
+        self._batch_levels = array('b', [0]) * batch
+        self._batch_times = array('d', [0]) * batch
+
+    @property
+    def capacity(self):
+        """Número máximo de flancos que se conservan en memoria.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._capacity
+
+    @property
+    def count(self):
+        """Número total de flancos detectados, incluidos los que ya no se
+        conservan.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def lost(self):
+        """Número de flancos que se han sobrescrito en el búfer circular.
+
+        Es una propiedad de sólo lectura.
+        """
+        return max(0, self._count - self._capacity)
+
+    @property
+    def pins(self):
+        """Lista ordenada de los números de las GPIO registradas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return sorted(self._pins.values())
+
+    def add(self, gpio, edge=Edge.BOTH):
+        """Registra una GPIO, configurando antes los flancos que detecta.
+
+        :param gpio: GPIO (:class:`GPIO`) abierta, o cualquier objeto con
+            los atributos ``number``, ``edge`` y ``epoll_events`` y el
+            método ``fileno()``.
+        :param edge: Flancos a detectar (ver :attr:`GPIO.edge`). Con
+            ``None`` se mantiene la configuración de la GPIO.
+        """
+        if edge is not None:
+            gpio.edge = edge
+        fd = gpio.fileno()
+        self._poller.register(fd, gpio.epoll_events)
+        self._pins[fd] = gpio.number
+
+    def remove(self, gpio):
+        """Deja de esperar los flancos de una GPIO.
+
+        :param gpio: GPIO registrada con :meth:`add`.
+        """
+        fd = gpio.fileno()
+        self._poller.unregister(fd)
+        del self._pins[fd]
+
+    def poll(self, timeout=None):
+        """Espera los flancos de las GPIO registradas y los guarda.
+        Devuelve el número de flancos detectados, o 0 si se agota el tiempo
+        de espera.
+
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        fds = self._batch_fds
+        levels = self._batch_levels
+        times = self._batch_times
+        if gpiocore is not None:
+            n_events = gpiocore.wait_events(self._poller.fileno(), fds, levels, times,
+                                            -1 if timeout is None else timeout)
+        else:
+            n_events = self._wait_events(timeout)
+        with self._condition:
+            pins = self._pins
+            position = self._count % self._capacity
+            for index in range(n_events):
+                self._event_pins[position] = pins.get(fds[index], -1)
+                self._event_levels[position] = levels[index]
+                self._event_times[position] = times[index]
+                position += 1
+                if position == self._capacity:
+                    position = 0
+            self._count += n_events
+            if n_events:
+                self._condition.notify_all()
+        return n_events
+
+    def _wait_events(self, timeout):
+        # Pure Python version of gpiocore.wait_events
+        ready = self._poller.poll(_epoll_timeout(timeout), len(self._batch_fds))
+        now = time()
+        for index, (fd, _) in enumerate(ready):
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+            except OSError as error:
+                if error.errno != errno.ESPIPE:
+                    raise
+            self._batch_fds[index] = fd
+            self._batch_levels[index] = os.read(fd, 1) == "1"
+            self._batch_times[index] = now
+        return len(ready)
+
+    def run(self):
+        self._running = True
+        while self._running:
+            self.poll(EVENT_POLL_TIME)
+        with self._condition:
+            self._condition.notify_all()
+
+    def stop(self):
+        """Detiene el hilo del bucle tras la espera en curso."""
+        self._running = False
+
+    def close(self):
+        """Detiene el bucle y libera el ``epoll``. Las GPIO registradas no
+        se cierran."""
+        self.stop()
+        if self.is_alive():
+            self.join()
+        self._poller.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_events_since(self, position):
+        """Devuelve la lista de flancos (:class:`GPIOEvent`) detectados a
+        partir del flanco número ``position`` (ver :attr:`count`). Si
+        alguno ya no se conserva, la lista empieza en el más antiguo
+        conservado.
+
+        :param position: Número del primer flanco a devolver.
+        """
+        with self._condition:
+            start = max(position, self._count - self._capacity, 0)
+            events = []
+            for index in range(start, self._count):
+                index %= self._capacity
+                events.append(GPIOEvent(self._event_pins[index],
+                                        EVENT_EDGES[self._event_levels[index]],
+                                        self._event_times[index]))
+            return events
+
+    def get_events(self, n_count=0, pin=None):
+        """Devuelve la lista de los últimos flancos (:class:`GPIOEvent`)
+        conservados.
+
+        :param n_count: Número máximo de flancos a devolver. El valor por
+            defecto (0) devuelve todos los conservados.
+        :param pin: Si se indica, sólo se devuelven los flancos de la GPIO
+            con ese número.
+        """
+        events = self.get_events_since(0)
+        if pin is not None:
+            events = [event for event in events if event.pin == pin]
+        return events[-n_count:] if n_count > 0 else events
+
+    def wait_events(self, n_count=1, timeout=None):
+        """Espera, sin consultas periódicas, a que el número total de
+        flancos detectados alcance ``n_count`` o a que termine el hilo del
+        bucle. Devuelve verdadero si se ha alcanzado.
+
+        :param n_count: Número total de flancos a esperar.
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        deadline = None if timeout is None else time() + timeout
+        with self._condition:
+            while self._count < n_count and self.is_alive():
+                if deadline is None:
+                    self._condition.wait()
+                elif time() < deadline:
+                    self._condition.wait(deadline - time())
+                else:
+                    break
+        return self._count >= n_count
+
+    def frequency(self, pin, edge=Edge.RISING):
+        """Devuelve la frecuencia media en Hz de los flancos conservados de
+        una GPIO, o 0 si hay menos de dos.
+
+        :param pin: Número de la GPIO.
+        :param edge: Flanco que se cuenta: :attr:`Edge.RISING` o
+            :attr:`Edge.FALLING`.
+        """
+        times = [event.time for event in self.get_events(pin=pin) if event.edge is edge]
+        if len(times) < 2 or times[-1] == times[0]:
+            return 0.0
+        return (len(times) - 1) / (times[-1] - times[0])
+
+    def pulse_widths(self, pin, status=Status.HIGH):
+        """Devuelve la lista de las duraciones en segundos de los pulsos
+        completos conservados de una GPIO.
+
+        :param pin: Número de la GPIO.
+        :param status: Nivel de los pulsos: con :attr:`Status.HIGH` se mide
+            desde cada flanco de subida hasta el siguiente de bajada.
+        """
+        start_edge = Edge.RISING if status is Status.HIGH else Edge.FALLING
+        widths = []
+        start = None
+        for event in self.get_events(pin=pin):
+            if event.edge is start_edge:
+                start = event.time
+            elif start is not None:
+                widths.append(event.time - start)
+                start = None
+        return widths
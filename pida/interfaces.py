@@ -4,8 +4,10 @@ datos.
 """
 from abc import ABCMeta
 from pida.converters import MCP3002, MCP3202, MCP4802
-from pida.links import SPIDataLink
-from pida.acquisitions import SynchronousAcquisition
+from pida.links import SPIDataLink, SPIDataLinkConfiguration
+from pida.acquisitions import SynchronousAcquisition, ScanAcquisition
+from pida.streams import BlockStream, DEFAULT_MAX_BLOCKS, DROP_OLDEST
+from pida.playback import WaveformPlayback
 
 class Channel:
     """Clase base abstracta para la gestión de un canal de una interfaz de adquisición de datos.
@@ -59,7 +61,38 @@ class InputChannel(Channel):
         """Lee un valor en voltios en el canal."""
         return self._converter.read(self._converter_channel)
 
-    def acquire(self, max_count=0, sampling_rate=0):
+    def read_code(self):
+        """Lee un valor en el canal y devuelve el código del conversor, sin
+        convertirlo a voltios."""
+        return self._converter.read_code(self._converter_channel)
+
+    def to_volts(self, code):
+        """Convierte un código leído en el canal en su valor en voltios.
+
+        :param code: Código a convertir.
+        """
+        return self._converter.to_volts(code)
+
+    def sampling_source(self):
+        """Devuelve la descripción que necesitan los motores de muestreo
+        nativos para leer el canal sin pasar por Python: una tupla
+        ``(fd, request, shift, mask)`` con el descriptor de fichero del
+        enlace de datos y el resultado de
+        :meth:`pida.converters.ADC.sampling_frame`.
+
+        Devuelve ``None`` si el conversor o el enlace de datos no lo
+        permiten. El canal debe estar abierto.
+        """
+        frame = self._converter.sampling_frame(self._converter_channel)
+        if frame is None:
+            return None
+        try:
+            fd = self._converter.data_link.fileno()
+        except AttributeError:
+            return None
+        return (fd,) + tuple(frame)
+
+    def acquire(self, max_count=0, sampling_rate=0, capacity=0):
         """Comienza una adquisición de datos a través del canal y devuelve el
         objeto para controlar dicha adquisición.
         
@@ -68,6 +101,11 @@ class InputChannel(Channel):
         :param sampling_rate: frecuencia de muestreo en hertzios. El valor
             por defecto (0) provoca que las muestras se tomen a la máxima
             tasa posible.
+        :param capacity: número máximo de muestras que se conservan en
+            memoria. El valor por defecto (0) lo calcula a partir de
+            ``max_count``, con un máximo de
+            :data:`pida.buffers.DEFAULT_CAPACITY` (ver
+            :class:`pida.acquisitions.Acquisition`).
 
         Ejemplo de adquisición síncrona a través del canal de entrada 0
         de la interfaz de adquisición de datos PidaInterface, con un número
@@ -98,10 +136,36 @@ class InputChannel(Channel):
         >>> acquisition.status
         'stopped'
         """
-        acquisition = SynchronousAcquisition(self, max_count, sampling_rate)
+        acquisition = SynchronousAcquisition(self, max_count, sampling_rate, capacity)
         acquisition.start()
         return acquisition
-        
+
+    def stream(self, sampling_rate, block_size, max_blocks=DEFAULT_MAX_BLOCKS, policy=DROP_OLDEST):
+        """Comienza una adquisición de datos ilimitada a través del canal y
+        devuelve un flujo (:class:`pida.streams.BlockStream`) que entrega
+        sus muestras en bloques de tamaño fijo. La adquisición termina
+        al invocar :meth:`pida.streams.BlockStream.stop`.
+
+        :param sampling_rate: frecuencia de muestreo en hertzios.
+        :param block_size: número de muestras de cada bloque.
+        :param max_blocks: número máximo de bloques pendientes de consumir.
+        :param policy: política cuando se llena el flujo (ver
+            :mod:`pida.streams`).
+
+        Ejemplo de consumo desde un hilo::
+
+            stream = channel.stream(10000, 1000)
+            for block in stream:
+                print max(block.codes[0])
+
+        Un bucle de eventos puede atender los flujos de varios canales en
+        un único hilo vigilando :meth:`pida.streams.BlockStream.fileno`
+        (ver :mod:`pida.streams`).
+        """
+        stream = BlockStream(block_size, max_blocks, policy)
+        SynchronousAcquisition(self, 0, sampling_rate, sinks=[stream]).start()
+        return stream
+
 class OutputChannel(Channel):
     """Clase para la gestión de un canal de salida de una interfaz de
     adquisición de datos.
@@ -116,6 +180,22 @@ class OutputChannel(Channel):
         """Escribe un valor en voltios en el canal."""
         return self._converter.write(value, self._converter_channel)
 
+    def play(self, waveform, rate, loop=True):
+        """Comienza la reproducción de una forma de onda a través del canal y
+        devuelve el objeto (:class:`pida.playback.WaveformPlayback`) para
+        controlarla. La forma de onda se convierte en tramas del conversor
+        una única vez, antes de comenzar.
+
+        :param waveform: secuencia de valores en voltios.
+        :param rate: frecuencia de reproducción en muestras por segundo.
+        :param loop: si es verdadero (por defecto), la forma de onda se
+            repite hasta :meth:`pida.playback.WaveformPlayback.stop`; si no,
+            se reproduce una vez.
+        """
+        playback = WaveformPlayback(self, waveform, rate, loop)
+        playback.start()
+        return playback
+
 class Interface:
     """Clase que gestiona una interfaz de adquisición de datos.
 
@@ -161,10 +241,61 @@ class Interface:
         que se corresponde con el identificador suministrado."""
         return self._channel_list[channel_identifier]
 
+    def acquire(self, max_count=0, sampling_rate=0, capacity=0):
+        """Comienza una adquisición de datos que lee en cada barrido todos
+        los canales de entrada de la interfaz y devuelve el objeto para
+        controlar dicha adquisición (ver
+        :class:`pida.acquisitions.ScanAcquisition`).
+
+        :param max_count: número máximo de barridos a realizar en la
+            adquisición. El valor por defecto (0) indica que no hay límite.
+        :param sampling_rate: frecuencia de barrido en hertzios. El valor
+            por defecto (0) provoca que los barridos se realicen a la
+            máxima tasa posible.
+        :param capacity: número máximo de barridos que se conservan en
+            memoria. El valor por defecto (0) lo calcula a partir de
+            ``max_count``, con un máximo de
+            :data:`pida.buffers.DEFAULT_CAPACITY`.
+
+        Ejemplo de adquisición de los cuatro canales de la interfaz de
+        adquisición de datos PidaInterface a 10Hz:
+
+        >>> from pida.interfaces import InterfaceBuilder
+        >>> interface = InterfaceBuilder().build("PidaInterface")
+        >>> acquisition = interface.acquire(0, 10)
+        >>> acquisition.print_data(2)
+        Elapsed Time    Value   Value   Value   Value
+        3.000162        1.46389160156   0.75732421875   3.29919433594   0.0
+        3.100159        1.46469726562   0.75732421875   3.29919433594   0.0
+        >>> acquisition.stop()
+        """
+        acquisition = ScanAcquisition(self, max_count, sampling_rate, capacity)
+        acquisition.start()
+        return acquisition
+
 class InterfaceBuilder:
     """Clase para definir las interfaces de adquisición de datos.
+
+    :param link_factory: función que crea los enlaces de datos de los
+        conversores de las interfaces. Se invoca como
+        ``link_factory(bus, device, configuration, converter)`` y debe
+        devolver un :class:`pida.links.FullDuplexDataLink`. Por defecto se
+        crean enlaces :class:`pida.links.SPIDataLink`. Para construir
+        interfaces sin hardware puede usarse
+        :class:`pida.emulation.EmulatedLinkFactory`.
     """
 
+    def __init__(self, link_factory=None):
+        self._link_factory = link_factory
+
+    def _connect(self, converter, bus, device, max_speed_hz):
+        configuration = SPIDataLinkConfiguration(0, max_speed_hz)
+        if self._link_factory is None:
+            converter.data_link = SPIDataLink(bus, device, configuration)
+        else:
+            converter.data_link = self._link_factory(bus, device, configuration, converter)
+        return converter
+
     def build(self, interface_id):
         """Devuelve un objeto para controlar la interfaz de adquisición de datos
         con el identificador que se pasa como argumento.
@@ -205,13 +336,8 @@ class InterfaceBuilder:
         identifier = "PidaInterface"
         description = ""
 
-        link0 = SPIDataLink(0, 0)
-        link0.max_speed_hz = 100000
-        adc0 = MCP3202(3.3, link0)
-        
-        link1 = SPIDataLink(0, 1)
-        link1.max_speed_hz = 100000
-        adc1 = MCP3202(3.3, link1)
+        adc0 = self._connect(MCP3202(3.3), 0, 0, 100000)
+        adc1 = self._connect(MCP3202(3.3), 0, 1, 100000)
 
         channel_list = [
             InputChannel(adc0, 1),
@@ -225,9 +351,7 @@ class InterfaceBuilder:
         identifier = "PidaInterface0"
         description = ""
 
-        link0 = SPIDataLink(0, 0)
-        link0.max_speed_hz = 1000000
-        adc0 = MCP3202(3.3, link0)
+        adc0 = self._connect(MCP3202(3.3), 0, 0, 1000000)
 
         channel_list = [
             InputChannel(adc0, 0),
@@ -239,13 +363,8 @@ class InterfaceBuilder:
         identifier = "Gertboard"
         description = ""
 
-        link0 = SPIDataLink(0, 0)
-        link0.max_speed_hz = 1000000        
-        adc0 = MCP3002(3.3, link0)
-
-        link1 = SPIDataLink(0, 1)
-        link1.max_speed_hz = 1000000        
-        dac0 = MCP4802(2.048, link1)
+        adc0 = self._connect(MCP3002(3.3), 0, 0, 1000000)
+        dac0 = self._connect(MCP4802(2.048), 0, 1, 1000000)
 
         channel_list = [
             InputChannel(adc0, 0),
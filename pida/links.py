@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 """Este módulo incluye clases para gestionar enlaces de datos."""
 from abc import ABCMeta, abstractmethod
-from spidev import SpiDev
+try:
+    from pida.spidev import SpiDev
+except ImportError:
+    from spidev import SpiDev
 
 class DataLink(object):
     """Clase base abstracta para la definición de enlaces de datos.
@@ -44,6 +47,59 @@ class FullDuplexDataLink(DataLink):
         """
         pass
 
+    def transfer_batch(self, frames):
+        """Realiza varias transferencias independientes a través del
+        enlace de datos y devuelve las respuestas de todas ellas.
+
+        :param frames: lista de tramas a enviar. Cada trama es una lista de bytes.
+        :return: lista con las respuestas recibidas desde el dispositivo, en el
+            mismo orden que las tramas enviadas.
+
+        La implementación por defecto realiza una llamada a :meth:`transfer`
+        por cada trama. Los enlaces que puedan agrupar las tramas en una
+        única operación deben redefinir este método.
+        """
+        return [self.transfer(frame) for frame in frames]
+
+    def transfer_into(self, data, response):
+        """Transfiere datos entre el equipo y un dispositivo conectado al
+        mismo y escribe la respuesta en un búfer suministrado por el
+        llamante, evitando crear listas intermedias.
+
+        :param data: objeto que soporta el protocolo de búfer (``bytes``,
+            ``bytearray``, ``memoryview``, ``array``...) con los bytes a enviar.
+        :param response: objeto modificable que soporta el protocolo de
+            búfer en el que se escribe la respuesta. Debe tener al menos
+            la misma longitud que ``data``.
+
+        Eleva una excepción :exc:`ValueError` si ``response`` es más corto
+        que ``data``.
+
+        La implementación por defecto se apoya en :meth:`transfer`. Los
+        enlaces que puedan escribir directamente sobre el búfer deben
+        redefinir este método.
+        """
+        data = bytearray(data)
+        if len(response) < len(data):
+            raise ValueError("Response buffer is shorter than data")
+        for index, byte in enumerate(self.transfer(list(data))):
+            response[index] = byte
+
+    def acquire(self):
+        """Reserva el enlace de datos para uso exclusivo del llamante: las
+        transferencias de otros hilos esperan hasta que se invoca
+        :meth:`release`. Los motores de muestreo nativos lo reservan
+        mientras transfieren directamente por su descriptor de fichero.
+
+        La implementación por defecto no hace nada. Los enlaces que
+        serialicen sus transferencias deben redefinir este método.
+        """
+        pass
+
+    def release(self):
+        """Libera el enlace de datos reservado con :meth:`acquire`."""
+        pass
+
 
 class SPIDataLinkConfiguration(object):
     def __init__(self, mode, max_speed_hz):
@@ -81,6 +137,10 @@ class SPIDataLink(FullDuplexDataLink):
         self._device = device
         self._configuration = configuration
         self._spi = SpiDev()
+        self._xfer_batch = getattr(self._spi, 'xfer_batch', None)
+        self._xfer_into = getattr(self._spi, 'xfer_into', None)
+        self._acquire = getattr(self._spi, 'acquire', None)
+        self._release = getattr(self._spi, 'release', None)
 
     def _apply_configuration(self):
         self._spi.mode = self._configuration.mode
@@ -115,9 +175,58 @@ class SPIDataLink(FullDuplexDataLink):
     def close(self):
         self._spi.close()
 
+    def fileno(self):
+        """Devuelve el descriptor de fichero del dispositivo SPI abierto,
+        para que el código nativo pueda realizar transferencias con él.
+
+        Eleva una excepción :exc:`AttributeError` si el módulo
+        :mod:`spidev` instalado no ofrece el descriptor.
+        """
+        return self._spi.fileno()
+
+    def acquire(self):
+        """Reserva el enlace para uso exclusivo (ver
+        :meth:`FullDuplexDataLink.acquire`) tomando el cierre de E/S del
+        módulo :mod:`spidev` incluido. Con otros módulos :mod:`spidev` no
+        hace nada.
+        """
+        if self._acquire is not None:
+            self._acquire()
+
+    def release(self):
+        if self._release is not None:
+            self._release()
+
     def transfer(self, data):
         return self._spi.xfer2(data)
 
+    def transfer_batch(self, frames):
+        """Realiza varias transferencias independientes a través del
+        enlace SPI. La línea de selección de chip se libera entre tramas
+        y, si el módulo :mod:`spidev` lo permite, todas las tramas se
+        envían en un único mensaje ``SPI_IOC_MESSAGE(N)``.
+
+        :param frames: lista de tramas a enviar. Cada trama es una lista de bytes.
+        :return: lista con las respuestas recibidas desde el dispositivo.
+        """
+        if self._xfer_batch is None:
+            return FullDuplexDataLink.transfer_batch(self, frames)
+        return self._xfer_batch(frames)
+
+    def transfer_into(self, data, response):
+        """Transfiere datos a través del enlace SPI escribiendo la
+        respuesta directamente en ``response``. Si el módulo
+        :mod:`spidev` lo permite, no se reserva memoria en cada
+        transferencia.
+
+        :param data: objeto que soporta el protocolo de búfer con los bytes a enviar.
+        :param response: objeto modificable que soporta el protocolo de
+            búfer en el que se escribe la respuesta.
+        """
+        if self._xfer_into is None:
+            return FullDuplexDataLink.transfer_into(self, data, response)
+        self._xfer_into(data, response)
+
     def __enter__(self):
         self.open()
         return self
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye un analizador lógico que muestrea a la vez varias
+GPIO a una frecuencia fija.
+
+Cada muestra es una palabra de 32 bits en la que el bit ``n`` es el nivel
+de la GPIO ``n``, el mismo formato que el registro de niveles del
+controlador de GPIO. Si todas las GPIO usan la implementación sobre
+registros (:data:`pida.gpio.GPIOMEM`), cada muestra es una única lectura
+del registro.
+
+Además de las últimas muestras, la captura guarda sus transiciones
+codificadas por longitud de series: el número de cada muestra que
+difiere de la anterior y su palabra. Las transiciones se conservan
+durante toda la captura y son lo que se exporta con
+:meth:`LogicCapture.save`.
+
+Ejemplo de captura de 1 segundo a 100kHz de las GPIO 4 y 17::
+
+    gpios = [GPIO(4, backend=GPIOMEM), GPIO(17, backend=GPIOMEM)]
+    capture = LogicCapture(gpios, 100000, max_count=100000)
+    capture.start()
+    capture.join()
+    capture.save('capture.logic')
+"""
+from array import array
+from collections import namedtuple
+from threading import Thread
+import struct
+from pida.clock import time, sleep
+from pida.gpio import GPLEV0, RegisterGPIO, Status, Edge
+from pida.statistics import TimingStatistics
+from pida.timers import PrecisionTimer, default_timer
+try:
+    from pida import gpiocore
+except ImportError:
+    gpiocore = None
+
+DEFAULT_LOGIC_CAPACITY = 1 << 20
+"""Número por defecto de muestras que conserva en memoria una
+:class:`LogicCapture`."""
+
+LOGIC_MAGIC = b'PIDALOGC'
+"""Identificador al comienzo de los ficheros de :meth:`LogicCapture.save`."""
+
+LOGIC_VERSION = 1
+"""Versión del formato de los ficheros de :meth:`LogicCapture.save`."""
+
+# File layout: header, then the transition indexes as unsigned 64 bit
+# integers and their words as unsigned 32 bit integers, all little endian
+_HEADER = struct.Struct('<8sHIddQQ')
+
+class LogicRecording(namedtuple('LogicRecording', ['mask', 'sampling_rate', 'start_time',
+                                                   'count', 'transitions'])):
+    """Captura leída de un fichero con :func:`load`: máscara de las GPIO
+    muestreadas, frecuencia de muestreo en hertzios, instante de la
+    primera muestra en segundos del reloj de :mod:`pida.clock`, número de
+    muestras y lista de transiciones (pares de número de muestra y
+    palabra)."""
+
+    @property
+    def pins(self):
+        """Lista de los números de las GPIO muestreadas."""
+        return [pin for pin in range(32) if self.mask >> pin & 1]
+
+    def samples(self):
+        """Devuelve un vector (:class:`array.array`) con todas las
+        muestras, reconstruidas a partir de las transiciones."""
+        samples = array('I')
+        transitions = list(self.transitions) + [(self.count, 0)]
+        for (index, word), (end, _) in zip(transitions, transitions[1:]):
+            samples.extend(array('I', [word]) * (end - index))
+        return samples
+
+def load(filename):
+    """Lee una captura guardada con :meth:`LogicCapture.save` y la
+    devuelve como :class:`LogicRecording`.
+
+    Eleva una excepción :exc:`ValueError` si el fichero no tiene el
+    formato esperado.
+
+    :param filename: Nombre del fichero.
+    """
+    with open(filename, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            raise ValueError("Unknown file format")
+        magic, version, mask, sampling_rate, start_time, count, n_transitions = \
+            _HEADER.unpack(header)
+        if magic != LOGIC_MAGIC or version != LOGIC_VERSION:
+            raise ValueError("Unknown file format")
+        indexes = struct.unpack('<{}Q'.format(n_transitions), f.read(8 * n_transitions))
+        words = struct.unpack('<{}I'.format(n_transitions), f.read(4 * n_transitions))
+    return LogicRecording(mask, sampling_rate, start_time, count, list(zip(indexes, words)))
+
+class LogicCapture(Thread):
+    """Captura que muestrea a la vez varias GPIO a una frecuencia fija,
+    guardando cada muestra como una palabra de 32 bits.
+
+    El bucle de muestreo espera hasta el instante absoluto de cada
+    muestra, como :class:`pida.acquisitions.SynchronousAcquisition`, por
+    lo que los retrasos no se acumulan (ver :attr:`timing`).
+
+    Eleva una excepción :exc:`ValueError` si alguna GPIO no está entre la
+    0 y la 31.
+
+    :param gpios: Lista de GPIO (:class:`pida.gpio.GPIO`) abiertas y
+        configuradas como entradas.
+    :param sampling_rate: Frecuencia de muestreo en hertzios. El valor 0
+        toma las muestras a la máxima tasa posible.
+    :param max_count: Número máximo de muestras a tomar. El valor por
+        defecto (0) indica que no hay límite.
+    :param capacity: Número máximo de muestras que se conservan en
+        memoria. Cuando se alcanza, cada nueva muestra sobrescribe la más
+        antigua; las transiciones se conservan siempre. El valor por
+        defecto (0) reserva espacio para :attr:`max_count` muestras, hasta
+        un máximo de :data:`DEFAULT_LOGIC_CAPACITY` muestras. La memoria
+        se reserva al crear la captura.
+    :param precise: Si es verdadero, las esperas entre muestras se hacen
+        con el temporizador de precisión compartido
+        (:func:`pida.timers.default_timer`). También puede ser un
+        :class:`pida.timers.PrecisionTimer`.
+
+    .. method:: start()
+
+        Comienza la captura.
+    """
+
+    def __init__(self, gpios, sampling_rate, max_count=0, capacity=0, precise=False):
+        Thread.__init__(self)
+        if sampling_rate < 0 or max_count < 0 or capacity < 0:
+            raise ValueError("Positive number expected")
+        if not gpios:
+            raise ValueError("No GPIO to capture")
+        mask = 0
+        for gpio in gpios:
+            if not 0 <= gpio.number < 32:
+                raise ValueError("GPIO out of bank 0")
+            mask |= 1 << gpio.number
+        self.daemon = True
+        self._gpios = list(gpios)
+        self._mask = mask
+        self._sampling_rate = float(sampling_rate)
+        self._max_count = int(max_count)
+        if capacity == 0:
+            capacity = min(max_count or DEFAULT_LOGIC_CAPACITY, DEFAULT_LOGIC_CAPACITY)
+        self._capacity = int(capacity)
+        self._precise = precise
+        self._samples = array('I', [0]) * self._capacity
+        # Doubles hold exact sample numbers beyond 32 bits on every platform
+        self._indexes = array('d')
+        self._words = array('I')
+        self._count = 0
+        self._start_time = None
+        self._timing = TimingStatistics(self._sampling_rate)
+        self._running = True
+        self._status = 'ready'
+
+    @property
+    def pins(self):
+        """Lista de los números de las GPIO muestreadas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return [pin for pin in range(32) if self._mask >> pin & 1]
+
+    @property
+    def mask(self):
+        """Máscara de bits de las GPIO muestreadas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._mask
+
+    @property
+    def sampling_rate(self):
+        """Frecuencia de muestreo en hertzios.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._sampling_rate
+
+    @property
+    def max_count(self):
+        """Número máximo de muestras a tomar, o 0 si no hay límite.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._max_count
+
+    @property
+    def capacity(self):
+        """Número máximo de muestras que se conservan en memoria.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._capacity
+
+    @property
+    def count(self):
+        """Número total de muestras tomadas, incluidas las que ya no se
+        conservan.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def lost(self):
+        """Número de muestras que se han sobrescrito en memoria. Siguen
+        representadas en las transiciones.
+
+        Es una propiedad de sólo lectura.
+        """
+        return max(0, self._count - self._capacity)
+
+    @property
+    def start_time(self):
+        """Instante de la primera muestra en segundos del reloj de
+        :mod:`pida.clock`, o ``None`` si la captura no ha comenzado.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._start_time
+
+    @property
+    def status(self):
+        """Estado de la captura: ``'ready'``, ``'running'`` o
+        ``'stopped'``.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._status
+
+    @property
+    def timing(self):
+        """Estadísticas de temporización de las muestras
+        (:class:`pida.statistics.TimingStatistics`).
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._timing
+
+    def _reader(self):
+        # Function that returns the packed levels of all the GPIO
+        mask = self._mask
+        registers = set(gpio.registers for gpio in self._gpios if isinstance(gpio, RegisterGPIO))
+        if len(registers) == 1 and all(isinstance(gpio, RegisterGPIO) for gpio in self._gpios):
+            words = registers.pop().words
+            return lambda: words[GPLEV0] & mask
+        readers = []
+        for gpio in self._gpios:
+            if gpiocore is not None and not isinstance(gpio, RegisterGPIO):
+                fd = gpio.fileno()
+                readers.append((1 << gpio.number, lambda fd=fd: gpiocore.read_value(fd)))
+            else:
+                readers.append((1 << gpio.number,
+                                lambda gpio=gpio: gpio.status is Status.HIGH))
+        def read():
+            word = 0
+            for bit, read_level in readers:
+                if read_level():
+                    word |= bit
+            return word
+        return read
+
+    def run(self):
+        read = self._reader()
+        if isinstance(self._precise, PrecisionTimer):
+            sleep_until = self._precise.sleep
+        elif self._precise:
+            sleep_until = default_timer().sleep
+        else:
+            sleep_until = sleep
+        period = 1.0 / self._sampling_rate if self._sampling_rate else 0.0
+        samples = self._samples
+        capacity = self._capacity
+        indexes = self._indexes
+        words = self._words
+        record = self._timing.record
+        max_count = self._max_count
+        previous = None
+        i = 0
+        self._status = 'running'
+        start = self._start_time = time()
+        request = start
+        while self._running and (max_count == 0 or i < max_count):
+            scheduled = request
+            request += period
+
+            now = time()
+            word = read()
+            samples[i % capacity] = word
+            if word != previous:
+                # The index goes first, readers size both by the words
+                indexes.append(i)
+                words.append(word)
+                previous = word
+            i += 1
+            self._count = i
+            done = time()
+
+            sleep_until(request)
+            record(now - scheduled if period else 0.0, done - now, time() - done,
+                   period > 0 and done >= request, now - start)
+        self._status = 'stopped'
+
+    def stop(self):
+        """Detiene la captura."""
+        self._running = False
+
+    def get_samples(self, n_count=0):
+        """Devuelve un vector (:class:`array.array`) con las últimas
+        muestras conservadas.
+
+        :param n_count: Número máximo de muestras a devolver. El valor por
+            defecto (0) devuelve todas las conservadas.
+        """
+        count = self._count
+        available = min(count, self._capacity)
+        if n_count <= 0 or n_count > available:
+            n_count = available
+        end = count % self._capacity
+        if end >= n_count:
+            return self._samples[end - n_count:end]
+        return self._samples[self._capacity - (n_count - end):] + self._samples[:end]
+
+    def get_levels(self, pin, n_count=0):
+        """Devuelve un ``bytearray`` con los niveles (0 o 1) de una GPIO en
+        las últimas muestras conservadas.
+
+        :param pin: Número de la GPIO.
+        :param n_count: Número máximo de muestras (ver :meth:`get_samples`).
+        """
+        if not self._mask >> pin & 1:
+            raise ValueError("GPIO not captured")
+        return bytearray(word >> pin & 1 for word in self.get_samples(n_count))
+
+    def get_transitions(self):
+        """Devuelve la lista de transiciones de la captura: pares con el
+        número de cada muestra que difiere de la anterior y su palabra. La
+        primera muestra es siempre una transición."""
+        n_transitions = len(self._words)
+        return [(int(index), word)
+                for index, word in zip(self._indexes[:n_transitions], self._words[:n_transitions])]
+
+    def get_edges(self, pin):
+        """Devuelve la lista de flancos de una GPIO: pares con el instante
+        nominal del flanco en segundos desde el comienzo de la captura y el
+        flanco (:attr:`pida.gpio.Edge.RISING` o
+        :attr:`pida.gpio.Edge.FALLING`).
+
+        :param pin: Número de la GPIO.
+        """
+        if not self._mask >> pin & 1:
+            raise ValueError("GPIO not captured")
+        period = 1.0 / self._sampling_rate if self._sampling_rate else 0.0
+        edges = []
+        level = None
+        for index, word in self.get_transitions():
+            bit = word >> pin & 1
+            if level is not None and bit != level:
+                edges.append((index * period, Edge.RISING if bit else Edge.FALLING))
+            level = bit
+        return edges
+
+    def save(self, filename):
+        """Guarda las transiciones de la captura en un fichero binario
+        compacto, que puede leerse con :func:`load`.
+
+        :param filename: Nombre del fichero.
+        """
+        transitions = self.get_transitions()
+        start_time = self._start_time if self._start_time is not None else 0.0
+        with open(filename, 'wb') as f:
+            f.write(_HEADER.pack(LOGIC_MAGIC, LOGIC_VERSION, self._mask, self._sampling_rate,
+                                 start_time, self._count, len(transitions)))
+            f.write(struct.pack('<{}Q'.format(len(transitions)),
+                                *[index for index, _ in transitions]))
+            f.write(struct.pack('<{}I'.format(len(transitions)),
+                                *[word for _, word in transitions]))
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye la generación temporizada de señales digitales en
+las GPIO: secuencias de bits, relojes y modulación por ancho de pulso
+(PWM) por software.
+
+Un patrón (:class:`Pattern`) es una secuencia de pasos, cada uno con los
+niveles de las GPIO como palabra de 32 bits (el bit ``n`` es el nivel de
+la GPIO ``n``, como en :mod:`pida.logic`) y su duración. Un
+:class:`PatternOutput` lo reproduce en segundo plano: cada paso se
+escribe en su instante absoluto con ``clock_nanosleep``, sin retener el
+GIL, y se cuentan los pasos que no pudieron escribirse a tiempo.
+
+Ejemplo de PWM a 1kHz en la GPIO 18 con un ciclo de trabajo que sube del
+0 al 100% en un segundo::
+
+    with GPIO(18, backend=GPIOMEM) as gpio:
+        gpio.direction = Direction.OUTPUT
+        pattern = pwm_pattern([i / 1000.0 for i in range(1000)], 1e-3)
+        output = PatternOutput([gpio], pattern, repeat=1)
+        output.start()
+        output.join()
+        print output.missed
+"""
+from array import array
+from collections import namedtuple
+from threading import Thread
+from pida.clock import time, sleep
+from pida.gpio import RegisterGPIO, Status, GPSET0, GPCLR0
+from pida.timers import PrecisionTimer, default_timer
+try:
+    from pida import gpiocore
+except ImportError:
+    gpiocore = None
+
+ALL_PINS = 0xffffffff
+"""Palabra con todas las GPIO a nivel alto."""
+
+PATTERN_BLOCK_TIME = 0.1
+"""Duración aproximada en segundos de cada bloque de pasos que se escribe
+sin retener el GIL. Determina cuánto tarda en detenerse un
+:class:`PatternOutput` tras :meth:`PatternOutput.stop`."""
+
+Pattern = namedtuple('Pattern', ['words', 'durations'])
+"""Patrón de salida: vector (:class:`array.array` de enteros de 32 bits
+sin signo) con los niveles de cada paso y vector (:class:`array.array`
+de reales) con la duración de cada paso en segundos."""
+
+def word_pattern(words, period):
+    """Devuelve el patrón (:class:`Pattern`) de una secuencia de palabras
+    de la misma duración.
+
+    :param words: Secuencia de palabras con los niveles de las GPIO.
+    :param period: Duración en segundos de cada palabra.
+    """
+    if period <= 0:
+        raise ValueError("Positive number expected")
+    words = array('I', words)
+    return Pattern(words, array('d', [period]) * len(words))
+
+def bit_pattern(bits, period):
+    """Devuelve el patrón (:class:`Pattern`) de una secuencia de bits de la
+    misma duración, que se aplica a todas las GPIO de la salida.
+
+    :param bits: Secuencia de valores; cualquier valor distinto de 0 es
+        nivel alto.
+    :param period: Duración en segundos de cada bit.
+    """
+    return word_pattern([ALL_PINS if bit else 0 for bit in bits], period)
+
+def clock_pattern(frequency):
+    """Devuelve el patrón (:class:`Pattern`) de un reloj cuadrado.
+
+    :param frequency: Frecuencia del reloj en hertzios.
+    """
+    if frequency <= 0:
+        raise ValueError("Positive number expected")
+    return bit_pattern([1, 0], 0.5 / frequency)
+
+def pwm_pattern(duty_cycles, period):
+    """Devuelve el patrón (:class:`Pattern`) de una señal PWM con un ciclo
+    de trabajo por periodo. Cada periodo tiene un paso a nivel alto y otro
+    a nivel bajo; los pasos de duración nula se omiten.
+
+    :param duty_cycles: Secuencia de ciclos de trabajo entre 0 y 1.
+    :param period: Periodo de la señal PWM en segundos.
+    """
+    if period <= 0:
+        raise ValueError("Positive number expected")
+    words = array('I')
+    durations = array('d')
+    for duty_cycle in duty_cycles:
+        if not 0 <= duty_cycle <= 1:
+            raise ValueError("Duty cycle out of range")
+        for word, duration in ((ALL_PINS, duty_cycle * period),
+                               (0, (1 - duty_cycle) * period)):
+            if duration > 0:
+                words.append(word)
+                durations.append(duration)
+    return Pattern(words, durations)
+
+class PatternOutput(Thread):
+    """Reproduce un patrón en una o varias GPIO en segundo plano.
+
+    Una única GPIO puede usar cualquier implementación. Varias GPIO deben
+    usar la implementación sobre registros (:data:`pida.gpio.GPIOMEM`)
+    con el mismo bloque de registros, y cada paso las cambia todas a la
+    vez con una escritura en ``GPSET0`` y otra en ``GPCLR0``.
+
+    Los pasos se escriben en bloques de unos :data:`PATTERN_BLOCK_TIME`
+    segundos con :func:`pida.gpiocore.play_pattern`, que no retiene el
+    GIL, por lo que el hilo que invoca :meth:`start` puede seguir
+    trabajando. Sin el módulo nativo, los pasos se escriben desde Python.
+
+    Eleva una excepción :exc:`ValueError` si alguna GPIO no está entre la
+    0 y la 31 o si varias GPIO no comparten el bloque de registros.
+
+    :param gpios: Lista de GPIO (:class:`pida.gpio.GPIO`) abiertas y
+        configuradas como salidas.
+    :param pattern: Patrón (:class:`Pattern`) a reproducir.
+    :param repeat: Número de veces que se reproduce el patrón. El valor por
+        defecto (0) lo repite hasta :meth:`stop`.
+    :param precise: Si es verdadero, las esperas se hacen con el
+        temporizador de precisión compartido
+        (:func:`pida.timers.default_timer`). También puede ser un
+        :class:`pida.timers.PrecisionTimer`.
+
+    .. method:: start()
+
+        Comienza la reproducción.
+    """
+
+    def __init__(self, gpios, pattern, repeat=0, precise=False):
+        Thread.__init__(self)
+        if repeat < 0:
+            raise ValueError("Positive number expected")
+        if not len(pattern.words) or len(pattern.words) != len(pattern.durations):
+            raise ValueError("Empty pattern")
+        mask = 0
+        for gpio in gpios:
+            if not 0 <= gpio.number < 32:
+                raise ValueError("GPIO out of bank 0")
+            mask |= 1 << gpio.number
+        if len(gpios) > 1:
+            registers = set(getattr(gpio, 'registers', None) for gpio in gpios)
+            if len(registers) != 1 or None in registers:
+                raise ValueError("Several GPIO require the register backend")
+        self.daemon = True
+        self._gpios = list(gpios)
+        self._mask = mask
+        self._pattern = Pattern(array('I', pattern.words), array('d', pattern.durations))
+        self._repeat = int(repeat)
+        self._precise = precise
+        self._running = True
+        self._status = 'ready'
+        self._count = 0
+        self._missed = 0
+        self._lateness = 0.0
+        self._max_lateness = 0.0
+
+    @property
+    def pattern(self):
+        """Patrón (:class:`Pattern`) que se reproduce.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._pattern
+
+    @property
+    def mask(self):
+        """Máscara de bits de las GPIO de la salida.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._mask
+
+    @property
+    def status(self):
+        """Estado de la reproducción: ``'ready'``, ``'running'`` o
+        ``'stopped'``.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._status
+
+    @property
+    def count(self):
+        """Número de pasos escritos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def missed(self):
+        """Número de pasos que se escribieron después de su final, es
+        decir, que no llegaron a verse en la salida con su duración.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._missed
+
+    @property
+    def mean_lateness(self):
+        """Retraso medio en segundos de las escrituras respecto a su
+        instante previsto.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._lateness / self._count if self._count else 0.0
+
+    @property
+    def max_lateness(self):
+        """Retraso máximo en segundos de las escrituras respecto a su
+        instante previsto.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._max_lateness
+
+    def _target(self):
+        # Value file descriptor or register block of the native engine
+        gpio = self._gpios[0]
+        if isinstance(gpio, RegisterGPIO):
+            return gpio.registers.words
+        return gpio.fileno()
+
+    def _writer(self):
+        # Function that writes a word to the GPIO from Python
+        mask = self._mask
+        gpio = self._gpios[0]
+        if isinstance(gpio, RegisterGPIO):
+            words = gpio.registers.words
+            def write(word):
+                words[GPSET0] = word & mask
+                words[GPCLR0] = ~word & mask
+            return write
+        return lambda word: setattr(gpio, 'status', Status.HIGH if word & mask else Status.LOW)
+
+    def run(self):
+        if isinstance(self._precise, PrecisionTimer):
+            timer = self._precise
+        elif self._precise:
+            timer = default_timer()
+        else:
+            timer = None
+        self._status = 'running'
+        words, durations = self._pattern
+        length = len(words)
+        total = self._repeat * length
+        block = max(int(PATTERN_BLOCK_TIME * length / sum(durations)), 1)
+        deadline = time()
+        if gpiocore is not None:
+            target = self._target()
+            margin = timer.margin if timer else 0.0
+        else:
+            write = self._writer()
+            sleep_until = timer.sleep if timer else sleep
+        while self._running and (total == 0 or self._count < total):
+            count = block if total == 0 else min(block, total - self._count)
+            first = self._count % length
+            if gpiocore is not None:
+                taken, deadline, missed, lateness, max_lateness = gpiocore.play_pattern(
+                    target, self._mask, words, durations, first, count, deadline, margin)
+            else:
+                taken, deadline, missed, lateness, max_lateness = self._play(
+                    write, sleep_until, first, count, deadline)
+            self._count += taken
+            self._missed += missed
+            self._lateness += lateness
+            self._max_lateness = max(self._max_lateness, max_lateness)
+        self._status = 'stopped'
+
+    def _play(self, write, sleep_until, first, count, deadline):
+        # Pure Python version of gpiocore.play_pattern
+        words, durations = self._pattern
+        length = len(words)
+        missed = 0
+        lateness_sum = max_lateness = 0.0
+        for i in range(count):
+            index = (first + i) % length
+            sleep_until(deadline)
+            write(words[index])
+            lateness = time() - deadline
+            if lateness > 0:
+                lateness_sum += lateness
+                max_lateness = max(max_lateness, lateness)
+            if lateness >= durations[index]:
+                missed += 1
+            deadline += durations[index]
+        return count, deadline, missed, lateness_sum, max_lateness
+
+    def stop(self):
+        """Detiene la reproducción al terminar el bloque de pasos en
+        curso."""
+        self._running = False
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye la reproducción de formas de onda a través de los
+canales de salida de una interfaz de adquisición de datos.
+
+La forma de onda se convierte una única vez en una tabla con la trama del
+conversor de cada muestra (ver :meth:`pida.converters.DAC.output_frame`).
+Un motor en segundo plano envía las tramas en su instante absoluto, en
+bloques que el motor nativo (:func:`pida.sampling.play`) recorre sin
+retener el GIL, y registra su temporización: el retraso de cada muestra
+respecto a su instante previsto (jitter) y los desbordamientos, muestras
+cuya transferencia terminó cuando ya debía enviarse la siguiente.
+
+Ejemplo de reproducción de una senoide de 50Hz con 200 muestras por
+periodo::
+
+    waveform = [1.0 + math.sin(2 * math.pi * i / 200) for i in range(200)]
+    playback = channel.play(waveform, 10000)
+    sleep(time() + 10)
+    playback.stop()
+    print playback.underruns, playback.timing.jitter
+"""
+from threading import Thread
+from pida.clock import time, sleep, time_ns
+from pida.statistics import TimingStatistics
+from pida.timers import PrecisionTimer, default_timer
+from pida.realtime import RealtimeProfile
+try:
+    from pida.sampling import play
+except ImportError:
+    play = None
+
+PLAYBACK_BLOCK_TIME = 0.1
+"""Tiempo máximo en segundos que el motor de reproducción nativo trabaja
+sin devolver el control a Python. Acota el retardo con el que se atiende
+:meth:`WaveformPlayback.stop`."""
+
+class WaveformPlayback(Thread):
+    """Reproduce una forma de onda en un canal de salida a una frecuencia
+    fija. Normalmente se crea con
+    :meth:`pida.interfaces.OutputChannel.play`.
+
+    Si el conversor describe sus escrituras
+    (:meth:`pida.converters.DAC.output_frame`) y el enlace de datos
+    ofrece su descriptor de fichero, las tramas se envían con el motor
+    nativo; si no, se escriben desde Python con
+    :meth:`pida.links.FullDuplexDataLink.transfer`, con la misma
+    temporización.
+
+    :param channel: Canal de salida
+        (:class:`pida.interfaces.OutputChannel`).
+    :param waveform: Secuencia de valores en voltios.
+    :param rate: Frecuencia de reproducción en muestras por segundo.
+    :param loop: Si es verdadero, la forma de onda se repite hasta
+        :meth:`stop`; si no, se reproduce una vez.
+    :param precise: Si es verdadero, las esperas se hacen con el
+        temporizador de precisión compartido
+        (:func:`pida.timers.default_timer`). También puede ser un
+        :class:`pida.timers.PrecisionTimer`.
+    :param realtime: Perfil de tiempo real
+        (:class:`pida.realtime.RealtimeProfile`) que se aplica al hilo de
+        reproducción (ver :class:`pida.acquisitions.Acquisition`).
+
+    .. method:: start()
+
+        Comienza la reproducción.
+    """
+
+    def __init__(self, channel, waveform, rate, loop=True, precise=False, realtime=None):
+        Thread.__init__(self)
+        if rate <= 0:
+            raise ValueError("Positive number expected")
+        if not len(waveform):
+            raise ValueError("Empty waveform")
+        self.daemon = True
+        self._channel = channel
+        self._rate = float(rate)
+        self._loop = bool(loop)
+        self._precise = precise
+        if realtime is True:
+            realtime = RealtimeProfile()
+        self._realtime = realtime or None
+        converter = channel.converter
+        self._codes = [converter.to_code(value) for value in waveform]
+        frames = [converter.output_frame(code, channel.converter_channel) for code in self._codes]
+        self._frames = b''.join(frames) if None not in frames else None
+        self._timing = TimingStatistics(self._rate)
+        self._count = 0
+        self._running = True
+        self._status = 'ready'
+
+    @property
+    def channel(self):
+        """Canal de salida de la reproducción.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._channel
+
+    @property
+    def rate(self):
+        """Frecuencia de reproducción en muestras por segundo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._rate
+
+    @property
+    def loop(self):
+        """Indica si la forma de onda se repite hasta :meth:`stop`.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._loop
+
+    @property
+    def codes(self):
+        """Lista con el código del conversor de cada muestra de la forma de
+        onda.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._codes)
+
+    @property
+    def frames(self):
+        """Tabla (``bytes``) con las tramas consecutivas de la forma de onda,
+        o ``None`` si el conversor no describe sus escrituras.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._frames
+
+    @property
+    def status(self):
+        """Estado de la reproducción: ``'ready'``, ``'running'`` o
+        ``'stopped'``.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._status
+
+    @property
+    def count(self):
+        """Número de muestras escritas.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def timing(self):
+        """Estadísticas de temporización de las muestras
+        (:class:`pida.statistics.TimingStatistics`). Su jitter
+        (:attr:`pida.statistics.TimingStatistics.jitter`) es la desviación
+        típica del retraso de las escrituras.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._timing
+
+    @property
+    def underruns(self):
+        """Número de muestras cuya transferencia terminó después del
+        instante en que debía escribirse la siguiente.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._timing.overruns
+
+    def _native_source(self):
+        # Descriptor of the data link, or None to write from Python
+        if play is None or self._frames is None:
+            return None
+        try:
+            return self._channel.converter.data_link.fileno()
+        except AttributeError:
+            return None
+
+    def run(self):
+        if self._realtime is not None:
+            self._realtime.try_apply()
+        self._channel.open()
+        if isinstance(self._precise, PrecisionTimer):
+            timer = self._precise
+        elif self._precise:
+            timer = default_timer()
+        else:
+            timer = None
+        self._status = 'running'
+        fd = self._native_source()
+        try:
+            if fd is None:
+                self._run_interpreted(timer)
+            else:
+                self._run_native(fd, timer)
+        finally:
+            self._channel.close()
+            self._status = 'stopped'
+
+    def _run_native(self, fd, timer):
+        length = len(self._codes)
+        frame_size = len(self._frames) // length
+        block = max(int(self._rate * PLAYBACK_BLOCK_TIME), 1)
+        margin = timer.margin if timer else 0.0
+        # Other users of the link wait between blocks
+        link = self._channel.converter.data_link
+        # The engine schedules sample n at start + n * period
+        start = time_ns()
+        while self._running and (self._loop or self._count < length):
+            count = block if self._loop else min(block, length - self._count)
+            link.acquire()
+            try:
+                taken = play(fd, self._frames, frame_size, start, 1.0 / self._rate,
+                             self._count, count, self._timing.accumulators, margin)
+            finally:
+                link.release()
+            self._count += taken
+
+    def _run_interpreted(self, timer):
+        converter = self._channel.converter
+        converter_channel = self._channel.converter_channel
+        sleep_until = timer.sleep if timer else sleep
+        write_code = converter.write_code
+        codes = self._codes
+        length = len(codes)
+        period = 1.0 / self._rate
+        record = self._timing.record
+        start = time()
+        while self._running and (self._loop or self._count < length):
+            # Deadlines come from the sample number, so rounding errors do
+            # not accumulate
+            scheduled = start + self._count * period
+            deadline = scheduled + period
+
+            # Sleep till the sample deadline
+            before = time()
+            sleep_until(scheduled)
+            now = time()
+            write_code(codes[self._count % length], converter_channel)
+            done = time()
+            record(now - scheduled, done - now, now - before, done >= deadline, now - start)
+            self._count += 1
+
+    def stop(self):
+        """Detiene la reproducción. El canal mantiene el último valor
+        escrito."""
+        self._running = False
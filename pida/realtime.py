@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye perfiles de ejecución de tiempo real para los hilos
+de muestreo de las adquisiciones de datos.
+
+Un perfil fija la política y prioridad de planificador del hilo de
+muestreo sin modificar las del resto de hilos del proceso, lo restringe
+a un procesador y bloquea la memoria del proceso para evitar fallos de
+página, usando las funciones de :mod:`pida.scheduling`. Normalmente
+estas operaciones requieren privilegios de superusuario (o las
+capacidades ``CAP_SYS_NICE`` y ``CAP_IPC_LOCK``).
+"""
+import multiprocessing
+import warnings
+import pida.scheduling as scheduling
+
+DEFAULT_PRIORITY = 80
+"""Prioridad por defecto del hilo de muestreo. Es alta, pero deja por
+encima margen para los hilos de interrupción del núcleo."""
+
+class RealtimeProfile(object):
+    """Perfil de tiempo real de un hilo.
+
+    :param policy: Política de planificador del hilo.
+    :param priority: Prioridad de planificador del hilo. Se ajusta al
+        rango de prioridades de la política.
+    :param cpus: Lista de procesadores en los que puede ejecutarse el
+        hilo. Por defecto se usa el último procesador, que es el que
+        suele aislarse con el parámetro ``isolcpus`` del núcleo. Una lista
+        vacía no restringe el hilo.
+    :param lock_memory: Si es verdadero, se bloquea en memoria física la
+        memoria actual y futura del proceso (afecta a todo el proceso).
+    """
+
+    def __init__(self, policy=scheduling.SCHED_FIFO, priority=DEFAULT_PRIORITY, cpus=None,
+                 lock_memory=True):
+        self._policy = policy
+        min_priority, max_priority = scheduling.get_priority_range(policy)
+        self._priority = max(min_priority, min(priority, max_priority))
+        if cpus is None:
+            cpus = [multiprocessing.cpu_count() - 1]
+        self._cpus = list(cpus)
+        self._lock_memory = lock_memory
+
+    @property
+    def policy(self):
+        """Política de planificador del hilo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._policy
+
+    @property
+    def priority(self):
+        """Prioridad de planificador del hilo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._priority
+
+    @property
+    def cpus(self):
+        """Lista de procesadores en los que puede ejecutarse el hilo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return list(self._cpus)
+
+    @property
+    def lock_memory(self):
+        """Indica si se bloquea la memoria del proceso.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._lock_memory
+
+    def apply(self):
+        """Aplica el perfil al hilo que invoca el método.
+
+        Eleva una excepción :exc:`OSError` si alguno de los ajustes no
+        puede aplicarse, normalmente por falta de privilegios. Los ajustes
+        anteriores al que falla quedan aplicados.
+        """
+        if self._lock_memory:
+            scheduling.lock_memory()
+        if self._cpus:
+            scheduling.set_affinity(self._cpus)
+        scheduling.set_thread_policy(self._policy, self._priority)
+
+    def try_apply(self):
+        """Aplica el perfil al hilo que invoca el método como :meth:`apply`,
+        pero si algún ajuste falla emite un aviso (:exc:`RuntimeWarning`)
+        en lugar de elevar la excepción. Devuelve verdadero si se han
+        aplicado todos los ajustes.
+        """
+        try:
+            self.apply()
+        except OSError as error:
+            warnings.warn("Real-time profile not applied: {}".format(error), RuntimeWarning)
+            return False
+        return True
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye sumideros que reciben las muestras de las
+adquisiciones de datos a medida que se toman, para persistirlas o
+procesarlas sin esperar al final de la adquisición.
+"""
+from abc import ABCMeta, abstractmethod
+from collections import namedtuple
+from threading import Thread
+from Queue import Queue
+import ctypes
+import mmap
+import os
+import struct
+
+class Sink(object):
+    """Clase base abstracta para la definición de sumideros de muestras.
+
+    Una adquisición invoca :meth:`open` antes de tomar la primera
+    muestra, :meth:`write` cada vez que hay :attr:`chunk_size` muestras
+    nuevas y :meth:`close` al terminar. Todos los métodos se invocan
+    desde el hilo de la adquisición, por lo que no deben bloquearse.
+    """
+    __metaclass__ = ABCMeta
+
+    chunk_size = 1024
+    """Número de muestras nuevas que la adquisición acumula antes de
+    invocar :meth:`write`."""
+
+    def open(self, acquisition):
+        """Prepara el sumidero para recibir las muestras de una adquisición.
+
+        :param acquisition: Adquisición (:class:`pida.acquisitions.Acquisition`)
+            cuyas muestras se reciben.
+        """
+        pass
+
+    @abstractmethod
+    def write(self, view):
+        """Recibe un bloque de muestras nuevas.
+
+        :param view: Vista (:class:`pida.buffers.SampleView`) con las
+            muestras tomadas desde la anterior invocación.
+
+        .. warning:: Es un método abstracto que debe ser implementado por todas las clases que hereden de ésta.
+        """
+        pass
+
+    def close(self):
+        """Finaliza la recepción de muestras."""
+        pass
+
+MAGIC = b'PIDA'
+VERSION = 3
+HEADER_SIZE = 4096
+# magic, version, sampling rate, width, capacity, count
+HEADER = struct.Struct('<4sIdIqq')
+# converter channel, converter, vref, bits, decimation factor of each
+# code column
+COLUMN = struct.Struct('<i32sdII')
+MAX_COLUMNS = (HEADER_SIZE - HEADER.size) // COLUMN.size
+COUNT_OFFSET = HEADER.size - struct.calcsize('<q')
+TIME_SIZE = ctypes.sizeof(ctypes.c_double)
+CODE_SIZE = ctypes.sizeof(ctypes.c_int32)
+
+def _layout(capacity, width):
+    # Offsets of the time column and of each code column
+    times = HEADER_SIZE
+    codes = times + capacity * TIME_SIZE
+    return times, [codes + column * capacity * CODE_SIZE for column in range(width)]
+
+class MappedFileSink(Sink):
+    """Sumidero que guarda las muestras en un fichero binario proyectado
+    en memoria.
+
+    El fichero se crea con el tamaño necesario para ``capacity`` muestras
+    y tiene una cabecera de :data:`HEADER_SIZE` bytes con la frecuencia de
+    muestreo, el número de muestras guardadas y, para cada columna de
+    códigos, el canal, el modelo, la tensión de referencia y la
+    resolución de su conversor, y el factor por el que están escalados
+    sus códigos si la adquisición usa diezmado (ver :class:`Column`). Tras la cabecera se
+    guarda la columna de instantes (``float64``) y una columna de códigos
+    (``int32``) por canal, de forma que cada columna puede leerse como un
+    vector sin interpretar el contenido (ver :class:`MappedFileReader`).
+
+    Cada bloque se copia de la memoria de la adquisición al recibirlo y
+    se escribe en el fichero desde un hilo propio, por lo que el bucle de
+    muestreo nunca espera a las escrituras y el hilo puede retrasarse sin
+    que las muestras se sobrescriban. El número de muestras de la
+    cabecera se actualiza tras copiar cada bloque, de forma que si el
+    proceso termina abruptamente el fichero conserva todos los bloques
+    completos.
+
+    :param filename: Ruta del fichero. Si existe se sobrescribe.
+    :param capacity: Número máximo de muestras que se guardan. Las
+        muestras que no caben se descartan (ver :attr:`dropped`).
+    :param chunk_size: Número de muestras de cada bloque.
+
+    Eleva una excepción :exc:`ValueError` al comenzar la adquisición si
+    tiene más de :data:`MAX_COLUMNS` canales.
+    """
+
+    def __init__(self, filename, capacity, chunk_size=Sink.chunk_size):
+        if capacity <= 0 or chunk_size <= 0:
+            raise ValueError("Positive number expected")
+        self._filename = filename
+        self._capacity = int(capacity)
+        self.chunk_size = int(chunk_size)
+        self._count = 0
+        self._dropped = 0
+        self._file = None
+        self._map = None
+        self._queue = Queue()
+        self._thread = None
+
+    @property
+    def filename(self):
+        """Ruta del fichero.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._filename
+
+    @property
+    def count(self):
+        """Número de muestras guardadas en el fichero.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._count
+
+    @property
+    def dropped(self):
+        """Número de muestras descartadas porque el fichero estaba lleno.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._dropped
+
+    def open(self, acquisition):
+        channels = acquisition.channels
+        if len(channels) > MAX_COLUMNS:
+            raise ValueError("Too many channels")
+        self._times, self._columns = _layout(self._capacity, len(channels))
+        size = self._columns[-1] + self._capacity * CODE_SIZE
+
+        self._file = open(self._filename, 'w+b')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION,
+                         getattr(acquisition, 'sampling_rate', 0.0),
+                         len(channels), self._capacity, 0)
+        decimation = getattr(acquisition, 'decimation', None)
+        scale = decimation.factor if decimation is not None else 1
+        for column, channel in enumerate(channels):
+            converter = channel.converter
+            COLUMN.pack_into(self._map, HEADER.size + column * COLUMN.size,
+                             channel.converter_channel,
+                             type(converter).__name__.encode('ascii'),
+                             converter.vref, converter.bits, scale)
+
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, view):
+        # The view shares the ring buffer of the acquisition, which may
+        # overwrite it before the writer thread gets to it
+        codes = [view.codes(column) for column in range(len(self._columns))]
+        self._queue.put((view.times(), codes))
+
+    def close(self):
+        # open() may not have run or may have failed partway
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                break
+            self._store(*block)
+
+    def _store(self, times, codes):
+        n_count = min(len(times), self._capacity - self._count)
+        self._dropped += len(times) - n_count
+        if n_count == 0:
+            return
+        start = self._times + self._count * TIME_SIZE
+        self._map[start:start + n_count * TIME_SIZE] = times[:n_count].tostring()
+        for column, offset in zip(codes, self._columns):
+            start = offset + self._count * CODE_SIZE
+            self._map[start:start + n_count * CODE_SIZE] = column[:n_count].tostring()
+        self._count += n_count
+        struct.pack_into('<q', self._map, COUNT_OFFSET, self._count)
+
+Column = namedtuple('Column', ['channel', 'converter', 'vref', 'bits', 'scale'])
+"""Descripción de una columna de códigos de un fichero de
+:class:`MappedFileSink`: canal del conversor, nombre del modelo de
+conversor, su tensión de referencia, su resolución en bits y el factor
+por el que están escalados los códigos (el factor de diezmado de la
+adquisición, ver :class:`pida.decimation.Decimator`, o 1)."""
+
+class MappedFileReader(object):
+    """Lee un fichero generado por :class:`MappedFileSink` proyectándolo en
+    memoria. Las columnas se devuelven como vectores :mod:`ctypes` que
+    comparten la memoria del fichero, sin copiar ni interpretar los
+    datos; pueden pasarse a cualquier función que admita el protocolo de
+    búfer (por ejemplo :func:`numpy.frombuffer`).
+
+    :param filename: Ruta del fichero.
+
+    Eleva una excepción :exc:`ValueError` si el fichero no tiene el
+    formato esperado.
+
+    .. warning:: Los vectores devueltos dejan de ser válidos tras invocar
+        :meth:`close`.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, 'rb')
+        # Copy-on-write mapping: ctypes needs a writable buffer, but the
+        # file is never modified
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_COPY)
+        (magic, version, self._sampling_rate,
+         self._width, self._capacity, self._count) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError("Unknown file format")
+        self._column_info = []
+        for column in range(self._width):
+            channel, converter, vref, bits, scale = COLUMN.unpack_from(
+                self._map, HEADER.size + column * COLUMN.size)
+            self._column_info.append(Column(channel, converter.rstrip(b'\0').decode('ascii'),
+                                            vref, bits, scale))
+        self._times, self._columns = _layout(self._capacity, self._width)
+
+    @property
+    def sampling_rate(self):
+        """Frecuencia de muestreo de la adquisición en hertzios."""
+        return self._sampling_rate
+
+    @property
+    def columns(self):
+        """Lista con la descripción (:class:`Column`) de cada columna de
+        códigos."""
+        return list(self._column_info)
+
+    @property
+    def channel_ids(self):
+        """Lista con el canal del conversor de cada columna de códigos."""
+        return [info.channel for info in self._column_info]
+
+    @property
+    def count(self):
+        """Número de muestras guardadas en el fichero."""
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def times(self):
+        """Vector con los instantes de las muestras."""
+        return (ctypes.c_double * self._count).from_buffer(self._map, self._times)
+
+    def codes(self, column=0):
+        """Devuelve el vector con los códigos de una columna.
+
+        :param column: Columna cuyos códigos se devuelven.
+        """
+        return (ctypes.c_int32 * self._count).from_buffer(self._map, self._columns[column])
+
+    def to_volts(self, code, column=0):
+        """Convierte un código del fichero en su valor en voltios,
+        deshaciendo el escalado del diezmado.
+
+        :param code: Código a convertir.
+        :param column: Columna a la que pertenece el código.
+        """
+        info = self._column_info[column]
+        return code * info.vref / (2 ** info.bits * info.scale)
+
+    def close(self):
+        """Cierra el fichero."""
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
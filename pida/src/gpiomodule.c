@@ -0,0 +1,499 @@
+#include <Python.h>
+#include <errno.h>
+#include <limits.h>
+#include <stdlib.h>
+#include <unistd.h>
+#include <sys/epoll.h>
+#include "tsop.h"
+
+/* BCM2835 GPIO registers as indexes of 32 bit words, see pida/gpio.py */
+#define GPSET0 7
+#define GPCLR0 10
+
+/* Reads the value file of a GPIO at offset 0 and returns 0 or 1, or -1
+ * with errno set on error. */
+static int read_fd_value(int fd)
+{
+  char value[2];
+
+  if (pread(fd, value, sizeof(value), 0) < 1)
+    return -1;
+  return value[0] == '1';
+}
+
+/* Writes "0" or "1" to the value file of a GPIO at offset 0. */
+static int write_fd_value(int fd, int value)
+{
+  return pwrite(fd, value ? "1" : "0", 1, 0) == 1 ? 0 : -1;
+}
+
+PyDoc_STRVAR(read_value_doc,
+	     "read_value(fd)\n"
+	     "\n"
+	     "Lee el fichero ``value`` de una GPIO en la posición 0 y devuelve 0 o 1.\n"
+	     "\n"
+	     ":param fd: descriptor del fichero ``value`` abierto.\n"
+	     );
+
+static PyObject *read_value(PyObject *self, PyObject *args)
+{
+  int fd, value;
+
+  if (!PyArg_ParseTuple(args, "i:read_value", &fd))
+    return NULL;
+
+  value = read_fd_value(fd);
+  if (value < 0)
+    return PyErr_SetFromErrno(PyExc_IOError);
+  return PyInt_FromLong(value);
+}
+
+PyDoc_STRVAR(write_value_doc,
+	     "write_value(fd, value)\n"
+	     "\n"
+	     "Escribe un valor en el fichero ``value`` de una GPIO en la posición 0.\n"
+	     "\n"
+	     ":param fd: descriptor del fichero ``value`` abierto.\n"
+	     ":param value: valor a escribir; cualquier valor distinto de 0 es 1.\n"
+	     );
+
+static PyObject *write_value(PyObject *self, PyObject *args)
+{
+  int fd, value;
+
+  if (!PyArg_ParseTuple(args, "ii:write_value", &fd, &value))
+    return NULL;
+
+  if (write_fd_value(fd, value) < 0)
+    return PyErr_SetFromErrno(PyExc_IOError);
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(write_pattern_doc,
+	     "write_pattern(fd, bits)\n"
+	     "\n"
+	     "Escribe consecutivamente, sin retener el GIL, una secuencia de valores\n"
+	     "en el fichero ``value`` de una GPIO.\n"
+	     "\n"
+	     ":param fd: descriptor del fichero ``value`` abierto.\n"
+	     ":param bits: búfer con un byte por valor; cualquier byte distinto de 0\n"
+	     "    es 1.\n"
+	     );
+
+static PyObject *write_pattern(PyObject *self, PyObject *args)
+{
+  int fd, error = 0;
+  Py_buffer bits;
+  Py_ssize_t i;
+  const unsigned char *data;
+
+  if (!PyArg_ParseTuple(args, "is*:write_pattern", &fd, &bits))
+    return NULL;
+
+  data = bits.buf;
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < bits.len; i++) {
+    if (write_fd_value(fd, data[i]) < 0) {
+      error = errno;
+      break;
+    }
+  }
+  Py_END_ALLOW_THREADS
+  PyBuffer_Release(&bits);
+
+  if (error) {
+    errno = error;
+    return PyErr_SetFromErrno(PyExc_IOError);
+  }
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(read_many_doc,
+	     "read_many(fd, count)\n"
+	     "\n"
+	     "Lee consecutivamente, sin retener el GIL, ``count`` valores del fichero\n"
+	     "``value`` de una GPIO y los devuelve en un ``bytearray`` con un byte\n"
+	     "(0 o 1) por valor.\n"
+	     "\n"
+	     ":param fd: descriptor del fichero ``value`` abierto.\n"
+	     ":param count: número de valores a leer.\n"
+	     );
+
+static PyObject *read_many(PyObject *self, PyObject *args)
+{
+  int fd, value, error = 0;
+  Py_ssize_t count, i;
+  PyObject *result;
+  char *data;
+
+  if (!PyArg_ParseTuple(args, "in:read_many", &fd, &count))
+    return NULL;
+  if (count < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    return NULL;
+  }
+
+  result = PyByteArray_FromStringAndSize(NULL, count);
+  if (result == NULL)
+    return NULL;
+  data = PyByteArray_AS_STRING(result);
+
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < count; i++) {
+    value = read_fd_value(fd);
+    if (value < 0) {
+      error = errno;
+      break;
+    }
+    data[i] = value;
+  }
+  Py_END_ALLOW_THREADS
+
+  if (error) {
+    Py_DECREF(result);
+    errno = error;
+    return PyErr_SetFromErrno(PyExc_IOError);
+  }
+  return result;
+}
+
+/* Converts a timeout in seconds to the milliseconds of epoll_wait: -1
+ * for a negative timeout and at most INT_MAX (about 24.8 days), as
+ * larger values would overflow int. */
+static int timeout_to_ms(double timeout)
+{
+  if (!(timeout >= 0))
+    return -1;
+  if (timeout * 1000 + 0.5 >= INT_MAX)
+    return INT_MAX;
+  return (int) (timeout * 1000 + 0.5);
+}
+
+PyDoc_STRVAR(wait_edge_doc,
+	     "wait_edge(epfd, fd[, timeout])\n"
+	     "\n"
+	     "Espera, sin retener el GIL, un flanco en una GPIO y devuelve el instante\n"
+	     "en que se detectó, en nanosegundos del reloj de :mod:`pida.clock`, o\n"
+	     "``None`` si se agota el tiempo de espera.\n"
+	     "\n"
+	     "Antes de esperar se lee el fichero ``value`` para descartar los flancos\n"
+	     "anteriores. El instante se toma nada más despertar, antes de volver a\n"
+	     "adquirir el GIL.\n"
+	     "\n"
+	     ":param epfd: descriptor de un ``epoll`` en el que está registrado ``fd``\n"
+	     "    con ``EPOLLPRI``.\n"
+	     ":param fd: descriptor del fichero ``value`` abierto.\n"
+	     ":param timeout: tiempo máximo de espera en segundos. Un valor negativo\n"
+	     "    (por defecto) espera indefinidamente. Los valores mayores que\n"
+	     "    ``INT_MAX`` milisegundos (unos 24,8 días) se limitan a ese valor.\n"
+	     );
+
+static PyObject *wait_edge(PyObject *self, PyObject *args)
+{
+  int epfd, fd, timeout_ms, ready = 0, error = 0;
+  double timeout = -1;
+  struct epoll_event event;
+  struct timespec now;
+
+  if (!PyArg_ParseTuple(args, "ii|d:wait_edge", &epfd, &fd, &timeout))
+    return NULL;
+  timeout_ms = timeout_to_ms(timeout);
+
+  Py_BEGIN_ALLOW_THREADS
+  if (read_fd_value(fd) < 0) {
+    error = errno;
+  } else {
+    do {
+      ready = epoll_wait(epfd, &event, 1, timeout_ms);
+    } while (ready < 0 && errno == EINTR);
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    if (ready < 0)
+      error = errno;
+  }
+  Py_END_ALLOW_THREADS
+
+  if (error) {
+    errno = error;
+    return PyErr_SetFromErrno(PyExc_IOError);
+  }
+  if (ready == 0)
+    Py_RETURN_NONE;
+  return PyLong_FromLongLong(ts_to_int_ns(now));
+}
+
+/* Reads the first byte of a file descriptor that signals edges and
+ * returns 0 or 1, or -1 with errno set on error. Descriptors that cannot
+ * seek, such as pipes, deliver one value per read. */
+static int read_edge_value(int fd)
+{
+  char value;
+
+  if (lseek(fd, 0, SEEK_SET) < 0 && errno != ESPIPE)
+    return -1;
+  if (read(fd, &value, 1) < 1)
+    return -1;
+  return value == '1';
+}
+
+PyDoc_STRVAR(wait_events_doc,
+	     "wait_events(epfd, fds, levels, times[, timeout])\n"
+	     "\n"
+	     "Espera, sin retener el GIL, flancos en los descriptores registrados en\n"
+	     "un ``epoll`` y devuelve el número de flancos detectados, o 0 si se\n"
+	     "agota el tiempo de espera.\n"
+	     "\n"
+	     "Cada flanco se guarda en la misma posición de los tres búferes de\n"
+	     "salida, que deben tener capacidad para el mismo número de flancos: el\n"
+	     "descriptor en ``fds``, el nivel leído (0 o 1) en ``levels`` y el\n"
+	     "instante en que se despertó, en segundos del reloj de :mod:`pida.clock`,\n"
+	     "en ``times``. Leer el nivel rearma la detección del flanco.\n"
+	     "\n"
+	     ":param epfd: descriptor del ``epoll``. Cada descriptor debe estar\n"
+	     "    registrado con su propio número como dato asociado, como hace\n"
+	     "    :meth:`select.epoll.register`.\n"
+	     ":param fds: búfer de enteros (``array('i')``) para los descriptores.\n"
+	     ":param levels: búfer de bytes (``array('b')``) para los niveles.\n"
+	     ":param times: búfer de reales (``array('d')``) para los instantes.\n"
+	     ":param timeout: tiempo máximo de espera en segundos. Un valor negativo\n"
+	     "    (por defecto) espera indefinidamente. Los valores mayores que\n"
+	     "    ``INT_MAX`` milisegundos (unos 24,8 días) se limitan a ese valor.\n"
+	     );
+
+static PyObject *wait_events(PyObject *self, PyObject *args)
+{
+  int epfd, timeout_ms, ready = 0, value, error = 0;
+  int *fds;
+  char *levels;
+  double *times, now_s;
+  double timeout = -1;
+  Py_ssize_t capacity, i, count = 0;
+  Py_buffer fds_buffer, levels_buffer, times_buffer;
+  struct epoll_event *events;
+  struct timespec now;
+
+  if (!PyArg_ParseTuple(args, "iw*w*w*|d:wait_events", &epfd, &fds_buffer,
+			&levels_buffer, &times_buffer, &timeout))
+    return NULL;
+
+  capacity = fds_buffer.len / sizeof(int);
+  if (levels_buffer.len < capacity || times_buffer.len / (Py_ssize_t) sizeof(double) < capacity) {
+    PyErr_SetString(PyExc_ValueError, "Buffers of different capacity");
+    goto release;
+  }
+  if (capacity == 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    goto release;
+  }
+  timeout_ms = timeout_to_ms(timeout);
+  events = malloc(capacity * sizeof(struct epoll_event));
+  if (events == NULL) {
+    PyErr_NoMemory();
+    goto release;
+  }
+  fds = fds_buffer.buf;
+  levels = levels_buffer.buf;
+  times = times_buffer.buf;
+
+  Py_BEGIN_ALLOW_THREADS
+  do {
+    ready = epoll_wait(epfd, events, capacity, timeout_ms);
+  } while (ready < 0 && errno == EINTR);
+  clock_gettime(CLOCK_MONOTONIC, &now);
+  if (ready < 0) {
+    error = errno;
+  } else {
+    now_s = ts_to_s(now);
+    for (i = 0; i < ready; i++) {
+      value = read_edge_value(events[i].data.fd);
+      if (value < 0) {
+	error = errno;
+	break;
+      }
+      fds[count] = events[i].data.fd;
+      levels[count] = value;
+      times[count] = now_s;
+      count++;
+    }
+  }
+  Py_END_ALLOW_THREADS
+  free(events);
+
+  if (error) {
+    errno = error;
+    PyErr_SetFromErrno(PyExc_IOError);
+    goto release;
+  }
+  PyBuffer_Release(&fds_buffer);
+  PyBuffer_Release(&levels_buffer);
+  PyBuffer_Release(&times_buffer);
+  return PyInt_FromSsize_t(count);
+
+ release:
+  PyBuffer_Release(&fds_buffer);
+  PyBuffer_Release(&levels_buffer);
+  PyBuffer_Release(&times_buffer);
+  return NULL;
+}
+
+/* Fills view with a writable buffer exported by obj. Objects that only
+ * implement the old buffer interface (array.array) are also accepted. */
+static int get_write_buffer(PyObject *obj, Py_buffer *view)
+{
+  void *buf;
+  Py_ssize_t len;
+
+  if (PyObject_CheckBuffer(obj))
+    return PyObject_GetBuffer(obj, view, PyBUF_WRITABLE);
+  if (PyObject_AsWriteBuffer(obj, &buf, &len) < 0)
+    return -1;
+  return PyBuffer_FillInfo(view, obj, buf, len, 0, PyBUF_WRITABLE);
+}
+
+PyDoc_STRVAR(play_pattern_doc,
+	     "play_pattern(target, mask, words, durations, first, count, deadline[, margin])\n"
+	     "\n"
+	     "Escribe ``count`` pasos de un patrón en unas GPIO sin retener el GIL y\n"
+	     "devuelve una tupla ``(n, deadline, missed, lateness, max_lateness)``: el\n"
+	     "número de pasos escritos, el instante límite del paso siguiente, el\n"
+	     "número de pasos que se escribieron después de su final, y la suma y el\n"
+	     "máximo de los retrasos de las escrituras en segundos.\n"
+	     "\n"
+	     "Cada paso se escribe al llegar a su instante límite, esperando con\n"
+	     "``clock_nanosleep``, y el instante límite del paso siguiente se calcula\n"
+	     "sumando la duración del paso, por lo que los retrasos no se acumulan.\n"
+	     "El patrón se recorre cíclicamente.\n"
+	     "\n"
+	     ":param target: descriptor del fichero ``value`` abierto de una GPIO, en\n"
+	     "    el que se escribe 1 si la palabra tiene a 1 algún bit de ``mask``,\n"
+	     "    o búfer con el bloque de registros de GPIO proyectado en memoria, en\n"
+	     "    el que cada paso pone a 1 los bits de ``mask`` que la palabra tiene a\n"
+	     "    1 y a 0 el resto, con una escritura en ``GPSET0`` y otra en\n"
+	     "    ``GPCLR0``.\n"
+	     ":param mask: máscara de las GPIO del banco 0 que se escriben.\n"
+	     ":param words: búfer de enteros de 32 bits sin signo (``array('I')``)\n"
+	     "    con los niveles de cada paso.\n"
+	     ":param durations: búfer de reales (``array('d')``) con la duración en\n"
+	     "    segundos de cada paso.\n"
+	     ":param first: posición del patrón del primer paso.\n"
+	     ":param count: número de pasos a escribir.\n"
+	     ":param deadline: instante límite del primer paso, en segundos del reloj\n"
+	     "    de :mod:`pida.clock`.\n"
+	     ":param margin: si es mayor que 0, la espera termina ``margin`` segundos\n"
+	     "    antes de cada instante límite y se consulta el reloj en un bucle\n"
+	     "    activo hasta alcanzarlo (ver :class:`pida.timers.PrecisionTimer`).\n"
+	     );
+
+static PyObject *play_pattern(PyObject *self, PyObject *args)
+{
+  int fd = -1, error = 0;
+  unsigned int mask;
+  double deadline_d, margin_d = 0, lateness, lateness_sum = 0, max_lateness = 0;
+  PyObject *target, *result = NULL;
+  Py_buffer registers = {NULL}, words, durations;
+  Py_ssize_t first, count, length, index, missed = 0, i = 0;
+  struct timespec deadline, margin, now;
+  volatile uint32_t *registers_data = NULL;
+  const uint32_t *word_data;
+  const double *duration_data;
+  uint32_t word;
+
+  if (!PyArg_ParseTuple(args, "OIs*s*nnd|d:play_pattern", &target, &mask, &words,
+			&durations, &first, &count, &deadline_d, &margin_d))
+    return NULL;
+
+  if (PyInt_Check(target) || PyLong_Check(target)) {
+    fd = (int) PyInt_AsLong(target);
+    if (PyErr_Occurred())
+      goto out;
+  } else {
+    if (get_write_buffer(target, &registers) < 0)
+      goto out;
+    if (registers.len < (Py_ssize_t) ((GPCLR0 + 1) * sizeof(uint32_t))) {
+      PyErr_SetString(PyExc_ValueError, "Register block is too short");
+      goto out;
+    }
+    registers_data = registers.buf;
+  }
+
+  length = words.len / sizeof(uint32_t);
+  if (length == 0 || durations.len / (Py_ssize_t) sizeof(double) != length) {
+    PyErr_SetString(PyExc_ValueError, "words and durations must hold the same steps");
+    goto out;
+  }
+  if (first < 0 || count < 0 || margin_d < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    goto out;
+  }
+  word_data = words.buf;
+  duration_data = durations.buf;
+
+  Py_BEGIN_ALLOW_THREADS
+  deadline = double_to_ts(deadline_d);
+  margin = double_to_ts(margin_d);
+
+  for (i = 0; i < count; i++) {
+    index = (first + i) % length;
+    word = word_data[index];
+
+    /* Sleep till the step deadline */
+    ts_wait(deadline, margin);
+    if (registers_data != NULL) {
+      registers_data[GPSET0] = word & mask;
+      registers_data[GPCLR0] = ~word & mask;
+    } else if (write_fd_value(fd, word & mask) < 0) {
+      error = errno;
+      break;
+    }
+    clock_gettime(CLOCK_MONOTONIC, &now);
+
+    lateness = ts_to_s(ts_subtract(now, deadline));
+    if (lateness > 0) {
+      lateness_sum += lateness;
+      if (lateness > max_lateness)
+	max_lateness = lateness;
+    }
+    if (lateness >= duration_data[index])
+      missed++;
+    deadline = ts_add(deadline, double_to_ts(duration_data[index]));
+  }
+  Py_END_ALLOW_THREADS
+
+  if (error) {
+    errno = error;
+    PyErr_SetFromErrno(PyExc_IOError);
+    goto out;
+  }
+  result = Py_BuildValue("ndndd", i, ts_to_s(deadline), missed, lateness_sum, max_lateness);
+
+ out:
+  if (registers.buf != NULL)
+    PyBuffer_Release(&registers);
+  PyBuffer_Release(&durations);
+  PyBuffer_Release(&words);
+  return result;
+}
+
+static PyMethodDef gpiocore_methods[] = {
+  {"read_value", read_value, METH_VARARGS, read_value_doc},
+  {"write_value", write_value, METH_VARARGS, write_value_doc},
+  {"write_pattern", write_pattern, METH_VARARGS, write_pattern_doc},
+  {"read_many", read_many, METH_VARARGS, read_many_doc},
+  {"wait_edge", wait_edge, METH_VARARGS, wait_edge_doc},
+  {"wait_events", wait_events, METH_VARARGS, wait_events_doc},
+  {"play_pattern", play_pattern, METH_VARARGS, play_pattern_doc},
+  {NULL, NULL, 0, NULL}
+};
+
+PyDoc_STRVAR(gpiocore_module_doc,
+	     "Este módulo contiene las operaciones nativas sobre los ficheros de las\n"
+	     "GPIO que usa :mod:`pida.gpio`: lecturas y escrituras en la posición 0 de\n"
+	     "un descriptor abierto, escrituras y lecturas en bloque y esperas de\n"
+	     "flancos de una o varias GPIO, y la reproducción temporizada de patrones,\n"
+	     "todas sin retener el GIL.\n"
+	     );
+
+PyMODINIT_FUNC initgpiocore(void) {
+  PyObject *module = Py_InitModule3("gpiocore", gpiocore_methods, gpiocore_module_doc);
+  if (module == NULL)
+    return;
+}
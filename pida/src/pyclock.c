@@ -40,10 +40,141 @@ static PyObject *py_sleep(PyObject *self, PyObject *args) {
   return Py_BuildValue("i", result);
 }
 
+PyDoc_STRVAR(py_time_ns_doc,
+	     "time_ns() \n\n"
+	     "Return current instant as an integer number of nanoseconds.\n");
+
+/* Returns the current value of CLOCK_MONOTONIC in nanoseconds */
+static PyObject *py_time_ns(PyObject *self, PyObject *args) {
+  struct timespec result;
+
+  clock_gettime(CLOCK_MONOTONIC, &result);
+
+  return PyLong_FromLongLong(ts_to_int_ns(result));
+}
+
+
+PyDoc_STRVAR(py_sleep_until_ns_doc,
+	     "sleep_until_ns(request_ns)\n\n"
+	     "Sleep until the instant given as an integer number of nanoseconds\n");
+
+static PyObject *py_sleep_until_ns(PyObject *self, PyObject *args) {
+  struct timespec request;
+  PY_LONG_LONG request_ns;
+  int result;
+
+  if (!PyArg_ParseTuple(args, "L", &request_ns)) {
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  request = int_ns_to_ts(request_ns);
+
+  result = clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &request, NULL);
+  Py_END_ALLOW_THREADS
+
+  return Py_BuildValue("i", result);
+}
+
+
+PyDoc_STRVAR(py_precise_sleep_doc,
+	     "precise_sleep(request, margin)\n\n"
+	     "Sleep until margin seconds before the instant request, then busy-poll\n"
+	     "the clock until request\n");
+
+static PyObject *py_precise_sleep(PyObject *self, PyObject *args) {
+  double request_d, margin_d;
+
+  if (!PyArg_ParseTuple(args, "dd", &request_d, &margin_d)) {
+    return NULL;
+  }
+  if (margin_d < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  ts_wait(double_to_ts(request_d), double_to_ts(margin_d));
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+
+PyDoc_STRVAR(py_precise_sleep_until_ns_doc,
+	     "precise_sleep_until_ns(request_ns, margin_ns)\n\n"
+	     "Integer nanosecond version of precise_sleep\n");
+
+static PyObject *py_precise_sleep_until_ns(PyObject *self, PyObject *args) {
+  PY_LONG_LONG request_ns, margin_ns;
+
+  if (!PyArg_ParseTuple(args, "LL", &request_ns, &margin_ns)) {
+    return NULL;
+  }
+  if (margin_ns < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  ts_wait(int_ns_to_ts(request_ns), int_ns_to_ts(margin_ns));
+  Py_END_ALLOW_THREADS
+
+  Py_RETURN_NONE;
+}
+
+
+PyDoc_STRVAR(py_timestamps_doc,
+	     "timestamps(n)\n\n"
+	     "Read the clock n times in a row and return the list of instants as\n"
+	     "integer numbers of nanoseconds\n");
+
+static PyObject *py_timestamps(PyObject *self, PyObject *args) {
+  Py_ssize_t n, i;
+  struct timespec *readings;
+  PyObject *result, *item;
+
+  if (!PyArg_ParseTuple(args, "n", &n)) {
+    return NULL;
+  }
+  if (n < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    return NULL;
+  }
+
+  readings = PyMem_New(struct timespec, n > 0 ? n : 1);
+  if (readings == NULL)
+    return PyErr_NoMemory();
+
+  Py_BEGIN_ALLOW_THREADS
+  for (i = 0; i < n; i++)
+    clock_gettime(CLOCK_MONOTONIC, &readings[i]);
+  Py_END_ALLOW_THREADS
+
+  result = PyList_New(n);
+  for (i = 0; result != NULL && i < n; i++) {
+    item = PyLong_FromLongLong(ts_to_int_ns(readings[i]));
+    if (item == NULL) {
+      Py_CLEAR(result);
+      break;
+    }
+    PyList_SET_ITEM(result, i, item);
+  }
+
+  PyMem_Del(readings);
+  return result;
+}
+
 /* Module method table */
 static PyMethodDef clock_methods[] = {
   {"time", py_time, METH_VARARGS, py_time_doc},
   {"sleep", py_sleep, METH_VARARGS, py_sleep_doc},
+  {"time_ns", py_time_ns, METH_NOARGS, py_time_ns_doc},
+  {"sleep_until_ns", py_sleep_until_ns, METH_VARARGS, py_sleep_until_ns_doc},
+  {"timestamps", py_timestamps, METH_VARARGS, py_timestamps_doc},
+  {"precise_sleep", py_precise_sleep, METH_VARARGS, py_precise_sleep_doc},
+  {"precise_sleep_until_ns", py_precise_sleep_until_ns, METH_VARARGS,
+   py_precise_sleep_until_ns_doc},
   {NULL, NULL, 0, NULL}
 };
 
@@ -0,0 +1,473 @@
+#include <Python.h>
+#include <errno.h>
+#include <math.h>
+#include <string.h>
+#include <unistd.h>
+#include <sys/ioctl.h>
+#include <linux/spi/spidev.h>
+#include "tsop.h"
+
+/* Layout of the timing accumulators, see pida/statistics.py */
+enum {
+  STAT_COUNT,
+  STAT_LATENESS,
+  STAT_LATENESS_SQUARES,
+  STAT_MAX_LATENESS,
+  STAT_TRANSFER,
+  STAT_SLEEP,
+  STAT_OVERRUNS,
+  STAT_LAST_TIME,
+  STAT_FIELDS
+};
+
+/* Adds the timing of one sample to the accumulators. The lateness
+ * histogram has power of 2 microsecond bins after the fixed fields. */
+static void record(double *stats, Py_ssize_t nbins, double lateness,
+		   double transfer, double sleep, int overrun, double elapsed)
+{
+  double us = lateness * 1e6;
+  Py_ssize_t bin = 0;
+  int exponent;
+
+  stats[STAT_COUNT] += 1;
+  stats[STAT_LATENESS] += lateness;
+  stats[STAT_LATENESS_SQUARES] += lateness * lateness;
+  if (lateness > stats[STAT_MAX_LATENESS])
+    stats[STAT_MAX_LATENESS] = lateness;
+  stats[STAT_TRANSFER] += transfer;
+  stats[STAT_SLEEP] += sleep;
+  if (overrun)
+    stats[STAT_OVERRUNS] += 1;
+  stats[STAT_LAST_TIME] = elapsed;
+
+  if (us >= 1) {
+    frexp(us, &exponent);
+    bin = exponent;
+  }
+  if (bin >= nbins)
+    bin = nbins - 1;
+  stats[STAT_FIELDS + bin] += 1;
+}
+
+/* Fills view with a writable buffer exported by obj. Objects that only
+ * implement the old buffer interface (array.array) are also accepted. */
+static int get_write_buffer(PyObject *obj, Py_buffer *view)
+{
+  void *buf;
+  Py_ssize_t len;
+
+  if (PyObject_CheckBuffer(obj))
+    return PyObject_GetBuffer(obj, view, PyBUF_WRITABLE);
+
+  if (PyObject_AsWriteBuffer(obj, &buf, &len) < 0)
+    return -1;
+  return PyBuffer_FillInfo(view, obj, buf, len, 0, PyBUF_WRITABLE);
+}
+
+/* Instant in nanoseconds of sample number n. Deadlines are computed from
+ * the sample number instead of adding the period to the previous one, so
+ * rounding errors do not accumulate. */
+static int64_t deadline_ns(int64_t start_ns, double period_ns, Py_ssize_t n)
+{
+  return start_ns + llround(n * period_ns);
+}
+
+/* Whether fd is a spidev device in CS_HIGH mode, where the kernel only
+ * releases CS after a read. SpiDev.xfer2 issues a 0 byte read after every
+ * transfer for that reason; the native engines do it only when needed. */
+static int cs_high(int fd)
+{
+  uint8_t mode = 0;
+
+  if (ioctl(fd, SPI_IOC_RD_MODE, &mode) < 0)
+    return 0;
+  return (mode & SPI_CS_HIGH) != 0;
+}
+
+PyDoc_STRVAR(sample_doc,
+	     "sample(fd, request, shift, mask, start, period, number, times, codes, first, count[, stats[, nanoseconds[, margin]]])\n"
+	     "\n"
+	     "Toma ``count`` muestras de un conversor conectado a un dispositivo SPI\n"
+	     "sin retener el GIL y devuelve el número de muestras tomadas.\n"
+	     "\n"
+	     "La muestra número ``n`` está prevista en el instante\n"
+	     "``start + n * period``, calculado en nanosegundos enteros a partir de\n"
+	     "``n``, por lo que los redondeos no se acumulan. En cada muestra se\n"
+	     "envía la trama ``request`` por el descriptor ``fd`` y se espera con\n"
+	     "``clock_nanosleep`` hasta el instante previsto de la siguiente. La\n"
+	     "respuesta se interpreta como un entero big-endian y el código de la\n"
+	     "muestra es ``(respuesta >> shift) & mask``. Si el dispositivo está en\n"
+	     "modo ``SPI_CS_HIGH``, tras cada transferencia se hace una lectura de 0\n"
+	     "bytes para liberar CS, igual que :meth:`pida.spidev.SpiDev.xfer2`.\n"
+	     "\n"
+	     ":param fd: descriptor de fichero de un dispositivo spidev abierto.\n"
+	     ":param request: trama a enviar (de 1 a 4 bytes).\n"
+	     ":param shift: desplazamiento a la derecha de la respuesta.\n"
+	     ":param mask: máscara que se aplica a la respuesta desplazada.\n"
+	     ":param start: instante en nanosegundos de la muestra número 0, que es\n"
+	     "    la referencia de los tiempos de las muestras.\n"
+	     ":param period: periodo de muestreo en segundos (0 = sin espera).\n"
+	     ":param number: número de la primera muestra a tomar.\n"
+	     ":param times: búfer circular de ``double`` con los tiempos.\n"
+	     ":param codes: búfer circular de ``int`` con los códigos.\n"
+	     ":param first: posición del búfer circular de la primera muestra.\n"
+	     ":param count: número de muestras a tomar.\n"
+	     ":param stats: búfer de ``double`` con los acumulados de temporización\n"
+	     "    (ver :class:`pida.statistics.TimingStatistics`), o ``None``.\n"
+	     ":param nanoseconds: si es verdadero, ``times`` es un búfer de ``int64``\n"
+	     "    en el que los tiempos se guardan en nanosegundos.\n"
+	     ":param margin: si es mayor que 0, la espera termina ``margin`` segundos\n"
+	     "    antes de cada instante límite y se consulta el reloj en un bucle\n"
+	     "    activo hasta alcanzarlo (ver :class:`pida.timers.PrecisionTimer`).\n"
+	     );
+
+static PyObject *sample(PyObject *self, PyObject *args)
+{
+  int fd, nanoseconds = 0, error = 0, high;
+  unsigned int shift, mask;
+  double period_d, period_ns, margin_d = 0;
+  PY_LONG_LONG start_ns;
+  PyObject *times_obj, *codes_obj, *stats_obj = Py_None, *result = NULL;
+  Py_buffer request, times, codes, stats = {NULL};
+  Py_ssize_t number, first, count, capacity, index, nbins = 0, i = 0;
+  struct spi_ioc_transfer xfer;
+  struct timespec now, done, woken, scheduled, deadline, margin;
+  uint8_t rx[sizeof(uint32_t)];
+  uint32_t value;
+  double *time_data, *stats_data = NULL, elapsed;
+  int64_t *time_ns_data;
+  int *code_data;
+  int j;
+
+  if (!PyArg_ParseTuple(args, "is*IILdnOOnn|Oid:sample", &fd, &request, &shift, &mask,
+			&start_ns, &period_d, &number, &times_obj, &codes_obj,
+			&first, &count, &stats_obj, &nanoseconds, &margin_d))
+    return NULL;
+
+  if (get_write_buffer(times_obj, &times) < 0) {
+    PyBuffer_Release(&request);
+    return NULL;
+  }
+  if (get_write_buffer(codes_obj, &codes) < 0) {
+    PyBuffer_Release(&times);
+    PyBuffer_Release(&request);
+    return NULL;
+  }
+
+  if (stats_obj != Py_None && get_write_buffer(stats_obj, &stats) < 0)
+    goto out;
+
+  if (request.len < 1 || request.len > (Py_ssize_t)sizeof(rx)) {
+    PyErr_SetString(PyExc_ValueError, "request must hold from 1 to 4 bytes");
+    goto out;
+  }
+
+  capacity = times.len / (nanoseconds ? sizeof(int64_t) : sizeof(double));
+  if (capacity == 0 || (Py_ssize_t)(codes.len / sizeof(int)) < capacity) {
+    PyErr_SetString(PyExc_ValueError, "codes must hold as many items as times");
+    goto out;
+  }
+
+  if (number < 0 || first < 0 || count < 0 || period_d < 0 || margin_d < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    goto out;
+  }
+
+  if (stats.buf != NULL) {
+    nbins = stats.len / sizeof(double) - STAT_FIELDS;
+    if (nbins <= 0) {
+      PyErr_SetString(PyExc_ValueError, "stats is too short");
+      goto out;
+    }
+    stats_data = (double *)stats.buf;
+  }
+
+  memset(&xfer, 0, sizeof xfer);
+  xfer.tx_buf = (unsigned long)request.buf;
+  xfer.rx_buf = (unsigned long)rx;
+  xfer.len = request.len;
+
+  time_data = (double *)times.buf;
+  time_ns_data = (int64_t *)times.buf;
+  code_data = (int *)codes.buf;
+
+  Py_BEGIN_ALLOW_THREADS
+  period_ns = period_d * NS_PER_S;
+  margin = double_to_ts(margin_d);
+  high = count > 0 && cs_high(fd);
+
+  for (i = 0; i < count; i++) {
+    /* Calculate iteration end time */
+    scheduled = int_ns_to_ts(deadline_ns(start_ns, period_ns, number + i));
+    deadline = int_ns_to_ts(deadline_ns(start_ns, period_ns, number + i + 1));
+
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    if (ioctl(fd, SPI_IOC_MESSAGE(1), &xfer) < 0) {
+      error = errno;
+      break;
+    }
+    if (high)
+      read(fd, rx, 0);
+
+    value = 0;
+    for (j = 0; j < request.len; j++)
+      value = (value << 8) | rx[j];
+
+    index = (first + i) % capacity;
+    if (nanoseconds) {
+      time_ns_data[index] = ts_to_int_ns(now) - start_ns;
+      elapsed = time_ns_data[index] / (double)NS_PER_S;
+    } else {
+      elapsed = (ts_to_int_ns(now) - start_ns) / (double)NS_PER_S;
+      time_data[index] = elapsed;
+    }
+    code_data[index] = (value >> shift) & mask;
+
+    if (stats_data != NULL)
+      clock_gettime(CLOCK_MONOTONIC, &done);
+
+    /* Sleep till iteration end time */
+    if (period_d > 0)
+      ts_wait(deadline, margin);
+
+    if (stats_data != NULL) {
+      clock_gettime(CLOCK_MONOTONIC, &woken);
+      record(stats_data, nbins,
+	     period_d > 0 ? ts_to_s(ts_subtract(now, scheduled)) : 0.0,
+	     ts_to_s(ts_subtract(done, now)), ts_to_s(ts_subtract(woken, done)),
+	     period_d > 0 && ts_to_s(done) >= ts_to_s(deadline), elapsed);
+    }
+  }
+  Py_END_ALLOW_THREADS
+
+  if (error) {
+    errno = error;
+    PyErr_SetFromErrno(PyExc_IOError);
+    goto out;
+  }
+
+  result = PyInt_FromSsize_t(i);
+out:
+  if (stats.buf != NULL)
+    PyBuffer_Release(&stats);
+  PyBuffer_Release(&codes);
+  PyBuffer_Release(&times);
+  PyBuffer_Release(&request);
+  return result;
+}
+
+PyDoc_STRVAR(play_doc,
+	     "play(fd, frames, frame_size, start, period, number, count, stats[, margin])\n"
+	     "\n"
+	     "Envía ``count`` tramas precalculadas a un conversor conectado a un\n"
+	     "dispositivo SPI sin retener el GIL y devuelve el número de tramas\n"
+	     "enviadas.\n"
+	     "\n"
+	     "La trama número ``n`` se envía al llegar a su instante límite,\n"
+	     "``start + n * period``, esperando con ``clock_nanosleep``. El instante\n"
+	     "se calcula en nanosegundos enteros a partir de ``n``, por lo que ni\n"
+	     "los retrasos ni los redondeos se acumulan. La tabla de tramas se\n"
+	     "recorre cíclicamente. La temporización de cada trama se registra en\n"
+	     "``stats``; una trama cuya transferencia termina después del instante\n"
+	     "límite de la siguiente cuenta como desbordamiento. En modo\n"
+	     "``SPI_CS_HIGH`` se libera CS como en :func:`sample`.\n"
+	     "\n"
+	     ":param fd: descriptor de fichero de un dispositivo spidev abierto.\n"
+	     ":param frames: tabla con las tramas consecutivas, todas de\n"
+	     "    ``frame_size`` bytes.\n"
+	     ":param frame_size: número de bytes de cada trama (de 1 a 4).\n"
+	     ":param start: instante en nanosegundos de la trama número 0, que es\n"
+	     "    la referencia de los tiempos registrados.\n"
+	     ":param period: periodo entre tramas en segundos.\n"
+	     ":param number: número de la primera trama a enviar; su posición en la\n"
+	     "    tabla es ``number`` módulo el número de tramas de la tabla.\n"
+	     ":param count: número de tramas a enviar.\n"
+	     ":param stats: búfer de ``double`` con los acumulados de temporización\n"
+	     "    (ver :class:`pida.statistics.TimingStatistics`).\n"
+	     ":param margin: si es mayor que 0, la espera termina ``margin`` segundos\n"
+	     "    antes de cada instante límite y se consulta el reloj en un bucle\n"
+	     "    activo hasta alcanzarlo (ver :class:`pida.timers.PrecisionTimer`).\n"
+	     );
+
+static PyObject *play(PyObject *self, PyObject *args)
+{
+  int fd, error = 0, high;
+  double period_d, period_ns, margin_d = 0, *stats_data;
+  PY_LONG_LONG start_ns;
+  PyObject *stats_obj, *result = NULL;
+  Py_buffer frames, stats;
+  Py_ssize_t frame_size, number, count, length, nbins, i = 0;
+  struct spi_ioc_transfer xfer;
+  struct timespec before, now, done, deadline, next, margin;
+  uint8_t rx[sizeof(uint32_t)];
+  const uint8_t *frame_data;
+
+  if (!PyArg_ParseTuple(args, "is*nLdnnO|d:play", &fd, &frames, &frame_size, &start_ns,
+			&period_d, &number, &count, &stats_obj, &margin_d))
+    return NULL;
+
+  if (get_write_buffer(stats_obj, &stats) < 0) {
+    PyBuffer_Release(&frames);
+    return NULL;
+  }
+
+  if (frame_size < 1 || frame_size > (Py_ssize_t)sizeof(rx)) {
+    PyErr_SetString(PyExc_ValueError, "frames must hold from 1 to 4 bytes");
+    goto out;
+  }
+  length = frames.len / frame_size;
+  if (length == 0 || frames.len % frame_size) {
+    PyErr_SetString(PyExc_ValueError, "frames must hold whole frames");
+    goto out;
+  }
+  if (number < 0 || count < 0 || period_d < 0 || margin_d < 0) {
+    PyErr_SetString(PyExc_ValueError, "Positive number expected");
+    goto out;
+  }
+  nbins = stats.len / sizeof(double) - STAT_FIELDS;
+  if (nbins <= 0) {
+    PyErr_SetString(PyExc_ValueError, "stats is too short");
+    goto out;
+  }
+  stats_data = (double *)stats.buf;
+  frame_data = frames.buf;
+
+  memset(&xfer, 0, sizeof xfer);
+  xfer.rx_buf = (unsigned long)rx;
+  xfer.len = frame_size;
+
+  Py_BEGIN_ALLOW_THREADS
+  period_ns = period_d * NS_PER_S;
+  margin = double_to_ts(margin_d);
+  high = count > 0 && cs_high(fd);
+
+  for (i = 0; i < count; i++) {
+    xfer.tx_buf = (unsigned long)(frame_data + ((number + i) % length) * frame_size);
+    deadline = int_ns_to_ts(deadline_ns(start_ns, period_ns, number + i));
+    next = int_ns_to_ts(deadline_ns(start_ns, period_ns, number + i + 1));
+
+    /* Sleep till the frame deadline */
+    clock_gettime(CLOCK_MONOTONIC, &before);
+    ts_wait(deadline, margin);
+
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    if (ioctl(fd, SPI_IOC_MESSAGE(1), &xfer) < 0) {
+      error = errno;
+      break;
+    }
+    if (high)
+      read(fd, rx, 0);
+    clock_gettime(CLOCK_MONOTONIC, &done);
+
+    record(stats_data, nbins, ts_to_s(ts_subtract(now, deadline)),
+	   ts_to_s(ts_subtract(done, now)), ts_to_s(ts_subtract(now, before)),
+	   period_d > 0 && ts_to_s(done) >= ts_to_s(next),
+	   (ts_to_int_ns(now) - start_ns) / (double)NS_PER_S);
+  }
+  Py_END_ALLOW_THREADS
+
+  if (error) {
+    errno = error;
+    PyErr_SetFromErrno(PyExc_IOError);
+    goto out;
+  }
+
+  result = PyInt_FromSsize_t(i);
+out:
+  PyBuffer_Release(&stats);
+  PyBuffer_Release(&frames);
+  return result;
+}
+
+PyDoc_STRVAR(store_count_doc,
+	     "store_count(counter, value)\n"
+	     "\n"
+	     "Guarda ``value`` en el entero de 64 bits ``counter`` después de una\n"
+	     "barrera de memoria completa, de modo que cualquier proceso que lea el\n"
+	     "nuevo valor con :func:`load_count` ve también todas las escrituras\n"
+	     "anteriores a la llamada.\n"
+	     "\n"
+	     ":param counter: búfer escribible de al menos 8 bytes (por ejemplo un\n"
+	     "    :class:`ctypes.c_int64`).\n"
+	     ":param value: valor a guardar.\n"
+	     );
+
+static PyObject *store_count(PyObject *self, PyObject *args)
+{
+  PyObject *counter_obj;
+  PY_LONG_LONG value;
+  Py_buffer counter;
+
+  if (!PyArg_ParseTuple(args, "OL:store_count", &counter_obj, &value))
+    return NULL;
+  if (get_write_buffer(counter_obj, &counter) < 0)
+    return NULL;
+  if (counter.len < (Py_ssize_t)sizeof(int64_t)) {
+    PyBuffer_Release(&counter);
+    PyErr_SetString(PyExc_ValueError, "counter must hold 8 bytes");
+    return NULL;
+  }
+
+  __sync_synchronize();
+  *(volatile int64_t *)counter.buf = value;
+
+  PyBuffer_Release(&counter);
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(load_count_doc,
+	     "load_count(counter)\n"
+	     "\n"
+	     "Devuelve el entero de 64 bits ``counter`` seguido de una barrera de\n"
+	     "memoria completa, de modo que las lecturas posteriores ven al menos\n"
+	     "las escrituras que precedieron a la llamada a :func:`store_count` que\n"
+	     "guardó el valor.\n"
+	     "\n"
+	     ":param counter: búfer de al menos 8 bytes (por ejemplo un\n"
+	     "    :class:`ctypes.c_int64`).\n"
+	     );
+
+static PyObject *load_count(PyObject *self, PyObject *args)
+{
+  PyObject *counter_obj;
+  Py_buffer counter;
+  int64_t value;
+
+  if (!PyArg_ParseTuple(args, "O:load_count", &counter_obj))
+    return NULL;
+  if (get_write_buffer(counter_obj, &counter) < 0)
+    return NULL;
+  if (counter.len < (Py_ssize_t)sizeof(int64_t)) {
+    PyBuffer_Release(&counter);
+    PyErr_SetString(PyExc_ValueError, "counter must hold 8 bytes");
+    return NULL;
+  }
+
+  value = *(volatile int64_t *)counter.buf;
+  __sync_synchronize();
+
+  PyBuffer_Release(&counter);
+  return PyLong_FromLongLong(value);
+}
+
+static PyMethodDef sampling_methods[] = {
+  {"sample", sample, METH_VARARGS, sample_doc},
+  {"play", play, METH_VARARGS, play_doc},
+  {"store_count", store_count, METH_VARARGS, store_count_doc},
+  {"load_count", load_count, METH_VARARGS, load_count_doc},
+  {NULL, NULL, 0, NULL}
+};
+
+PyDoc_STRVAR(sampling_module_doc,
+	     "Este módulo contiene los motores de muestreo nativos que usan las\n"
+	     "adquisiciones de datos, y el de reproducción de formas de onda, cuando\n"
+	     "el canal y el conversor lo permiten. También incluye las barreras de\n"
+	     "memoria con las que se publica el número de muestras de los búferes\n"
+	     "compartidos entre procesos.\n"
+	     );
+
+PyMODINIT_FUNC initsampling(void) {
+  PyObject *module = Py_InitModule3("sampling", sampling_methods, sampling_module_doc);
+  if (module == NULL)
+    return;
+}
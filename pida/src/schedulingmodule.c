@@ -1,5 +1,9 @@
 #include <Python.h>
 #include <sched.h>
+#include <pthread.h>
+#include <sys/mman.h>
+#include <errno.h>
+#include <string.h>
 
 static PyObject *posix_error(void)
 {
@@ -91,10 +95,174 @@ static PyObject *get_priority_range(PyObject *self, PyObject *args)
   return Py_BuildValue("ii", min_priority, max_priority);  
 }
 
+PyDoc_STRVAR(get_thread_policy_doc,
+	     "get_thread_policy()\n\n"
+	     "Devuelve una tupla con la política y la prioridad de planificador\n"
+	     "del hilo que invoca la función.");
+
+static PyObject *get_thread_policy(PyObject *self, PyObject *args)
+{
+  int policy, error;
+  struct sched_param param;
+
+  if ((error = pthread_getschedparam(pthread_self(), &policy, &param)) != 0) {
+    errno = error;
+    return posix_error();
+  }
+
+  return Py_BuildValue("ii", policy, param.sched_priority);
+}
+
+PyDoc_STRVAR(set_thread_policy_doc,
+	     "set_thread_policy(policy, priority)\n\n"
+	     "Fija la política de planificador del hilo que invoca la función,\n"
+	     "sin modificar la del resto de hilos del proceso.\n"
+	     "\n"
+	     ":param policy: política de planificador.\n"
+	     ":param priority: prioridad de planificador.\n"
+	     );
+
+static PyObject *set_thread_policy(PyObject *self, PyObject *args)
+{
+  int policy, error;
+  struct sched_param param;
+
+  memset(&param, 0, sizeof param);
+  if (!PyArg_ParseTuple(args, "ii", &policy, &param.sched_priority))
+    return NULL;
+
+  if ((error = pthread_setschedparam(pthread_self(), policy, &param)) != 0) {
+    errno = error;
+    return posix_error();
+  }
+
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(get_affinity_doc,
+	     "get_affinity()\n\n"
+	     "Devuelve la lista de procesadores en los que puede ejecutarse el\n"
+	     "hilo que invoca la función.");
+
+static PyObject *get_affinity(PyObject *self, PyObject *args)
+{
+  cpu_set_t set;
+  PyObject *cpus, *cpu;
+  int i;
+
+  CPU_ZERO(&set);
+  if (sched_getaffinity(0, sizeof set, &set) < 0)
+    return posix_error();
+
+  if ((cpus = PyList_New(0)) == NULL)
+    return NULL;
+  for (i = 0; i < CPU_SETSIZE; i++) {
+    if (!CPU_ISSET(i, &set))
+      continue;
+    cpu = PyInt_FromLong(i);
+    if (cpu == NULL || PyList_Append(cpus, cpu) < 0) {
+      Py_XDECREF(cpu);
+      Py_DECREF(cpus);
+      return NULL;
+    }
+    Py_DECREF(cpu);
+  }
+
+  return cpus;
+}
+
+PyDoc_STRVAR(set_affinity_doc,
+	     "set_affinity(cpus)\n\n"
+	     "Restringe el hilo que invoca la función a un conjunto de procesadores.\n"
+	     "\n"
+	     ":param cpus: secuencia con los números de los procesadores.\n"
+	     "\n"
+	     "Ejemplo de uso:\n"
+	     "\n"
+	     ">>> import pida.scheduling\n"
+	     ">>> pida.scheduling.set_affinity([3])\n"
+	     ">>> pida.scheduling.get_affinity()\n"
+	     "[3]\n"
+	     );
+
+static PyObject *set_affinity(PyObject *self, PyObject *args)
+{
+  PyObject *cpus, *sequence;
+  cpu_set_t set;
+  Py_ssize_t i;
+  long cpu;
+
+  if (!PyArg_ParseTuple(args, "O", &cpus))
+    return NULL;
+  if ((sequence = PySequence_Fast(cpus, "cpus must be a sequence")) == NULL)
+    return NULL;
+
+  CPU_ZERO(&set);
+  for (i = 0; i < PySequence_Fast_GET_SIZE(sequence); i++) {
+    cpu = PyInt_AsLong(PySequence_Fast_GET_ITEM(sequence, i));
+    if (cpu == -1 && PyErr_Occurred()) {
+      Py_DECREF(sequence);
+      return NULL;
+    }
+    if (cpu < 0 || cpu >= CPU_SETSIZE) {
+      Py_DECREF(sequence);
+      PyErr_SetString(PyExc_ValueError, "CPU number out of range");
+      return NULL;
+    }
+    CPU_SET(cpu, &set);
+  }
+  Py_DECREF(sequence);
+
+  if (sched_setaffinity(0, sizeof set, &set) < 0)
+    return posix_error();
+
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(lock_memory_doc,
+	     "lock_memory(flags=MCL_CURRENT | MCL_FUTURE)\n\n"
+	     "Bloquea en memoria física las páginas del proceso (``mlockall``), de\n"
+	     "forma que su acceso nunca provoca fallos de página.\n"
+	     "\n"
+	     ":param flags: ``MCL_CURRENT`` bloquea las páginas actuales y\n"
+	     "    ``MCL_FUTURE`` las que se reserven en adelante.\n"
+	     );
+
+static PyObject *lock_memory(PyObject *self, PyObject *args)
+{
+  int flags = MCL_CURRENT | MCL_FUTURE;
+
+  if (!PyArg_ParseTuple(args, "|i", &flags))
+    return NULL;
+
+  if (mlockall(flags) < 0)
+    return posix_error();
+
+  Py_RETURN_NONE;
+}
+
+PyDoc_STRVAR(unlock_memory_doc,
+	     "unlock_memory()\n\n"
+	     "Desbloquea las páginas del proceso (``munlockall``).");
+
+static PyObject *unlock_memory(PyObject *self, PyObject *args)
+{
+  if (munlockall() < 0)
+    return posix_error();
+
+  Py_RETURN_NONE;
+}
+
 static PyMethodDef scheduling_methods[] = {
   {"get_policy", get_policy, METH_VARARGS, get_policy_doc},
   {"set_policy", set_policy, METH_VARARGS, set_policy_doc},
   {"get_priority_range", get_priority_range, METH_VARARGS, get_priority_range_doc},
+  {"get_thread_policy", get_thread_policy, METH_NOARGS, get_thread_policy_doc},
+  {"set_thread_policy", set_thread_policy, METH_VARARGS, set_thread_policy_doc},
+  {"get_affinity", get_affinity, METH_NOARGS, get_affinity_doc},
+  {"set_affinity", set_affinity, METH_VARARGS, set_affinity_doc},
+  {"lock_memory", lock_memory, METH_VARARGS, lock_memory_doc},
+  {"unlock_memory", unlock_memory, METH_NOARGS, unlock_memory_doc},
   {NULL, NULL, 0, NULL}
 };
 
@@ -105,7 +273,10 @@ PyDoc_STRVAR(py_scheduling_doc,
 	     " - SCHED_BATCH\n"
 	     " - SCHED_IDLE\n"
 	     " - SCHED_FIFO\n"
-	     " - SCHED_RR\n"	     
+	     " - SCHED_RR\n"
+	     "\n"
+	     "Las funciones ``*_thread_policy`` y ``*_affinity`` afectan únicamente\n"
+	     "al hilo que las invoca.\n"
 	     );
 
 PyMODINIT_FUNC initscheduling(void) {
@@ -118,4 +289,6 @@ PyMODINIT_FUNC initscheduling(void) {
   PyModule_AddIntMacro(module, SCHED_IDLE);
   PyModule_AddIntMacro(module, SCHED_FIFO);
   PyModule_AddIntMacro(module, SCHED_RR);
+  PyModule_AddIntMacro(module, MCL_CURRENT);
+  PyModule_AddIntMacro(module, MCL_FUTURE);
 }
@@ -19,6 +19,7 @@
 
 #include <Python.h>
 #include "structmember.h"
+#include "pythread.h"
 #include <stdlib.h>
 #include <stdio.h>
 #include <fcntl.h>
@@ -28,6 +29,15 @@
 
 #define SPIDEV_MAXPATH 4096
 
+/* Default size of the spidev kernel buffer (bufsiz module parameter).
+ * It bounds the number of bytes moved by a single SPI_IOC_MESSAGE. */
+#define SPIDEV_BUFSIZ 4096
+
+/* Largest N accepted by SPI_IOC_MESSAGE(N): the size of the transfer
+ * array must fit in the ioctl size field. */
+#define SPIDEV_MAXBATCH \
+	(((1 << _IOC_SIZEBITS) - 1) / sizeof(struct spi_ioc_transfer))
+
 PyDoc_STRVAR(SpiDev_module_doc,
 	"This module defines an object type that allows SPI transactions\n"
 	"on hosts running the Linux kernel. The host kernel must have SPI\n"
@@ -45,6 +55,10 @@ typedef struct {
 	uint8_t mode;	/* current SPI mode */
 	uint8_t bits_per_word;	/* current SPI bits per word setting */
 	uint32_t max_speed_hz;	/* current SPI max speed setting in Hz */
+	uint8_t *scratch;	/* transfer buffers reused between calls */
+	size_t scratch_size;	/* size in bytes of the scratch space */
+	PyThread_type_lock lock;	/* serializes I/O, which runs without the GIL */
+	int held;	/* lock taken with acquire() */
 } SpiDevObject;
 
 static PyObject *
@@ -58,11 +72,57 @@ SpiDev_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
 	self->mode = 0;
 	self->bits_per_word = 0;
 	self->max_speed_hz = 0;
+	self->scratch = NULL;
+	self->scratch_size = 0;
+	self->held = 0;
+	if ((self->lock = PyThread_allocate_lock()) == NULL) {
+		/* Not through dealloc, which closes the object with the lock */
+		type->tp_free((PyObject *)self);
+		PyErr_SetString(PyExc_MemoryError, "unable to allocate lock");
+		return NULL;
+	}
 
 	Py_INCREF(self);
 	return (PyObject *)self;
 }
 
+/* Returns a buffer of at least size bytes owned by the object. It is
+ * kept between calls so that transfers don't allocate memory. */
+static uint8_t *
+SpiDev_scratch(SpiDevObject *self, size_t size)
+{
+	uint8_t *scratch;
+
+	if (size > self->scratch_size) {
+		if ((scratch = realloc(self->scratch, size)) == NULL) {
+			PyErr_NoMemory();
+			return NULL;
+		}
+		self->scratch = scratch;
+		self->scratch_size = size;
+	}
+	return self->scratch;
+}
+
+/* The file descriptor and the scratch space are shared by all the threads
+ * using the object. I/O is done with the GIL released, so access is
+ * serialized with the object lock. */
+static void
+SpiDev_acquire(SpiDevObject *self)
+{
+	if (!PyThread_acquire_lock(self->lock, NOWAIT_LOCK)) {
+		Py_BEGIN_ALLOW_THREADS
+		PyThread_acquire_lock(self->lock, WAIT_LOCK);
+		Py_END_ALLOW_THREADS
+	}
+}
+
+static void
+SpiDev_release(SpiDevObject *self)
+{
+	PyThread_release_lock(self->lock);
+}
+
 PyDoc_STRVAR(SpiDev_close_doc,
 	"close()\n\n"
 	"Disconnects the object from the interface.\n");
@@ -70,7 +130,9 @@ PyDoc_STRVAR(SpiDev_close_doc,
 static PyObject *
 SpiDev_close(SpiDevObject *self)
 {
+	SpiDev_acquire(self);
 	if ((self->fd != -1) && (close(self->fd) == -1)) {
+		SpiDev_release(self);
 		PyErr_SetFromErrno(PyExc_IOError);
 		return NULL;
 	}
@@ -79,6 +141,7 @@ SpiDev_close(SpiDevObject *self)
 	self->mode = 0;
 	self->bits_per_word = 0;
 	self->max_speed_hz = 0;
+	SpiDev_release(self);
 
 	Py_INCREF(Py_None);
 	return Py_None;
@@ -90,6 +153,8 @@ SpiDev_dealloc(SpiDevObject *self)
 	PyObject *ref = SpiDev_close(self);
 	Py_XDECREF(ref);
 
+	free(self->scratch);
+	PyThread_free_lock(self->lock);
 	self->ob_type->tp_free((PyObject *)self);
 }
 
@@ -130,7 +195,11 @@ SpiDev_writebytes(SpiDevObject *self, PyObject *args)
 		buf[ii] = (__u8)PyInt_AS_LONG(val);
 	}
 
+	SpiDev_acquire(self);
+	Py_BEGIN_ALLOW_THREADS
 	status = write(self->fd, &buf[0], len);
+	Py_END_ALLOW_THREADS
+	SpiDev_release(self);
 
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
@@ -167,7 +236,11 @@ SpiDev_readbytes(SpiDevObject *self, PyObject *args)
 		len = sizeof(rxbuf);
 
 	memset(rxbuf, 0, sizeof rxbuf);
+	SpiDev_acquire(self);
+	Py_BEGIN_ALLOW_THREADS
 	status = read(self->fd, &rxbuf[0], len);
+	Py_END_ALLOW_THREADS
+	SpiDev_release(self);
 
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
@@ -204,7 +277,7 @@ SpiDev_xfer(SpiDevObject *self, PyObject *args)
 	uint16_t delay_usecs = 0;
 	uint32_t speed_hz = 0;
 	uint8_t bits_per_word = 0;
-	PyObject *list;
+	PyObject *list, *result = NULL;
 #ifdef SPIDEV_SINGLE
 	struct spi_ioc_transfer *xferptr;
 #else
@@ -225,42 +298,53 @@ SpiDev_xfer(SpiDevObject *self, PyObject *args)
 		return NULL;
 	}
 
-	txbuf = malloc(sizeof(__u8) * len);
-	rxbuf = malloc(sizeof(__u8) * len);
+	SpiDev_acquire(self);
 
 #ifdef SPIDEV_SINGLE
-	xferptr = (struct spi_ioc_transfer*) malloc(sizeof(struct spi_ioc_transfer) * len);
+	if ((xferptr = (struct spi_ioc_transfer *)SpiDev_scratch(self,
+			(sizeof(struct spi_ioc_transfer) + 2 * sizeof(__u8)) * len)) == NULL)
+		goto out;
+	memset(xferptr, 0, sizeof(struct spi_ioc_transfer) * len);
+	txbuf = (uint8_t *)&xferptr[len];
+	rxbuf = txbuf + len;
 
 	for (ii = 0; ii < len; ii++) {
 		PyObject *val = PyList_GET_ITEM(list, ii);
 		if (!PyInt_Check(val)) {
 			PyErr_SetString(PyExc_TypeError, wrmsg);
-			return NULL;
+			goto out;
 		}
 		txbuf[ii] = (__u8)PyInt_AS_LONG(val);
 		xferptr[ii].tx_buf = (unsigned long)&txbuf[ii];
 		xferptr[ii].rx_buf = (unsigned long)&rxbuf[ii];
 		xferptr[ii].len = 1;
-		xferptr[ii].delay_usecs = delay;
+		xferptr[ii].delay_usecs = delay_usecs;
 		xferptr[ii].speed_hz = speed_hz ? speed_hz : self->max_speed_hz;
 		xferptr[ii].bits_per_word = bits_per_word ? bits_per_word : self->bits_per_word;
 	}
 
+	Py_BEGIN_ALLOW_THREADS
 	status = ioctl(self->fd, SPI_IOC_MESSAGE(len), xferptr);
+	Py_END_ALLOW_THREADS
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
+		goto out;
 	}
 #else
+	if ((txbuf = SpiDev_scratch(self, 2 * sizeof(__u8) * len)) == NULL)
+		goto out;
+	rxbuf = txbuf + len;
+
 	for (ii = 0; ii < len; ii++) {
 		PyObject *val = PyList_GET_ITEM(list, ii);
 		if (!PyInt_Check(val)) {
 			PyErr_SetString(PyExc_TypeError, wrmsg);
-			return NULL;
+			goto out;
 		}
 		txbuf[ii] = (__u8)PyInt_AS_LONG(val);
 	}
 
+	memset(&xfer, 0, sizeof xfer);
 	xfer.tx_buf = (unsigned long)txbuf;
 	xfer.rx_buf = (unsigned long)rxbuf;
 	xfer.len = len;
@@ -268,10 +352,12 @@ SpiDev_xfer(SpiDevObject *self, PyObject *args)
 	xfer.speed_hz = speed_hz ? speed_hz : self->max_speed_hz;
 	xfer.bits_per_word = bits_per_word ? bits_per_word : self->bits_per_word;
 
+	Py_BEGIN_ALLOW_THREADS
 	status = ioctl(self->fd, SPI_IOC_MESSAGE(1), &xfer);
+	Py_END_ALLOW_THREADS
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
+		goto out;
 	}
 #endif
 
@@ -285,11 +371,11 @@ SpiDev_xfer(SpiDevObject *self, PyObject *args)
 	// reading 0 bytes doesnt matter but brings cs down
 	status = read(self->fd, &rxbuf[0], 0);
 
-	free(txbuf);
-	free(rxbuf);
-
 	Py_INCREF(list);
-	return list;
+	result = list;
+out:
+	SpiDev_release(self);
+	return result;
 }
 
 
@@ -308,7 +394,7 @@ SpiDev_xfer2(SpiDevObject *self, PyObject *args)
 	uint32_t speed_hz = 0;
 	uint8_t bits_per_word = 0;
 	uint16_t ii, len;
-	PyObject *list;
+	PyObject *list, *result = NULL;
 	struct spi_ioc_transfer xfer;
 	uint8_t *txbuf, *rxbuf;
 
@@ -325,18 +411,22 @@ SpiDev_xfer2(SpiDevObject *self, PyObject *args)
 		return NULL;
 	}
 
-	txbuf = malloc(sizeof(__u8) * len);
-	rxbuf = malloc(sizeof(__u8) * len);
+	SpiDev_acquire(self);
+
+	if ((txbuf = SpiDev_scratch(self, 2 * sizeof(__u8) * len)) == NULL)
+		goto out;
+	rxbuf = txbuf + len;
 
 	for (ii = 0; ii < len; ii++) {
 		PyObject *val = PyList_GET_ITEM(list, ii);
 		if (!PyInt_Check(val)) {
 			PyErr_SetString(PyExc_TypeError, msg);
-			return NULL;
+			goto out;
 		}
 		txbuf[ii] = (__u8)PyInt_AS_LONG(val);
 	}
 
+	memset(&xfer, 0, sizeof xfer);
 	xfer.tx_buf = (unsigned long)txbuf;
 	xfer.rx_buf = (unsigned long)rxbuf;
 	xfer.len = len;
@@ -344,10 +434,12 @@ SpiDev_xfer2(SpiDevObject *self, PyObject *args)
 	xfer.speed_hz = speed_hz ? speed_hz : self->max_speed_hz;
 	xfer.bits_per_word = bits_per_word ? bits_per_word : self->bits_per_word;
 
+	Py_BEGIN_ALLOW_THREADS
 	status = ioctl(self->fd, SPI_IOC_MESSAGE(1), &xfer);
+	Py_END_ALLOW_THREADS
 	if (status < 0) {
 		PyErr_SetFromErrno(PyExc_IOError);
-		return NULL;
+		goto out;
 	}
 
 	for (ii = 0; ii < len; ii++) {
@@ -359,11 +451,228 @@ SpiDev_xfer2(SpiDevObject *self, PyObject *args)
 	// reading 0 bytes doesn't really matter but brings CS down
 	status = read(self->fd, &rxbuf[0], 0);
 
-	free(txbuf);
-	free(rxbuf);
-
 	Py_INCREF(list);
-	return list;
+	result = list;
+out:
+	SpiDev_release(self);
+	return result;
+}
+
+/* Fills view with a writable buffer exported by obj. Objects that only
+ * implement the old buffer interface (array.array) are also accepted. */
+static int
+get_write_buffer(PyObject *obj, Py_buffer *view)
+{
+	void *buf;
+	Py_ssize_t len;
+
+	if (PyObject_CheckBuffer(obj))
+		return PyObject_GetBuffer(obj, view, PyBUF_WRITABLE);
+
+	if (PyObject_AsWriteBuffer(obj, &buf, &len) < 0)
+		return -1;
+	return PyBuffer_FillInfo(view, obj, buf, len, 0, PyBUF_WRITABLE);
+}
+
+PyDoc_STRVAR(SpiDev_xfer_into_doc,
+	"xfer_into(tx_buffer, rx_buffer) -> None\n\n"
+	"Perform SPI transaction without intermediate Python objects.\n"
+	"tx_buffer and rx_buffer may be any object supporting the buffer\n"
+	"interface (str, bytearray, memoryview, array.array, numpy arrays...).\n"
+	"len(tx_buffer) bytes are sent and the response is written into\n"
+	"rx_buffer, which must be writable and at least as long.\n"
+	"Both arguments may be the same object.\n"
+	"CS will be held active between blocks.\n");
+
+static PyObject *
+SpiDev_xfer_into(SpiDevObject *self, PyObject *args)
+{
+	int status;
+	uint16_t delay_usecs = 0;
+	uint32_t speed_hz = 0;
+	uint8_t bits_per_word = 0;
+	PyObject *rx_obj, *result = NULL;
+	Py_buffer tx, rx;
+	struct spi_ioc_transfer xfer;
+
+	if (!PyArg_ParseTuple(args, "s*O|IHB:xfer_into", &tx, &rx_obj, &speed_hz, &delay_usecs, &bits_per_word))
+		return NULL;
+
+	if (get_write_buffer(rx_obj, &rx) < 0) {
+		PyBuffer_Release(&tx);
+		return NULL;
+	}
+
+	if (tx.len < 1 || tx.len > SPIDEV_BUFSIZ) {
+		PyErr_SetString(PyExc_OverflowError,
+			"tx_buffer must hold at least one, but not more than 4096 bytes");
+		goto out;
+	}
+
+	if (rx.len < tx.len) {
+		PyErr_SetString(PyExc_ValueError,
+			"rx_buffer is shorter than tx_buffer");
+		goto out;
+	}
+
+	memset(&xfer, 0, sizeof xfer);
+	xfer.tx_buf = (unsigned long)tx.buf;
+	xfer.rx_buf = (unsigned long)rx.buf;
+	xfer.len = tx.len;
+	xfer.delay_usecs = delay_usecs;
+	xfer.speed_hz = speed_hz ? speed_hz : self->max_speed_hz;
+	xfer.bits_per_word = bits_per_word ? bits_per_word : self->bits_per_word;
+
+	SpiDev_acquire(self);
+	Py_BEGIN_ALLOW_THREADS
+	status = ioctl(self->fd, SPI_IOC_MESSAGE(1), &xfer);
+	if (status >= 0)
+		// WA:
+		// in CS_HIGH mode CS isn't pulled to low after transfer
+		// reading 0 bytes doesn't really matter but brings CS down
+		read(self->fd, rx.buf, 0);
+	Py_END_ALLOW_THREADS
+	SpiDev_release(self);
+
+	if (status < 0) {
+		PyErr_SetFromErrno(PyExc_IOError);
+		goto out;
+	}
+
+	Py_INCREF(Py_None);
+	result = Py_None;
+out:
+	PyBuffer_Release(&rx);
+	PyBuffer_Release(&tx);
+	return result;
+}
+
+static char *batchmsg = "Argument must be a sequence of frames. Each frame "
+				"must be a list of at least one, but not more "
+				"than 4096 integers";
+
+PyDoc_STRVAR(SpiDev_xfer_batch_doc,
+	"xfer_batch([[values], ...]) -> [[values], ...]\n\n"
+	"Perform several independent SPI transactions (frames) with as few\n"
+	"system calls as possible.\n"
+	"CS will be released and reactivated between frames.\n"
+	"Returns a list with the response to each frame.\n");
+
+static PyObject *
+SpiDev_xfer_batch(SpiDevObject *self, PyObject *args)
+{
+	int status;
+	uint16_t delay_usecs = 0;
+	uint32_t speed_hz = 0;
+	uint8_t bits_per_word = 0;
+	Py_ssize_t nframes, total, offset, first, count, size, ii, jj;
+	PyObject *frames, *seq, *result = NULL;
+	struct spi_ioc_transfer *xfers;
+	uint8_t *txbuf, *rxbuf;
+
+	if (!PyArg_ParseTuple(args, "O|IHB:xfer_batch", &frames, &speed_hz, &delay_usecs, &bits_per_word))
+		return NULL;
+
+	if ((seq = PySequence_Fast(frames, batchmsg)) == NULL)
+		return NULL;
+
+	nframes = PySequence_Fast_GET_SIZE(seq);
+	total = 0;
+	for (ii = 0; ii < nframes; ii++) {
+		PyObject *frame = PySequence_Fast_GET_ITEM(seq, ii);
+		Py_ssize_t len;
+		if (!PyList_Check(frame) || (len = PyList_GET_SIZE(frame)) < 1) {
+			PyErr_SetString(PyExc_TypeError, batchmsg);
+			goto out;
+		}
+		if (len > SPIDEV_BUFSIZ) {
+			PyErr_SetString(PyExc_OverflowError, batchmsg);
+			goto out;
+		}
+		total += len;
+	}
+
+	if ((result = PyList_New(nframes)) == NULL || nframes <= 0)
+		goto out;
+
+	SpiDev_acquire(self);
+
+	size = nframes * sizeof(struct spi_ioc_transfer);
+	if ((xfers = (struct spi_ioc_transfer *)SpiDev_scratch(self, size + 2 * total)) == NULL)
+		goto fail;
+	memset(xfers, 0, size);
+	txbuf = (uint8_t *)xfers + size;
+	rxbuf = txbuf + total;
+
+	offset = 0;
+	for (ii = 0; ii < nframes; ii++) {
+		PyObject *frame = PySequence_Fast_GET_ITEM(seq, ii);
+		Py_ssize_t len = PyList_GET_SIZE(frame);
+		for (jj = 0; jj < len; jj++) {
+			PyObject *val = PyList_GET_ITEM(frame, jj);
+			if (!PyInt_Check(val)) {
+				PyErr_SetString(PyExc_TypeError, batchmsg);
+				goto fail;
+			}
+			txbuf[offset + jj] = (__u8)PyInt_AS_LONG(val);
+		}
+		xfers[ii].tx_buf = (unsigned long)&txbuf[offset];
+		xfers[ii].rx_buf = (unsigned long)&rxbuf[offset];
+		xfers[ii].len = len;
+		xfers[ii].delay_usecs = delay_usecs;
+		xfers[ii].speed_hz = speed_hz ? speed_hz : self->max_speed_hz;
+		xfers[ii].bits_per_word = bits_per_word ? bits_per_word : self->bits_per_word;
+		xfers[ii].cs_change = 1;
+		offset += len;
+	}
+
+	/* Send as many frames per message as the kernel accepts. */
+	for (first = 0; first < nframes; first += count) {
+		size = 0;
+		for (count = 0; first + count < nframes && count < SPIDEV_MAXBATCH; count++) {
+			if (size + xfers[first + count].len > SPIDEV_BUFSIZ)
+				break;
+			size += xfers[first + count].len;
+		}
+		/* cs_change on the last transfer would keep CS active */
+		xfers[first + count - 1].cs_change = 0;
+
+		Py_BEGIN_ALLOW_THREADS
+		status = ioctl(self->fd, SPI_IOC_MESSAGE(count), &xfers[first]);
+		Py_END_ALLOW_THREADS
+		if (status < 0) {
+			PyErr_SetFromErrno(PyExc_IOError);
+			goto fail;
+		}
+	}
+
+	offset = 0;
+	for (ii = 0; ii < nframes; ii++) {
+		Py_ssize_t len = xfers[ii].len;
+		PyObject *response = PyList_New(len);
+		if (response == NULL)
+			goto fail;
+		for (jj = 0; jj < len; jj++) {
+			PyObject *val = Py_BuildValue("l", (long)rxbuf[offset + jj]);
+			PyList_SET_ITEM(response, jj, val);
+		}
+		PyList_SET_ITEM(result, ii, response);
+		offset += len;
+	}
+
+	// WA:
+	// in CS_HIGH mode CS isn't pulled to low after transfer
+	// reading 0 bytes doesn't really matter but brings CS down
+	status = read(self->fd, &rxbuf[0], 0);
+	SpiDev_release(self);
+	goto out;
+
+fail:
+	SpiDev_release(self);
+	Py_CLEAR(result);
+out:
+	Py_DECREF(seq);
+	return result;
 }
 
 static int __spidev_set_mode( int fd, __u8 mode) {
@@ -687,6 +996,52 @@ static PyGetSetDef SpiDev_getset[] = {
 	{NULL},
 };
 
+PyDoc_STRVAR(SpiDev_fileno_doc,
+	"fileno() -> fd\n\n"
+	"Return the file descriptor of the open SPI device, so that native\n"
+	"code can perform transfers on it. Returns -1 if it is not open.\n");
+
+static PyObject *
+SpiDev_fileno(SpiDevObject *self)
+{
+	return Py_BuildValue("i", self->fd);
+}
+
+PyDoc_STRVAR(SpiDev_lock_doc,
+	"acquire()\n\n"
+	"Takes the I/O lock of the object, waiting without the GIL. Transfers\n"
+	"from other threads wait until release() is called, so that native\n"
+	"code can use the descriptor returned by fileno() exclusively.\n"
+	"The thread that holds the lock must not use the object meanwhile.\n");
+
+static PyObject *
+SpiDev_lock(SpiDevObject *self)
+{
+	SpiDev_acquire(self);
+	self->held = 1;
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+PyDoc_STRVAR(SpiDev_unlock_doc,
+	"release()\n\n"
+	"Releases the I/O lock taken with acquire().\n");
+
+static PyObject *
+SpiDev_unlock(SpiDevObject *self)
+{
+	if (!self->held) {
+		PyErr_SetString(PyExc_RuntimeError, "release unlocked SpiDev");
+		return NULL;
+	}
+	self->held = 0;
+	SpiDev_release(self);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
 PyDoc_STRVAR(SpiDev_open_doc,
 	"open(bus, device)\n\n"
 	"Connects the object to the specified SPI device.\n"
@@ -762,6 +1117,12 @@ static PyMethodDef SpiDev_methods[] = {
 		SpiDev_open_doc},
 	{"close", (PyCFunction)SpiDev_close, METH_NOARGS,
 		SpiDev_close_doc},
+	{"fileno", (PyCFunction)SpiDev_fileno, METH_NOARGS,
+		SpiDev_fileno_doc},
+	{"acquire", (PyCFunction)SpiDev_lock, METH_NOARGS,
+		SpiDev_lock_doc},
+	{"release", (PyCFunction)SpiDev_unlock, METH_NOARGS,
+		SpiDev_unlock_doc},
 	{"readbytes", (PyCFunction)SpiDev_readbytes, METH_VARARGS,
 		SpiDev_read_doc},
 	{"writebytes", (PyCFunction)SpiDev_writebytes, METH_VARARGS,
@@ -770,6 +1131,10 @@ static PyMethodDef SpiDev_methods[] = {
 		SpiDev_xfer_doc},
 	{"xfer2", (PyCFunction)SpiDev_xfer2, METH_VARARGS,
 		SpiDev_xfer2_doc},
+	{"xfer_batch", (PyCFunction)SpiDev_xfer_batch, METH_VARARGS,
+		SpiDev_xfer_batch_doc},
+	{"xfer_into", (PyCFunction)SpiDev_xfer_into, METH_VARARGS,
+		SpiDev_xfer_into_doc},
 	{NULL},
 };
 
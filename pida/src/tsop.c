@@ -91,3 +91,42 @@ struct timespec double_to_ts(double t) {
   
   return ts_create(sec, nsec);
 }
+
+int64_t ts_to_int_ns(struct timespec ts)
+{
+  return (int64_t)ts.tv_sec * NS_PER_S + ts.tv_nsec;
+}
+
+struct timespec int_ns_to_ts(int64_t ns) {
+  int64_t sec = ns / NS_PER_S;
+  int64_t nsec = ns % NS_PER_S;
+
+  if (nsec < 0) {
+    sec--;
+    nsec += NS_PER_S;
+  }
+
+  return ts_create((long)sec, (long)nsec);
+}
+
+/* Waits until the absolute CLOCK_MONOTONIC instant deadline. The thread
+ * sleeps until margin before the deadline and then polls the clock, so
+ * the wake-up latency of the sleep does not delay the return. */
+void ts_wait(struct timespec deadline, struct timespec margin)
+{
+  struct timespec now, wake;
+  int64_t deadline_ns;
+
+  if (margin.tv_sec == 0 && margin.tv_nsec == 0) {
+    clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &deadline, NULL);
+    return;
+  }
+
+  wake = ts_subtract(deadline, margin);
+  clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &wake, NULL);
+
+  deadline_ns = ts_to_int_ns(deadline);
+  do {
+    clock_gettime(CLOCK_MONOTONIC, &now);
+  } while (ts_to_int_ns(now) < deadline_ns);
+}
@@ -1,4 +1,5 @@
 #include <time.h>
+#include <stdint.h>
 
 #define NS_PER_S  1000000000L
 #define NS_PER_MS 1000000L
@@ -21,3 +22,9 @@ struct  timespec  ts_subtract (struct  timespec, struct  timespec);
 struct timespec ts_scalar_product (struct timespec, int);
 
 struct timespec double_to_ts(double);
+
+int64_t ts_to_int_ns(struct timespec);
+
+struct timespec int_ns_to_ts(int64_t);
+
+void ts_wait(struct timespec, struct timespec);
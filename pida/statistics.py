@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye clases que mantienen estadísticas de las
+adquisiciones de datos mientras se ejecutan, con un coste constante por
+muestra.
+"""
+from array import array
+from collections import deque
+from threading import Lock
+from pida.sinks import Sink
+
+# Layout of the timing accumulators. It is shared with the native
+# sampling loop (pida/src/samplingmodule.c), keep both in sync.
+COUNT, LATENESS, LATENESS_SQUARES, MAX_LATENESS, TRANSFER, SLEEP, OVERRUNS, LAST_TIME = range(8)
+FIELDS = 8
+
+DEFAULT_BINS = 24
+"""Número por defecto de intervalos del histograma de retrasos. Con
+24 intervalos el último recoge los retrasos a partir de 2^22 µs (unos
+4 segundos)."""
+
+class TimingStatistics(object):
+    """Estadísticas de temporización de una adquisición síncrona.
+
+    Para cada muestra se registra su retraso respecto al instante en que
+    debía tomarse, el tiempo dedicado a la transferencia con el
+    conversor, el tiempo dedicado a esperar a la siguiente muestra y si
+    la transferencia terminó después del instante de la siguiente
+    muestra (desbordamiento). Sólo se guardan acumulados, por lo que el
+    coste por muestra es constante.
+
+    Los retrasos se agrupan en un histograma de intervalos de anchura
+    creciente en potencias de 2: el intervalo 0 recoge los retrasos
+    menores de 1µs y el intervalo ``i`` los retrasos entre ``2**(i-1)`` y
+    ``2**i`` µs. El último intervalo recoge también todos los retrasos
+    mayores.
+
+    :param sampling_rate: Frecuencia de muestreo solicitada en hertzios.
+    :param bins: Número de intervalos del histograma de retrasos.
+    """
+
+    def __init__(self, sampling_rate=0, bins=DEFAULT_BINS):
+        if bins <= 0:
+            raise ValueError("Positive number expected")
+        self._sampling_rate = sampling_rate
+        self._accumulators = array('d', [0.0]) * (FIELDS + bins)
+
+    @property
+    def accumulators(self):
+        """Vector (:class:`array.array` de ``double``) con los acumulados.
+        Lo actualiza directamente el motor de muestreo nativo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._accumulators
+
+    def record(self, lateness, transfer, sleep, overrun, elapsed_time):
+        """Registra la temporización de una muestra.
+
+        :param lateness: Retraso en segundos de la muestra.
+        :param transfer: Tiempo en segundos de la transferencia.
+        :param sleep: Tiempo en segundos de espera tras la transferencia.
+        :param overrun: Verdadero si la transferencia terminó después del
+            instante de la siguiente muestra. Sin periodo de muestreo
+            (máxima tasa posible) debe ser siempre falso.
+        :param elapsed_time: Instante de la muestra desde el comienzo de la
+            adquisición.
+        """
+        accumulators = self._accumulators
+        if lateness < 0:
+            lateness = 0.0
+        accumulators[COUNT] += 1
+        accumulators[LATENESS] += lateness
+        accumulators[LATENESS_SQUARES] += lateness * lateness
+        if lateness > accumulators[MAX_LATENESS]:
+            accumulators[MAX_LATENESS] = lateness
+        accumulators[TRANSFER] += transfer
+        accumulators[SLEEP] += sleep
+        if overrun:
+            accumulators[OVERRUNS] += 1
+        accumulators[LAST_TIME] = elapsed_time
+        index = FIELDS + min(int(lateness * 1e6).bit_length(), len(accumulators) - FIELDS - 1)
+        accumulators[index] += 1
+
+    def snapshot(self):
+        """Devuelve una copia de las estadísticas, que no cambia aunque la
+        adquisición continúe."""
+        snapshot = TimingStatistics(self._sampling_rate, len(self._accumulators) - FIELDS)
+        snapshot._accumulators[:] = self._accumulators
+        return snapshot
+
+    @property
+    def count(self):
+        """Número de muestras registradas."""
+        return int(self._accumulators[COUNT])
+
+    @property
+    def mean_lateness(self):
+        """Retraso medio de las muestras en segundos."""
+        if self.count == 0:
+            return 0.0
+        return self._accumulators[LATENESS] / self.count
+
+    @property
+    def max_lateness(self):
+        """Retraso máximo de las muestras en segundos."""
+        return self._accumulators[MAX_LATENESS]
+
+    @property
+    def jitter(self):
+        """Desviación típica del retraso de las muestras en segundos."""
+        if self.count == 0:
+            return 0.0
+        mean = self.mean_lateness
+        variance = self._accumulators[LATENESS_SQUARES] / self.count - mean * mean
+        return max(variance, 0.0) ** 0.5
+
+    @property
+    def overruns(self):
+        """Número de muestras cuya transferencia terminó después del
+        instante en que debía tomarse la siguiente."""
+        return int(self._accumulators[OVERRUNS])
+
+    @property
+    def transfer_time(self):
+        """Tiempo total en segundos dedicado a transferencias."""
+        return self._accumulators[TRANSFER]
+
+    @property
+    def sleep_time(self):
+        """Tiempo total en segundos dedicado a esperar entre muestras."""
+        return self._accumulators[SLEEP]
+
+    @property
+    def requested_rate(self):
+        """Frecuencia de muestreo solicitada en hertzios (0 indica la
+        máxima tasa posible)."""
+        return self._sampling_rate
+
+    @property
+    def achieved_rate(self):
+        """Frecuencia de muestreo conseguida en hertzios, calculada entre la
+        primera y la última muestra registradas."""
+        if self.count < 2 or self._accumulators[LAST_TIME] <= 0:
+            return 0.0
+        return (self.count - 1) / self._accumulators[LAST_TIME]
+
+    @property
+    def histogram(self):
+        """Lista de tuplas ``(limite, muestras)`` con el límite superior en
+        segundos de cada intervalo del histograma de retrasos y el número
+        de muestras que contiene. El límite del último intervalo es
+        infinito."""
+        counts = self._accumulators[FIELDS:]
+        limits = [2 ** i * 1e-6 for i in range(len(counts) - 1)] + [float('inf')]
+        return [(limit, int(count)) for limit, count in zip(limits, counts)]
+
+    def is_sustainable(self, max_lateness=None):
+        """Indica si la frecuencia de muestreo solicitada se ha mantenido:
+        no ha habido desbordamientos y, si se indica, ningún retraso ha
+        superado ``max_lateness`` segundos.
+
+        :param max_lateness: Retraso máximo admisible en segundos.
+        """
+        if self.overruns:
+            return False
+        return max_lateness is None or self.max_lateness <= max_lateness
+
+class RunningStatistics(object):
+    """Estadísticas de una secuencia de valores actualizadas con un coste
+    constante por valor: media, valor cuadrático medio, desviación típica,
+    mínimo y máximo.
+
+    La media y la varianza se calculan con el algoritmo de Welford, que no
+    acumula sumas de cuadrados y es numéricamente estable en capturas
+    largas. Con una ventana, las estadísticas se refieren a los últimos
+    ``window`` valores: el valor que sale de la ventana se descuenta de la
+    media y la varianza, y el mínimo y el máximo se mantienen en colas
+    monótonas.
+
+    :param window: Número de valores de la ventana deslizante. El valor
+        por defecto 0 acumula todos los valores.
+    """
+
+    def __init__(self, window=0):
+        if window < 0:
+            raise ValueError("Positive number expected")
+        self._window = int(window)
+        self._values = array('d', [0.0]) * self._window
+        self._total = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = 0.0
+        self._max = 0.0
+        # Candidates (position, value) for the minimum and maximum of the window
+        self._minima = deque()
+        self._maxima = deque()
+
+    def add(self, value):
+        """Añade un valor.
+
+        :param value: Valor a añadir.
+        """
+        window = self._window
+        position = self._total
+        if window and position >= window:
+            # Replace the value that leaves the window
+            index = position % window
+            old = self._values[index]
+            self._values[index] = value
+            mean = self._mean + (value - old) / float(window)
+            self._m2 += (value - old) * (value - mean + old - self._mean)
+            self._mean = mean
+        else:
+            if window:
+                self._values[position] = value
+            delta = value - self._mean
+            self._mean += delta / (position + 1.0)
+            self._m2 += delta * (value - self._mean)
+        self._total = position + 1
+
+        if not window:
+            if position == 0 or value < self._min:
+                self._min = value
+            if position == 0 or value > self._max:
+                self._max = value
+            return
+        first = position - window + 1
+        minima = self._minima
+        while minima and minima[-1][1] >= value:
+            minima.pop()
+        minima.append((position, value))
+        if minima[0][0] < first:
+            minima.popleft()
+        maxima = self._maxima
+        while maxima and maxima[-1][1] <= value:
+            maxima.pop()
+        maxima.append((position, value))
+        if maxima[0][0] < first:
+            maxima.popleft()
+        self._min = minima[0][1]
+        self._max = maxima[0][1]
+
+    def update(self, values):
+        """Añade una secuencia de valores.
+
+        :param values: Valores a añadir.
+        """
+        add = self.add
+        for value in values:
+            add(value)
+
+    def snapshot(self):
+        """Devuelve una copia de las estadísticas, que no cambia aunque se
+        sigan añadiendo valores."""
+        snapshot = RunningStatistics()
+        snapshot.__dict__.update(self.__dict__)
+        snapshot._values = array('d', self._values)
+        snapshot._minima = deque(self._minima)
+        snapshot._maxima = deque(self._maxima)
+        return snapshot
+
+    @property
+    def window(self):
+        """Número de valores de la ventana deslizante (0 si se acumulan
+        todos los valores)."""
+        return self._window
+
+    @property
+    def total(self):
+        """Número total de valores añadidos."""
+        return self._total
+
+    @property
+    def count(self):
+        """Número de valores que intervienen en las estadísticas."""
+        if self._window:
+            return min(self._total, self._window)
+        return self._total
+
+    @property
+    def mean(self):
+        """Media de los valores."""
+        return self._mean
+
+    @property
+    def variance(self):
+        """Varianza de los valores (dividiendo por el número de valores)."""
+        if self.count == 0:
+            return 0.0
+        return max(self._m2 / self.count, 0.0)
+
+    @property
+    def std(self):
+        """Desviación típica de los valores."""
+        return self.variance ** 0.5
+
+    @property
+    def rms(self):
+        """Valor cuadrático medio de los valores."""
+        return (self.variance + self._mean * self._mean) ** 0.5
+
+    @property
+    def min(self):
+        """Valor mínimo."""
+        return self._min
+
+    @property
+    def max(self):
+        """Valor máximo."""
+        return self._max
+
+class ChannelStatistics(Sink):
+    """Sumidero que mantiene estadísticas (:class:`RunningStatistics`) de
+    los valores en voltios de cada canal de una adquisición, tanto
+    acumuladas desde el comienzo como en una ventana deslizante.
+    Normalmente se crea con
+    :meth:`pida.acquisitions.Acquisition.running_statistics`.
+
+    Las estadísticas se actualizan con cada bloque de muestras que
+    publica la adquisición y, al leerlas, con las muestras tomadas desde
+    el último bloque, por lo que siempre están al día. El coste de
+    leerlas no depende de la duración de la captura.
+
+    :param window: Número de muestras de la ventana deslizante. El valor
+        por defecto 0 no mantiene estadísticas en ventana.
+    :param chunk_size: Número de muestras nuevas con que se actualizan
+        las estadísticas desde el hilo de la adquisición.
+    """
+
+    def __init__(self, window=0, chunk_size=Sink.chunk_size):
+        if window < 0 or chunk_size <= 0:
+            raise ValueError("Positive number expected")
+        self._window = int(window)
+        self.chunk_size = int(chunk_size)
+        self._lock = Lock()
+        self._acquisition = None
+        self._position = 0
+        self._cumulative = []
+        self._windowed = []
+
+    @property
+    def window(self):
+        """Número de muestras de la ventana deslizante."""
+        return self._window
+
+    def open(self, acquisition):
+        with self._lock:
+            if self._acquisition is not None:
+                return
+            self._acquisition = acquisition
+            self._position = acquisition.count
+            width = len(acquisition.channels)
+            self._cumulative = [RunningStatistics() for _ in range(width)]
+            if self._window:
+                self._windowed = [RunningStatistics(self._window) for _ in range(width)]
+
+    def write(self, view):
+        self._update()
+
+    def close(self):
+        self._update()
+
+    def _update(self):
+        # Add the samples taken since the last update
+        with self._lock:
+            acquisition = self._acquisition
+            if acquisition is None:
+                return
+            view = acquisition.get_data_since(self._position)
+            self._position = view.stop
+            if not len(view):
+                return
+            converters = acquisition._converters()
+            if callable(converters):
+                converters = [converters] * len(self._cumulative)
+            for column, convert in enumerate(converters):
+                values = [convert(code) for code in view.codes(column)]
+                self._cumulative[column].update(values)
+                if self._window:
+                    self._windowed[column].update(values)
+
+    def cumulative(self, column=0):
+        """Devuelve una copia de las estadísticas de un canal desde el
+        comienzo de la adquisición.
+
+        :param column: Columna del canal en los datos de la adquisición.
+        """
+        self._update()
+        with self._lock:
+            return self._cumulative[column].snapshot()
+
+    def windowed(self, column=0):
+        """Devuelve una copia de las estadísticas de un canal en las
+        últimas :attr:`window` muestras.
+
+        Eleva una excepción :exc:`ValueError` si no se mantienen
+        estadísticas en ventana.
+
+        :param column: Columna del canal en los datos de la adquisición.
+        """
+        if not self._window:
+            raise ValueError("No window")
+        self._update()
+        with self._lock:
+            return self._windowed[column].snapshot()
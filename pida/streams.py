@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye flujos que entregan las muestras de una adquisición
+de datos en bloques de tamaño fijo a medida que se toman, a un hilo
+consumidor.
+
+Ejemplo de consumo en bloques de 1000 muestras tomadas a 10kHz::
+
+    stream = channel.stream(10000, 1000)
+    for block in stream:
+        process(block.times, block.codes[0])
+
+El consumidor puede ser un hilo que itera el flujo o invoca
+:meth:`BlockStream.get`, o un bucle de eventos que atiende varios flujos
+(por ejemplo de varias placas) en un único hilo. El descriptor de
+:meth:`BlockStream.fileno` está listo para lectura mientras hay bloques
+pendientes o el flujo ha terminado, y :meth:`BlockStream.get_nowait`
+recoge los bloques sin esperar::
+
+    streams = [channel.stream(10000, 1000) for channel in channels]
+    while streams:
+        ready, _, _ = select.select(streams, [], [])
+        for stream in ready:
+            block = stream.get_nowait()
+            if block is not None:
+                process(block.times, block.codes[0])
+            elif stream.finished:
+                streams.remove(stream)
+
+El bucle de muestreo nunca espera al consumidor salvo con la política
+:data:`BLOCK`: si el consumidor se retrasa y se llenan los
+``max_blocks`` bloques pendientes, la política decide qué bloque se
+descarta (ver :attr:`BlockStream.dropped`).
+"""
+from array import array
+from collections import deque, namedtuple
+from threading import Condition
+import os
+from pida.clock import time
+from pida.sinks import Sink
+
+DROP_OLDEST = 'drop_oldest'
+"""Política que descarta el bloque pendiente más antiguo para hacer sitio
+al nuevo. El consumidor recibe siempre los datos más recientes."""
+
+DROP_NEWEST = 'drop_newest'
+"""Política que descarta el bloque nuevo. El consumidor recibe los bloques
+sin huecos hasta que se llena el flujo."""
+
+BLOCK = 'block'
+"""Política que detiene el bucle de muestreo hasta que el consumidor libera
+un bloque. No se pierde ningún bloque, pero se retrasan las muestras
+siguientes (ver :attr:`pida.acquisitions.SynchronousAcquisition.timing`)."""
+
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+DEFAULT_MAX_BLOCKS = 16
+"""Número máximo por defecto de bloques pendientes de consumir."""
+
+Block = namedtuple('Block', ['index', 'times', 'codes'])
+"""Bloque de muestras: número de orden del bloque en el flujo (contando
+los descartados), vector (:class:`array.array`) con los instantes de las
+muestras y lista de vectores con los códigos de cada columna."""
+
+class BlockStream(Sink):
+    """Sumidero que agrupa las muestras de una adquisición en bloques de
+    ``block_size`` muestras y los entrega a un consumidor, que lo itera
+    (``for block in stream``), invoca :meth:`get` o vigila
+    :meth:`fileno` desde un bucle de eventos e invoca :meth:`get_nowait`.
+    El consumidor espera a cada bloque sin consultas periódicas. La
+    iteración termina cuando termina la adquisición; las últimas muestras
+    que no completan un bloque se descartan.
+
+    Sólo debe haber un consumidor por flujo.
+
+    :param block_size: Número de muestras de cada bloque.
+    :param max_blocks: Número máximo de bloques pendientes de consumir.
+    :param policy: Política cuando se llena el flujo: :data:`DROP_OLDEST`,
+        :data:`DROP_NEWEST` o :data:`BLOCK`.
+    """
+
+    def __init__(self, block_size, max_blocks=DEFAULT_MAX_BLOCKS, policy=DROP_OLDEST):
+        if block_size <= 0 or max_blocks <= 0:
+            raise ValueError("Positive number expected")
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy")
+        self.chunk_size = int(block_size)
+        self._max_blocks = int(max_blocks)
+        self._policy = policy
+        self._blocks = deque()
+        self._condition = Condition()
+        self._closed = False
+        self._stopped = False
+        self._acquisition = None
+        self._times = array('d')
+        self._columns = []
+        self._index = 0
+        self._dropped = 0
+        self._pipe = None
+        self._signaled = False
+
+    def __del__(self):
+        if self._pipe is not None:
+            for fd in self._pipe:
+                os.close(fd)
+
+    @property
+    def block_size(self):
+        """Número de muestras de cada bloque.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self.chunk_size
+
+    @property
+    def policy(self):
+        """Política que se aplica cuando se llena el flujo.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._policy
+
+    @property
+    def dropped(self):
+        """Número de bloques descartados porque el flujo estaba lleno.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._dropped
+
+    @property
+    def acquisition(self):
+        """Adquisición cuyas muestras se reciben, o ``None`` si todavía no
+        ha comenzado.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._acquisition
+
+    @property
+    def finished(self):
+        """Indica si el flujo ha terminado: la adquisición ha terminado y
+        no quedan bloques pendientes.
+
+        Es una propiedad de sólo lectura.
+        """
+        with self._condition:
+            return self._closed and not self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
+
+    # Producer side, called from the acquisition thread
+
+    def open(self, acquisition):
+        self._acquisition = acquisition
+        if self._stopped:
+            acquisition.stop()
+        self._columns = [array('i') for _ in acquisition.channels]
+
+    def write(self, view):
+        self._times.extend(view.times())
+        for column, codes in enumerate(self._columns):
+            codes.extend(view.codes(column))
+        size = self.chunk_size
+        while len(self._times) >= size:
+            block = Block(self._index, self._times[:size],
+                          [codes[:size] for codes in self._columns])
+            del self._times[:size]
+            for codes in self._columns:
+                del codes[:size]
+            self._index += 1
+            self._put(block)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            self._signal()
+
+    def _put(self, block):
+        with self._condition:
+            if self._policy == BLOCK:
+                while len(self._blocks) >= self._max_blocks and not self._stopped:
+                    self._condition.wait()
+            elif len(self._blocks) >= self._max_blocks:
+                self._dropped += 1
+                if self._policy == DROP_NEWEST:
+                    return
+                self._blocks.popleft()
+            self._blocks.append(block)
+            self._condition.notify_all()
+            self._signal()
+
+    def _signal(self):
+        # Must hold the condition. Keeps one byte in the pipe while there
+        # are pending blocks or the stream is closed
+        if self._pipe is None:
+            return
+        ready = bool(self._blocks) or self._closed
+        if ready and not self._signaled:
+            os.write(self._pipe[1], b'\0')
+        elif not ready and self._signaled:
+            os.read(self._pipe[0], 1)
+        self._signaled = ready
+
+    # Consumer side
+
+    def get(self, timeout=None):
+        """Devuelve el siguiente bloque, esperando a que esté disponible.
+        Devuelve ``None`` si el flujo ha terminado o si se agota el tiempo
+        de espera.
+
+        :param timeout: Tiempo máximo de espera en segundos. Por defecto se
+            espera indefinidamente.
+        """
+        deadline = None if timeout is None else time() + timeout
+        with self._condition:
+            while not self._blocks and not self._closed:
+                if deadline is None:
+                    self._condition.wait()
+                elif time() < deadline:
+                    self._condition.wait(deadline - time())
+                else:
+                    break
+            return self._take()
+
+    def get_nowait(self):
+        """Devuelve el siguiente bloque sin esperar, o ``None`` si no hay
+        bloques pendientes. Tras ``None``, :attr:`finished` indica si el
+        flujo ha terminado."""
+        with self._condition:
+            return self._take()
+
+    def fileno(self):
+        """Devuelve un descriptor de fichero que está listo para lectura
+        mientras hay bloques pendientes o el flujo ha terminado, para
+        vigilar el flujo con :mod:`select` o un bucle de eventos. El
+        consumidor no debe leer del descriptor."""
+        with self._condition:
+            if self._pipe is None:
+                self._pipe = os.pipe()
+                self._signal()
+            return self._pipe[0]
+
+    def _take(self):
+        # Must hold the condition
+        if not self._blocks:
+            return None
+        block = self._blocks.popleft()
+        self._condition.notify_all()
+        self._signal()
+        return block
+
+    def __iter__(self):
+        while True:
+            block = self.get()
+            if block is None:
+                return
+            yield block
+
+    def stop(self):
+        """Detiene la adquisición que alimenta el flujo. Los bloques
+        pendientes se siguen entregando."""
+        with self._condition:
+            # Release a sampling loop waiting under the BLOCK policy
+            self._stopped = True
+            self._condition.notify_all()
+        if self._acquisition is not None:
+            self._acquisition.stop()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye temporizadores de precisión para las esperas entre
+muestras de las adquisiciones de datos.
+
+La espera de :func:`pida.clock.sleep` termina cuando el sistema operativo
+despierta al hilo, con una latencia que en Raspberry Pi es de decenas a
+cientos de microsegundos y que limita la regularidad del muestreo a
+frecuencias de kilohertzios. Un :class:`PrecisionTimer` duerme hasta un
+margen antes del instante límite y consulta el reloj en un bucle activo,
+sin retener el GIL, hasta alcanzarlo. A cambio, ocupa el procesador
+durante el margen.
+"""
+from threading import Lock
+from pida.clock import time_ns, sleep_until_ns, precise_sleep, precise_sleep_until_ns
+
+CALIBRATION_SAMPLES = 200
+"""Número por defecto de esperas que se miden al calibrar el margen."""
+
+CALIBRATION_PERIOD = 1e-3
+"""Duración por defecto en segundos de cada espera medida al calibrar el
+margen."""
+
+CALIBRATION_PERCENTILE = 0.99
+"""Percentil por defecto de la latencia medida que se usa como margen."""
+
+def calibrate(n_samples=CALIBRATION_SAMPLES, period=CALIBRATION_PERIOD,
+              percentile=CALIBRATION_PERCENTILE):
+    """Mide la latencia con que el sistema despierta a un hilo dormido
+    hasta un instante absoluto y devuelve el percentil ``percentile`` de
+    las latencias medidas, en segundos. Es el margen adecuado para un
+    :class:`PrecisionTimer`.
+
+    :param n_samples: Número de esperas a medir.
+    :param period: Duración en segundos de cada espera.
+    :param percentile: Percentil (entre 0 y 1) de la latencia que se
+        devuelve.
+    """
+    if n_samples <= 0 or period <= 0:
+        raise ValueError("Positive number expected")
+    period_ns = int(period * 1e9)
+    latencies = []
+    for _ in range(n_samples):
+        request = time_ns() + period_ns
+        sleep_until_ns(request)
+        latencies.append(time_ns() - request)
+    latencies.sort()
+    index = min(int(percentile * len(latencies)), len(latencies) - 1)
+    return max(latencies[index], 0) * 1e-9
+
+class PrecisionTimer(object):
+    """Temporizador que espera hasta instantes absolutos del reloj de
+    :mod:`pida.clock` combinando una espera pasiva y una espera activa.
+
+    :param margin: Tiempo en segundos antes de cada instante límite en el
+        que termina la espera pasiva. Por defecto se calibra con
+        :func:`calibrate` al crear el temporizador.
+    """
+
+    def __init__(self, margin=None):
+        if margin is None:
+            margin = calibrate()
+        self.margin = margin
+
+    # Margin
+    @property
+    def margin(self):
+        """Tiempo en segundos antes de cada instante límite en el que termina
+        la espera pasiva y comienza la espera activa.
+
+        Eleva una excepción :exc:`ValueError` si el valor que se intenta
+        fijar no es 0 o un número positivo.
+        """
+        return self._margin
+
+    @margin.setter
+    def margin(self, margin):
+        if margin < 0:
+            raise ValueError("Positive number expected")
+        self._margin = float(margin)
+        self._margin_ns = int(round(margin * 1e9))
+
+    @margin.deleter
+    def margin(self):
+        raise AttributeError("Can't delete attribute")
+
+    def sleep(self, request):
+        """Espera hasta un instante.
+
+        :param request: Instante en segundos (ver :func:`pida.clock.time`).
+        """
+        precise_sleep(request, self._margin)
+
+    def sleep_until_ns(self, request):
+        """Espera hasta un instante dado en nanosegundos enteros.
+
+        :param request: Instante en nanosegundos (ver :func:`pida.clock.time_ns`).
+        """
+        precise_sleep_until_ns(request, self._margin_ns)
+
+_default = None
+_default_lock = Lock()
+
+def default_timer():
+    """Devuelve el temporizador de precisión compartido por las
+    adquisiciones. Su margen se calibra la primera vez que se invoca esta
+    función."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PrecisionTimer()
+        return _default
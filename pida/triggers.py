@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Este módulo incluye las condiciones de disparo de las adquisiciones
+disparadas (ver :class:`pida.acquisitions.TriggeredAcquisition`).
+
+Las condiciones se evalúan sobre los códigos que devuelve el conversor,
+sin convertirlos a voltios, por lo que sus umbrales se expresan en
+códigos. Con un conversor de ``bits`` bits y tensión de referencia
+``vref``, el código de una tensión ``v`` es ``int(v * 2 ** bits / vref)``.
+"""
+from abc import ABCMeta, abstractmethod
+
+RISING = 'rising'
+"""Flanco de subida: el código pasa de estar por debajo del umbral a
+alcanzarlo."""
+
+FALLING = 'falling'
+"""Flanco de bajada: el código pasa de estar por encima del umbral a
+alcanzarlo."""
+
+BOTH = 'both'
+"""Cualquiera de los dos flancos."""
+
+EDGES = (RISING, FALLING, BOTH)
+
+class Trigger(object):
+    """Clase base abstracta para la definición de condiciones de disparo."""
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def find(self, codes, previous=None):
+        """Devuelve la posición del primer código de una secuencia que
+        cumple la condición de disparo, o -1 si ninguno la cumple.
+
+        :param codes: Secuencia de códigos consecutivos.
+        :param previous: Código anterior al primero de la secuencia, o
+            ``None`` si no lo hay.
+
+        .. warning:: Es un método abstracto que debe ser implementado por todas las clases que hereden de ésta.
+        """
+        pass
+
+class LevelTrigger(Trigger):
+    """Disparo por nivel: se dispara cuando los códigos cruzan un umbral
+    en el sentido indicado.
+
+    :param level: Umbral en códigos.
+    :param edge: Flanco que dispara: :data:`RISING`, :data:`FALLING` o
+        :data:`BOTH`.
+    """
+
+    def __init__(self, level, edge=RISING):
+        if edge not in EDGES:
+            raise ValueError("Unknown edge")
+        self._level = level
+        self._edge = edge
+
+    @property
+    def level(self):
+        """Umbral en códigos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._level
+
+    @property
+    def edge(self):
+        """Flanco que dispara.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._edge
+
+    def find(self, codes, previous=None):
+        level = self._level
+        rising = self._edge != FALLING
+        falling = self._edge != RISING
+        for index, code in enumerate(codes):
+            if previous is not None:
+                if rising and previous < level <= code:
+                    return index
+                if falling and previous > level >= code:
+                    return index
+            previous = code
+        return -1
+
+class SlopeTrigger(Trigger):
+    """Disparo por pendiente: se dispara cuando la diferencia entre dos
+    códigos consecutivos alcanza un valor.
+
+    :param delta: Diferencia en códigos. Si es positiva, se dispara con
+        las subidas de al menos ``delta`` códigos; si es negativa, con las
+        bajadas de al menos ``-delta`` códigos.
+    """
+
+    def __init__(self, delta):
+        if delta == 0:
+            raise ValueError("Non-zero number expected")
+        self._delta = delta
+
+    @property
+    def delta(self):
+        """Diferencia en códigos que dispara.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._delta
+
+    def find(self, codes, previous=None):
+        delta = self._delta
+        for index, code in enumerate(codes):
+            if previous is not None:
+                if delta > 0 and code - previous >= delta:
+                    return index
+                if delta < 0 and code - previous <= delta:
+                    return index
+            previous = code
+        return -1
+
+class WindowTrigger(Trigger):
+    """Disparo por ventana: se dispara cuando los códigos salen del
+    intervalo ``[low, high]``.
+
+    :param low: Límite inferior en códigos.
+    :param high: Límite superior en códigos.
+    """
+
+    def __init__(self, low, high):
+        if low > high:
+            raise ValueError("Empty window")
+        self._low = low
+        self._high = high
+
+    @property
+    def low(self):
+        """Límite inferior en códigos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._low
+
+    @property
+    def high(self):
+        """Límite superior en códigos.
+
+        Es una propiedad de sólo lectura.
+        """
+        return self._high
+
+    def find(self, codes, previous=None):
+        low = self._low
+        high = self._high
+        inside = previous is None or low <= previous <= high
+        for index, code in enumerate(codes):
+            if low <= code <= high:
+                inside = True
+            elif inside:
+                return index
+        return -1
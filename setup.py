@@ -27,7 +27,10 @@ setup(
     ],
     ext_modules=[
         Extension('pida.clock', ['pida/src/pyclock.c', 'pida/src/tsop.c'], libraries=['rt']),
-        Extension('pida.scheduling', ['pida/src/schedulingmodule.c'])
+        Extension('pida.scheduling', ['pida/src/schedulingmodule.c'], libraries=['pthread']),
+        Extension('pida.spidev', ['pida/src/spidev_module.c']),
+        Extension('pida.sampling', ['pida/src/samplingmodule.c', 'pida/src/tsop.c'], libraries=['rt', 'm']),
+        Extension('pida.gpiocore', ['pida/src/gpiomodule.c', 'pida/src/tsop.c'], libraries=['rt'])
     ]
     #data_files=[
     #    ('/etc/modprobe.d',['config/raspi-blacklist.conf']),
@@ -0,0 +1,395 @@
+import sys
+import unittest
+from StringIO import StringIO
+from pida.converters import MCP3202
+from pida.interfaces import Interface, InputChannel
+from pida.clock import time, sleep, time_ns
+from pida.acquisitions import SynchronousAcquisition, ScanAcquisition, ProcessAcquisition, \
+    TriggeredAcquisition, PROCESS_POLL_TIME
+from pida.decimation import Decimator
+from pida.triggers import LevelTrigger, SlopeTrigger, FALLING
+from pida.streams import BlockStream
+from pida.buffers import DEFAULT_CAPACITY
+from datalinks import ChannelEchoDataLink, FailingDataLink, SequenceDataLink
+
+class ScanAcquisitionTest(unittest.TestCase):
+
+    def test_scan_reads_every_channel_in_one_batch_per_converter(self):
+        link0 = ChannelEchoDataLink(100)
+        link1 = ChannelEchoDataLink(200)
+        adc0 = MCP3202(4096, link0)
+        adc1 = MCP3202(4096, link1)
+        interface = Interface("Test", "", [
+            InputChannel(adc0, 1), InputChannel(adc1, 0),
+            InputChannel(adc0, 0), InputChannel(adc1, 1)])
+
+        acquisition = ScanAcquisition(interface, max_count=5)
+        acquisition.start()
+        acquisition.join()
+
+        data = acquisition.get_data()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(list(data.codes(0)), [103] * 5)
+        self.assertEqual(list(data.codes(1)), [202] * 5)
+        self.assertEqual(list(data.codes(2)), [102] * 5)
+        self.assertEqual(list(data.codes(3)), [203] * 5)
+        self.assertEqual(data[0][1:], [103.0, 202.0, 102.0, 203.0])
+        self.assertEqual((link0.batches, link1.batches), (5, 5))
+
+    def test_requires_input_channels(self):
+        self.assertRaises(ValueError, ScanAcquisition, [])
+
+class TimingTest(unittest.TestCase):
+
+    def test_records_every_sample(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=20, sampling_rate=1000)
+        acquisition.start()
+        acquisition.join()
+
+        timing = acquisition.timing.snapshot()
+        self.assertEqual(timing.count, 20)
+        self.assertEqual(timing.requested_rate, 1000)
+        self.assertTrue(500 < timing.achieved_rate < 1500)
+        self.assertTrue(timing.transfer_time > 0)
+        self.assertTrue(timing.sleep_time > 0)
+        self.assertEqual(sum(count for _, count in timing.histogram), 20)
+
+    def test_nanosecond_timestamps(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=10, sampling_rate=1000,
+                                             nanoseconds=True)
+        acquisition.start()
+        acquisition.join()
+
+        data = acquisition.get_data()
+        times = list(data.times_ns())
+        self.assertEqual(len(times), 10)
+        self.assertTrue(all(isinstance(t, (int, long)) for t in times))
+        self.assertTrue(8000000 < times[-1] - times[0] < 12000000)
+        self.assertAlmostEqual(data[-1][0], times[-1] * 1e-9)
+        self.assertEqual(acquisition.timing.count, 10)
+
+    def test_default_capacity_is_bounded(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        self.assertEqual(SynchronousAcquisition(channel, 50).capacity, 50)
+        self.assertEqual(SynchronousAcquisition(channel, 10 ** 8).capacity, DEFAULT_CAPACITY)
+        self.assertEqual(SynchronousAcquisition(channel).capacity, DEFAULT_CAPACITY)
+
+    def test_schedule_does_not_drift(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, sampling_rate=3000, nanoseconds=True)
+        acquisition._start_ns = 5
+        schedule = acquisition._clock()[3]
+        self.assertEqual(schedule(1), 5 + 333333)
+        # A day of samples still lands on the nominal instant
+        self.assertEqual(schedule(3000 * 86400), 5 + 86400 * 10 ** 9)
+
+    def test_scan_records_every_scan(self):
+        adc = MCP3202(4096, ChannelEchoDataLink(0))
+        acquisition = ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)], max_count=5)
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(acquisition.timing.count, 5)
+        self.assertEqual(acquisition.timing.max_lateness, 0.0)
+
+    def test_no_overruns_at_maximum_rate(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        adc = MCP3202(4096, ChannelEchoDataLink(0))
+        for acquisition in [SynchronousAcquisition(channel, max_count=50, native=False),
+                            ScanAcquisition([InputChannel(adc, 0)], max_count=50)]:
+            acquisition.start()
+            acquisition.join()
+            self.assertEqual(acquisition.timing.count, 50)
+            self.assertEqual(acquisition.timing.overruns, 0)
+            self.assertTrue(acquisition.timing.is_sustainable())
+
+class FailureTest(unittest.TestCase):
+
+    def run_failing(self, acquisition):
+        # Keep the traceback of the failed thread out of the test output
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            acquisition.start()
+            acquisition.join()
+        finally:
+            sys.stderr = stderr
+
+    def test_failing_link_stops_the_acquisition(self):
+        channel = InputChannel(MCP3202(4096, FailingDataLink(5)), 0)
+        stream = BlockStream(2)
+        acquisition = SynchronousAcquisition(channel, sinks=[stream])
+        reader = acquisition.reader()
+        self.run_failing(acquisition)
+
+        self.assertEqual(acquisition.status, 'stopped')
+        self.assertEqual(acquisition.count, 5)
+        self.assertFalse(reader.wait(10))
+        self.assertEqual([len(block.times) for block in stream], [2, 2])
+        self.assertTrue(acquisition.start_time_lock.acquire(False))
+
+    def test_failing_open_releases_start_time(self):
+        channel = InputChannel(MCP3202(4096, FailingDataLink(0, fail_open=True)), 0)
+        acquisition = SynchronousAcquisition(channel)
+        self.run_failing(acquisition)
+
+        self.assertEqual(acquisition.status, 'stopped')
+        self.assertTrue(acquisition.start_time_lock.acquire(False))
+        self.assertFalse(acquisition.reader().wait())
+
+class ProcessAcquisitionTest(unittest.TestCase):
+
+    def test_samples_in_child_process(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(5)), 0)
+        acquisition = ProcessAcquisition(SynchronousAcquisition(channel, sampling_rate=1000))
+        self.assertEqual(acquisition.status, 'waiting')
+        acquisition.start()
+        acquisition.start_time_lock.acquire()
+        self.assertEqual(acquisition.status, 'running')
+        sleep(time() + 0.05)
+        acquisition.stop()
+        acquisition.join()
+
+        self.assertEqual(acquisition.status, 'stopped')
+        data = acquisition.get_data()
+        self.assertTrue(len(data) > 10)
+        self.assertEqual(set(data.codes()), set([7]))
+        self.assertTrue(acquisition.elapsed_time >= data[-1][0])
+        # The wrapped acquisition never runs in this process
+        self.assertEqual(acquisition.acquisition.status, 'waiting')
+
+    def test_stop_is_not_polled(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = ProcessAcquisition(SynchronousAcquisition(channel, sampling_rate=1000))
+        acquisition.start()
+        acquisition.start_time_lock.acquire()
+        sleep(time() + 0.05)
+        stopped = time()
+        acquisition.stop()
+        acquisition.join()
+        end = acquisition.start_time + acquisition.elapsed_time
+        self.assertTrue(end - stopped < PROCESS_POLL_TIME / 2)
+
+    def test_scan_in_child_process(self):
+        adc = MCP3202(4096, ChannelEchoDataLink(100))
+        acquisition = ProcessAcquisition(
+            ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)], max_count=5))
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(acquisition.get_data().tolist()[0][1:], [102.0, 103.0])
+        self.assertEqual(len(acquisition.get_data()), 5)
+
+class ReaderTest(unittest.TestCase):
+
+    def test_reads_only_new_samples(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=30, sampling_rate=1000)
+        reader = acquisition.reader()
+        acquisition.start()
+
+        samples = []
+        while reader.wait(10):
+            block = reader.read_new(10)
+            self.assertEqual(len(block), 10)
+            samples.extend(block.tolist())
+        acquisition.join()
+
+        self.assertEqual(len(samples), 30)
+        self.assertEqual(samples, acquisition.get_data().tolist())
+        self.assertEqual(len(reader.read_new()), 0)
+        self.assertEqual(reader.position, 30)
+        self.assertEqual(reader.lost, 0)
+
+    def test_counts_overwritten_samples(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=50, capacity=20)
+        acquisition.start()
+        acquisition.join()
+
+        reader = acquisition.reader()
+        self.assertEqual(reader.available, 50)
+        self.assertEqual(len(reader.read_new()), 20)
+        self.assertEqual(reader.lost, 30)
+        self.assertFalse(reader.wait(1))
+
+    def test_wait_does_not_change_the_chunk_size(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=20, sampling_rate=1000)
+        chunk_size = acquisition._chunk_size
+        reader = acquisition.reader()
+        acquisition.start()
+        self.assertTrue(reader.wait())
+        self.assertEqual(acquisition._chunk_size, chunk_size)
+        self.assertEqual(acquisition._wait_targets, [])
+        acquisition.join()
+        self.assertEqual(acquisition._due, float('inf'))
+
+    def test_each_sink_receives_its_own_blocks(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=25)
+        small, large = [], []
+        acquisition.on_block(1, small.append)
+        acquisition.on_block(10, large.append)
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual(len(small), 25)
+        self.assertEqual([len(block) for block in large], [10, 10])
+
+    def test_block_callbacks(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=25, sampling_rate=1000)
+        blocks = []
+        acquisition.on_block(10, lambda block: blocks.append(block.tolist()))
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual([len(block) for block in blocks], [10, 10])
+        self.assertEqual(blocks[0] + blocks[1], acquisition.get_data(25).tolist()[:20])
+        self.assertEqual(blocks[0][0][1], 2.0)
+
+    def test_reader_of_child_process(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(5)), 0)
+        acquisition = ProcessAcquisition(SynchronousAcquisition(channel, max_count=20,
+                                                                sampling_rate=1000))
+        reader = acquisition.reader()
+        acquisition.start()
+        self.assertTrue(reader.wait(5, timeout=5))
+        acquisition.join()
+        self.assertEqual(len(reader.read_new()), 20)
+        self.assertEqual(reader.read_new().tolist(), [])
+
+class DecimationTest(unittest.TestCase):
+
+    def test_oversamples_in_one_batch(self):
+        link = ChannelEchoDataLink(0)
+        channel = InputChannel(MCP3202(4096, link), 1)
+        acquisition = SynchronousAcquisition(channel, max_count=5,
+                                             decimation=Decimator(16, envelope=True))
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual(link.batches, 5)
+        self.assertEqual(acquisition.decimation.bit_gain, 2.0)
+        self.assertEqual(list(acquisition.get_data().codes()), [48] * 5)
+        self.assertEqual(acquisition.get_data()[0][1], 3.0)
+        self.assertEqual(acquisition.get_envelope(1).tolist()[0][1:], [3.0, 3.0])
+
+    def test_conversion_rate(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, sampling_rate=100, decimation=8)
+        self.assertEqual(acquisition.conversion_rate, 800)
+        self.assertRaises(ValueError, acquisition.get_envelope)
+
+    def test_scan(self):
+        adc = MCP3202(4096, ChannelEchoDataLink(100))
+        acquisition = ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)], max_count=3,
+                                      decimation=Decimator(4, order=2, envelope=True))
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(acquisition.get_data().tolist()[-1][1:], [102.0, 103.0])
+        self.assertEqual(acquisition.get_envelope().tolist()[0][1:], [102.0, 102.0, 103.0, 103.0])
+
+class RunningStatisticsTest(unittest.TestCase):
+
+    def test_statistics_of_every_channel(self):
+        adc = MCP3202(4096, ChannelEchoDataLink(100))
+        acquisition = ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)], max_count=30)
+        statistics = acquisition.running_statistics(window=10)
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual(statistics.cumulative(0).count, 30)
+        self.assertEqual(statistics.cumulative(0).mean, 102.0)
+        self.assertEqual(statistics.windowed(1).count, 10)
+        self.assertEqual(statistics.windowed(1).max, 103.0)
+        self.assertEqual(statistics.windowed(1).std, 0.0)
+
+    def test_statistics_are_current(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=20, sampling_rate=1000)
+        statistics = acquisition.running_statistics()
+        self.assertRaises(ValueError, statistics.windowed)
+        acquisition.start()
+        reader = acquisition.reader()
+        reader.wait(5)
+        self.assertTrue(statistics.cumulative().count >= 5)
+        acquisition.join()
+        self.assertEqual(statistics.cumulative().count, 20)
+
+class TriggeredAcquisitionTest(unittest.TestCase):
+
+    def test_captures_around_each_trigger(self):
+        # A pulse to 1000 every 50 samples
+        link = SequenceDataLink([1000] * 5 + [0] * 45)
+        channel = InputChannel(MCP3202(4096, link), 0)
+        acquisition = TriggeredAcquisition(channel, LevelTrigger(500), 3, 10, max_count=300)
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual(acquisition.capture_count, 5)
+        for capture in acquisition.captures:
+            self.assertEqual(capture.pre_trigger, 3)
+            self.assertEqual(list(capture.codes), [0] * 3 + [1000] * 5 + [0] * 5)
+            self.assertEqual(capture.trigger_time, capture.times[3])
+        self.assertEqual(acquisition.capacity, 23)
+
+    def test_single_shot(self):
+        link = SequenceDataLink([10, 20, 30, 40, 35, 25, 15])
+        channel = InputChannel(MCP3202(4096, link), 0)
+        acquisition = TriggeredAcquisition(channel, LevelTrigger(30, FALLING), 2, 2,
+                                           rearm=False, max_count=1000)
+        acquisition.start()
+        self.assertTrue(acquisition.wait_captures(1, timeout=5))
+        acquisition.join()
+        self.assertEqual(acquisition.capture_count, 1)
+        self.assertEqual(list(acquisition.captures[0].codes), [40, 35, 25, 15])
+        self.assertTrue(acquisition.count < 1000)
+
+    def test_keeps_the_last_captures(self):
+        link = SequenceDataLink([0, 100])
+        channel = InputChannel(MCP3202(4096, link), 0)
+        acquisition = TriggeredAcquisition(channel, SlopeTrigger(50), 0, 1, max_count=100,
+                                           max_captures=4)
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(acquisition.capture_count, 50)
+        self.assertEqual([capture.index for capture in acquisition.captures], [46, 47, 48, 49])
+
+class EdgeSource(object):
+    """Produces an edge every period seconds, like a GPIO."""
+
+    def __init__(self, period):
+        self.period = period
+        self.edges = []
+
+    def wait_edge(self, timeout=None):
+        sleep(time() + self.period)
+        self.edges.append(time_ns())
+        return self.edges[-1]
+
+class GPIOTimingTest(unittest.TestCase):
+
+    def test_armed_start(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        source = EdgeSource(0.01)
+        acquisition = SynchronousAcquisition(channel, max_count=5, sampling_rate=1000,
+                                             arm=source)
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(len(source.edges), 1)
+        self.assertEqual(acquisition.start_time, source.edges[0] * 1e-9)
+        self.assertEqual(len(acquisition.get_data()), 5)
+
+    def test_external_clock(self):
+        adc = MCP3202(4096, ChannelEchoDataLink(100))
+        source = EdgeSource(0.002)
+        acquisition = ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)], max_count=5,
+                                      nanoseconds=True, external_clock=source)
+        acquisition.start()
+        acquisition.join()
+        start = acquisition._start_ns
+        self.assertEqual(list(acquisition.get_data().times_ns()),
+                         [edge - start for edge in source.edges])
+        self.assertEqual(acquisition.get_data().tolist()[0][1:], [102.0, 103.0])
+        self.assertEqual(acquisition.timing.count, 5)
@@ -1,12 +1,13 @@
 from abc import ABCMeta
 import unittest
+from pida.benchmarks import Runner
 
 class Benchmark(unittest.TestCase):
     __metaclass__ = ABCMeta
-    
-    def print_result(self, result):
-        print("\n{0}".format(result))
-
-    def get_diffs(self, times):
-        return [j - i for i, j in zip(times[:-1], times[1:])]
 
+    def run_benchmark(self, name, repeat=1):
+        """Runs a registered benchmark case, on emulated links when there
+        is no SPI hardware, and returns the values measured for each
+        parameter."""
+        report = Runner([name], repeat=repeat).run()
+        return dict((result['parameter'], result['value']) for result in report['results'])
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pida.benchmarks import Case, Runner, compare, save, load, environment
+
+def report(*results):
+    return {'version': 1, 'results': [
+        {'name': name, 'parameter': parameter, 'value': value, 'higher_is_better': higher}
+        for name, parameter, value, higher in results]}
+
+class RunnerTest(unittest.TestCase):
+
+    def test_run_parametrized_case(self):
+        values = iter([3, 1, 2, 10, 30, 20])
+        case = Case('counter', lambda context, parameter: next(values) * parameter, 'n',
+                    parameters=[1, 2])
+        result = Runner([case], emulated=True, repeat=3).run()
+        self.assertTrue(result['environment']['emulated'])
+        self.assertEqual([(r['parameter'], r['value'], r['samples']) for r in result['results']],
+                         [(1, 2, [3, 1, 2]), (2, 40, [20, 60, 40])])
+
+    def test_run_registered_case(self):
+        result = Runner(['clock_resolution'], emulated=True, repeat=1).run()
+        self.assertEqual(result['results'][0]['name'], 'clock_resolution')
+        self.assertFalse(result['results'][0]['higher_is_better'])
+
+    def test_unknown_case(self):
+        self.assertRaises(ValueError, Runner, ['nonexistent'])
+
+    def test_environment(self):
+        metadata = environment(True)
+        for key in ['date', 'platform', 'python', 'machine', 'cpu', 'emulated']:
+            self.assertTrue(key in metadata)
+
+class CompareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = report(('rate', 1, 100.0, True), ('cost', None, 1.0, False))
+
+    def test_no_regressions(self):
+        current = report(('rate', 1, 95.0, True), ('cost', None, 0.5, False), ('new', None, 1, True))
+        self.assertEqual(compare(current, self.baseline, 0.1), [])
+
+    def test_regressions(self):
+        current = report(('rate', 1, 80.0, True), ('cost', None, 1.5, False))
+        regressions = compare(current, self.baseline, 0.1)
+        self.assertEqual([(r.name, r.parameter) for r in regressions],
+                         [('rate', 1), ('cost', None)])
+        self.assertAlmostEqual(regressions[0].change, 0.2)
+        self.assertAlmostEqual(regressions[1].change, 0.5)
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'baseline.json')
+            save(self.baseline, filename)
+            self.assertEqual(load(filename), self.baseline)
+            save({'version': 0, 'results': []}, filename)
+            self.assertRaises(ValueError, load, filename)
+        finally:
+            shutil.rmtree(directory)
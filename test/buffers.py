@@ -0,0 +1,98 @@
+import ctypes
+import unittest
+from multiprocessing import Process
+from pida.buffers import SampleBuffer, SharedSampleBuffer
+from pida.sampling import load_count, store_count
+
+class SampleBufferTest(unittest.TestCase):
+
+    def test_keeps_last_samples_when_full(self):
+        buffer = SampleBuffer(4)
+        for i in range(10):
+            buffer.append(i * 0.5, i)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.count, 10)
+        self.assertEqual(buffer.view().tolist(), [[3.0, 6], [3.5, 7], [4.0, 8], [4.5, 9]])
+
+    def test_view_last_samples(self):
+        buffer = SampleBuffer(4)
+        for i in range(6):
+            buffer.append(i, i)
+        view = buffer.view(3, lambda code: code * 2.0)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view[0], [3.0, 6.0])
+        self.assertEqual(view[-1], [5.0, 10.0])
+        self.assertEqual(list(view.times()), [3.0, 4.0, 5.0])
+        self.assertEqual(list(view.codes()), [3, 4, 5])
+        self.assertEqual(view[1:].tolist(), [[4.0, 8.0], [5.0, 10.0]])
+
+    def test_view_does_not_grow(self):
+        buffer = SampleBuffer(8)
+        buffer.append(0.0, 1)
+        view = buffer.view()
+        buffer.append(1.0, 2)
+        self.assertEqual(len(view), 1)
+
+    def test_rows(self):
+        buffer = SampleBuffer(2, width=3)
+        buffer.append_row(1.0, [1, 2, 3])
+        self.assertEqual(buffer.view()[0], [1.0, 1, 2, 3])
+        self.assertEqual(list(buffer.view().codes(2)), [3])
+
+    def test_nanoseconds(self):
+        buffer = SampleBuffer(4, nanoseconds=True)
+        for i in range(6):
+            buffer.append(3600 * 10 ** 9 + i, i)
+        view = buffer.view()
+        self.assertEqual(list(view.times_ns()), [3600 * 10 ** 9 + i for i in range(2, 6)])
+        self.assertEqual(list(view[1:3].times_ns()), [3600 * 10 ** 9 + 3, 3600 * 10 ** 9 + 4])
+        self.assertAlmostEqual(view.times()[0], 3600.000000002)
+        self.assertAlmostEqual(view[0][0], 3600.000000002)
+        self.assertRaises(ValueError, SampleBuffer(1).view().times_ns)
+
+class SharedSampleBufferTest(unittest.TestCase):
+
+    def test_shared_with_child_process(self):
+        buffer = SharedSampleBuffer(4, width=2)
+        buffer.append_row(0.5, [1, 2])
+
+        def produce():
+            for i in range(1, 5):
+                buffer.append_row(i + 0.5, [i, -i])
+
+        process = Process(target=produce)
+        process.start()
+        process.join()
+        self.assertEqual(buffer.count, 5)
+        self.assertEqual(buffer.view().tolist(),
+                         [[1.5, 1, -1], [2.5, 2, -2], [3.5, 3, -3], [4.5, 4, -4]])
+        self.assertEqual(list(buffer.view().times()), [1.5, 2.5, 3.5, 4.5])
+        self.assertEqual(buffer.view(2).codes(1).tolist(), [-3, -4])
+
+    def test_reader_never_sees_unwritten_samples(self):
+        buffer = SharedSampleBuffer(20000)
+
+        def produce():
+            for i in range(1, 20001):
+                buffer.append(i, i)
+
+        process = Process(target=produce)
+        process.start()
+        while process.is_alive() or buffer.count < 20000:
+            count = buffer.count
+            if count:
+                self.assertEqual(buffer.view_since(count - 1)[0], [count, count])
+        process.join()
+
+    def test_count_barriers(self):
+        counter = ctypes.c_int64()
+        store_count(counter, 2 ** 40)
+        self.assertEqual(counter.value, 2 ** 40)
+        self.assertEqual(load_count(counter), 2 ** 40)
+        self.assertRaises(ValueError, store_count, ctypes.c_int32(), 1)
+        self.assertRaises(ValueError, load_count, ctypes.c_int32())
+
+    def test_nanoseconds(self):
+        buffer = SharedSampleBuffer(2, nanoseconds=True)
+        buffer.append(10 ** 18, 1)
+        self.assertEqual(list(buffer.view().times_ns()), [10 ** 18])
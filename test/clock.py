@@ -1,11 +1,28 @@
+import unittest
 from benchmark import Benchmark
-from pida.clock import time
+from pida.clock import time, time_ns, sleep_until_ns, timestamps
 
 class ClockTest(Benchmark):
 
     def test_estimate_clock_resolution(self):
-        n_samples = 10000
-        times = [time() for _ in range(n_samples)]
-        diffs = self.get_diffs(times)
-        estimated_resolution = min(diffs)
-        self.print_result(estimated_resolution)
+        resolution = self.run_benchmark('clock_resolution')[None]
+        self.assertTrue(0 < resolution < 1e-3)
+
+    def test_sleep_lateness(self):
+        for period, lateness in self.run_benchmark('sleep_lateness').items():
+            self.assertTrue(0 <= lateness < period + 1e-3)
+
+class NanosecondClockTest(unittest.TestCase):
+
+    def test_time_ns(self):
+        start = time_ns()
+        self.assertTrue(abs(start * 1e-9 - time()) < 1e-3)
+        sleep_until_ns(start + 1000000)
+        self.assertTrue(time_ns() >= start + 1000000)
+
+    def test_timestamps(self):
+        readings = timestamps(100)
+        self.assertEqual(len(readings), 100)
+        self.assertEqual(readings, sorted(readings))
+        self.assertEqual(timestamps(0), [])
+        self.assertRaises(ValueError, timestamps, -1)
@@ -0,0 +1,101 @@
+import ctypes
+import unittest
+from threading import Event, Thread
+from benchmark import Benchmark
+from pida.benchmarks import hardware_available
+from pida.acquisitions import SynchronousAcquisition
+from pida.clock import time
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.links import FullDuplexDataLink, SPIDataLink, SPIDataLinkConfiguration
+
+# Functions called through PyDLL keep the GIL, as a transfer that did not
+# release it would; CDLL releases it around the call, as SpiDev.xfer2 does
+# around its ioctl
+_libc = ctypes.PyDLL(None)
+_libc_nogil = ctypes.CDLL(None)
+
+class GILHoldingLink(FullDuplexDataLink):
+    """Stands for a link whose transfers keep the GIL."""
+
+    usleep = _libc.usleep
+
+    def __init__(self, duration):
+        self.duration = duration
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def transfer(self, data):
+        self.usleep(int(self.duration * 1e6))
+        return [0] * len(data)
+
+class GILReleasingLink(GILHoldingLink):
+    """Stands for a link whose transfers release the GIL."""
+
+    usleep = _libc_nogil.usleep
+
+def aggregate_rate(link_class, n_acquisitions, n_samples=200):
+    """Runs concurrent interpreted acquisitions, each on its own link with
+    1ms transfers, and returns their aggregate samples per second."""
+    acquisitions = [SynchronousAcquisition(InputChannel(MCP3202(3.3, link_class(1e-3)), 0),
+                                           n_samples, native=False)
+                    for _ in range(n_acquisitions)]
+    start = time()
+    for acquisition in acquisitions:
+        acquisition.start()
+    for acquisition in acquisitions:
+        acquisition.join()
+    return n_acquisitions * n_samples / (time() - start)
+
+def longest_stall(link, data):
+    """Runs a transfer in another thread and returns the longest interval
+    in which this thread could not run meanwhile."""
+    done = Event()
+    def transfer():
+        link.transfer(data)
+        done.set()
+    thread = Thread(target=transfer)
+    last = time()
+    longest = 0.0
+    thread.start()
+    while not done.is_set():
+        now = time()
+        longest = max(longest, now - last)
+        last = now
+    thread.join()
+    # The clock is read before waiting for the GIL, so the last stall
+    # only shows up here
+    return max(longest, time() - last)
+
+class ConcurrencyTest(Benchmark):
+
+    def test_gil_holding_baseline(self):
+        self.assertTrue(longest_stall(GILHoldingLink(0.1), [0] * 16) > 0.05)
+
+    @unittest.skipUnless(hardware_available(), "requires SPI 0.0")
+    def test_spidev_transfers_release_the_gil(self):
+        data = [0] * 4096
+        with SPIDataLink(0, 0, SPIDataLinkConfiguration(0, 250000)) as link:
+            start = time()
+            link.transfer(data)
+            duration = time() - start
+            stall = longest_stall(link, data)
+        baseline = longest_stall(GILHoldingLink(duration), data)
+        self.assertTrue(stall < baseline / 4)
+
+    def test_gil_releasing_transfers_scale(self):
+        single = aggregate_rate(GILReleasingLink, 1)
+        self.assertTrue(aggregate_rate(GILReleasingLink, 2) > 1.5 * single)
+
+    def test_gil_holding_transfers_do_not_scale(self):
+        single = aggregate_rate(GILHoldingLink, 1)
+        self.assertTrue(aggregate_rate(GILHoldingLink, 2) < 1.2 * single)
+
+    def test_aggregate_throughput(self):
+        rates = self.run_benchmark('concurrent_acquisitions')
+        self.assertEqual(sorted(rates), [1, 2, 4])
+        self.assertTrue(rates[2] > 1.5 * rates[1])
@@ -0,0 +1,32 @@
+import unittest
+from pida.converters import MCP3002, MCP3202, MCP4802
+from datalinks import RecordingDataLink
+
+class ConverterTest(unittest.TestCase):
+
+    def test_mcp3202_read_codes(self):
+        link = RecordingDataLink([0x00, 0x0A, 0xBC])
+        adc = MCP3202(3.3, link)
+        self.assertEqual(adc.read_codes([0, 1, 0]), [0xABC] * 3)
+        self.assertEqual(link.requests, [[1, 0x80, 0], [1, 0xC0, 0], [1, 0x80, 0]])
+
+    def test_mcp3002_read_codes_matches_read_code(self):
+        link = RecordingDataLink([0x00, 0x15, 0x5C])
+        adc = MCP3002(3.3, link)
+        self.assertEqual(adc.read_codes([0, 1]), [adc.read_code(0), adc.read_code(1)])
+
+    def test_read_code_through_transfer_into(self):
+        for converter_class, response, code in [(MCP3202, [0x00, 0x0A, 0xBC], 0xABC),
+                                                (MCP3002, [0x00, 0x15, 0x5C], 0x557)]:
+            link = RecordingDataLink(response)
+            adc = converter_class(3.3, link)
+            self.assertEqual(adc.read_code(1), code)
+            self.assertEqual(link.requests, [list(bytearray(adc.sampling_frame(1)[0]))])
+
+    def test_mcp4802_frames(self):
+        link = RecordingDataLink([0, 0])
+        dac = MCP4802(2.048, link)
+        self.assertEqual([dac.to_code(v) for v in [-1.0, 0.0, 1.024, 2.048]], [0, 0, 128, 255])
+        self.assertEqual(dac.output_frame(0xA5, 1), b'\xBA\x50')
+        dac.write(1.024, 0)
+        self.assertEqual(link.requests, [[0x38, 0x00]])
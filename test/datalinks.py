@@ -0,0 +1,112 @@
+from pida.links import FullDuplexDataLink
+
+class RecordingDataLink(FullDuplexDataLink):
+    """Records the requests and answers each one with a fixed response,
+    or with zeros when there is none."""
+
+    def __init__(self, response=None):
+        self.response = response
+        self.requests = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        self.opened -= 1
+
+    def transfer(self, data):
+        self.requests.append(data)
+        return [0] * len(data) if self.response is None else list(self.response)
+
+class EchoDataLink(RecordingDataLink):
+    """Records the requests and answers each byte incremented by one."""
+
+    def transfer(self, data):
+        self.requests.append(data)
+        return [(byte + 1) & 0xFF for byte in data]
+
+class DescriptorDataLink(RecordingDataLink):
+    """Offers a descriptor to the native engine."""
+
+    def fileno(self):
+        return 99
+
+class ChannelEchoDataLink(FullDuplexDataLink):
+    """Answers MCP3202 requests with a code that identifies the channel."""
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.batches = 0
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def transfer(self, data):
+        code = self.offset + (data[1] >> 6)
+        return [0, code >> 8, code & 0xFF]
+
+    def transfer_batch(self, frames):
+        self.batches += 1
+        return FullDuplexDataLink.transfer_batch(self, frames)
+
+class FailingDataLink(ChannelEchoDataLink):
+    """Raises IOError after a number of transfers, or when opened."""
+
+    def __init__(self, transfers, fail_open=False):
+        ChannelEchoDataLink.__init__(self, 0)
+        self.transfers = transfers
+        self.fail_open = fail_open
+
+    def open(self):
+        if self.fail_open:
+            raise IOError("open failed")
+
+    def transfer(self, data):
+        if self.transfers == 0:
+            raise IOError("transfer failed")
+        self.transfers -= 1
+        return ChannelEchoDataLink.transfer(self, data)
+
+class SequenceDataLink(ChannelEchoDataLink):
+    """Answers MCP3202 requests with the codes of a repeating sequence."""
+
+    def __init__(self, codes):
+        ChannelEchoDataLink.__init__(self, 0)
+        self.codes = codes
+        self.position = 0
+
+    def transfer(self, data):
+        code = self.codes[self.position % len(self.codes)]
+        self.position += 1
+        return [0, code >> 8, code & 0xFF]
+
+class CountingDataLink(ChannelEchoDataLink):
+    """Answers MCP3202 requests with the number of the request."""
+
+    def __init__(self):
+        ChannelEchoDataLink.__init__(self, 0)
+        self.code = 0
+
+    def transfer(self, data):
+        code, self.code = self.code, self.code + 1
+        return [0, code >> 8, code & 0xFF]
+
+class NativeDataLink(ChannelEchoDataLink):
+    """Offers a descriptor to the native engine and tracks its lock."""
+
+    def __init__(self):
+        ChannelEchoDataLink.__init__(self, 0)
+        self.held = False
+
+    def fileno(self):
+        return 99
+
+    def acquire(self):
+        self.held = True
+
+    def release(self):
+        self.held = False
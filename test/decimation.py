@@ -0,0 +1,34 @@
+import unittest
+from pida.decimation import Decimator
+
+class DecimatorTest(unittest.TestCase):
+
+    def test_block_average(self):
+        decimation = Decimator(4)
+        decimate = decimation.filter()
+        self.assertEqual(decimate([1, 2, 2, 3]), 8)
+        self.assertEqual(decimation.scaled(lambda code: code)(8), 2.0)
+
+    def test_bit_gain(self):
+        self.assertEqual(Decimator(1).bit_gain, 0.0)
+        self.assertEqual(Decimator(16).bit_gain, 2.0)
+        self.assertEqual(Decimator(64).effective_bits(12), 15.0)
+
+    def test_cic_settles_to_block_sum(self):
+        decimate = Decimator(8, order=3).filter()
+        outputs = [decimate([100] * 8) for _ in range(5)]
+        self.assertNotEqual(outputs[0], 800)
+        self.assertEqual(outputs[2:], [800, 800, 800])
+
+    def test_cic_filters_are_independent(self):
+        decimation = Decimator(4, order=2)
+        first, second = decimation.filter(), decimation.filter()
+        for _ in range(3):
+            first([10] * 4)
+        second([1] * 4)
+        self.assertEqual(first([10] * 4), 40)
+        self.assertEqual(second([1] * 4), 4)
+
+    def test_requires_positive_factor(self):
+        self.assertRaises(ValueError, Decimator, 0)
+        self.assertRaises(ValueError, Decimator, 4, 0)
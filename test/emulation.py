@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pida.clock import time
+from pida.converters import MCP3002, MCP3202, MCP4802
+from pida.interfaces import InterfaceBuilder
+from pida.links import SPIDataLinkConfiguration
+from pida.emulation import (DC, Sine, Noise, Recording, EmulatedSPIDataLink,
+                            EmulatedLinkFactory, MCP3202Device, emulate)
+
+class EmulationTest(unittest.TestCase):
+
+    def test_adc_codes(self):
+        for converter_class in [MCP3002, MCP3202]:
+            adc = converter_class(3.3)
+            adc.data_link = EmulatedSPIDataLink(emulate(adc, [DC(1.65), DC(5.0)]), overhead=0)
+            adc.open()
+            self.assertEqual(adc.read_code(0), adc.levels // 2)
+            self.assertEqual(adc.read_codes([1, 0]), [adc.levels - 1, adc.levels // 2])
+            adc.close()
+
+    def test_dac_writes(self):
+        dac = MCP4802(2.048)
+        link = EmulatedSPIDataLink(emulate(dac), overhead=0)
+        dac.data_link = link
+        dac.open()
+        dac.write_code(0xA5, 1)
+        self.assertEqual(link.device.codes, [0, 0xA5])
+
+    def test_waveforms(self):
+        self.assertAlmostEqual(Sine(1.0, 50, 2.0)(0.005), 3.0)
+        self.assertEqual(Noise(1.0, 0.5, seed=1)(0), Noise(1.0, 0.5, seed=1)(0))
+        recording = Recording([1.0, 2.0, 3.0], 10)
+        self.assertEqual([recording(t) for t in [0.0, 0.15, 0.25, 0.35]], [1.0, 2.0, 3.0, 1.0])
+
+    def test_recording_from_print_data_output(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'recording.txt')
+            with open(filename, 'w') as fd:
+                fd.write("Elapsed Time\tValue\n0.000000\t0.5\n0.001000\t1.5\n")
+            recording = Recording.from_file(filename, 1000, loop=False)
+            self.assertEqual([recording(0.0), recording(0.001), recording(1.0)], [0.5, 1.5, 1.5])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_transfer_latency(self):
+        configuration = SPIDataLinkConfiguration(0, 100000)
+        with EmulatedSPIDataLink(MCP3202Device(3.3), configuration, 1e-3, 1.0) as link:
+            start = time()
+            link.transfer_batch([[1, 0x80, 0]] * 10)
+            elapsed = time() - start
+        self.assertEqual(link.transfers, 1)
+        self.assertTrue(elapsed >= 1e-3 + 240e-6 * 10)
+
+    def test_builds_every_interface(self):
+        builder = InterfaceBuilder(EmulatedLinkFactory({(0, 0): [DC(3.3)]}, overhead=0))
+        for interface_id in ["PidaInterface", "PidaInterface0", "Gertboard"]:
+            interface = builder.build(interface_id)
+            acquisition = interface.acquire(max_count=10)
+            acquisition.join()
+            self.assertEqual(len(acquisition.get_data()), 10)
@@ -0,0 +1,216 @@
+import errno
+import os
+import shutil
+import unittest
+import pida.gpio
+from pida.clock import sleep, time
+from pida.emulation import emulate_gpio, emulate_gpio_registers, EmulatedEdgeSource
+from pida.gpio import (GPIO, LED, Direction, Status, Edge, GPIORegisters, RegisterGPIO,
+                       GPFSEL0, GPSET0, GPCLR0, GPLEV0, GPREN0, GPFEN0, GPIOEventLoop)
+
+class GPIOTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = emulate_gpio([18, 25])
+        self.gpio = GPIO(18, self.root)
+        self.gpio.open()
+
+    def tearDown(self):
+        self.gpio.close()
+        shutil.rmtree(self.root)
+
+    def read(self, name):
+        with open(self.root + 'gpio18/' + name) as f:
+            return f.read()
+
+    def test_attributes(self):
+        self.assertEqual(self.gpio.direction, Direction.INPUT)
+        self.gpio.direction = Direction.OUTPUT
+        self.assertEqual(self.gpio.direction, Direction.OUTPUT)
+        self.gpio.direction = Direction.INPUT
+        self.assertEqual(self.gpio.direction, Direction.INPUT)
+        self.gpio.edge = Edge.FALLING
+        self.gpio.edge = Edge.BOTH
+        self.assertEqual(self.gpio.edge, Edge.BOTH)
+
+    def test_status_uses_one_descriptor(self):
+        self.gpio.status = Status.HIGH
+        fd = self.gpio.fileno()
+        self.assertEqual(self.gpio.status, Status.HIGH)
+        self.assertEqual(self.read('value')[0], '1')
+        self.gpio.status = Status.LOW
+        self.assertEqual(self.gpio.status, Status.LOW)
+        self.assertEqual(self.gpio.fileno(), fd)
+
+    def test_bulk_access(self):
+        self.gpio.write_pattern([1, 0, 1, 1])
+        self.assertEqual(self.gpio.status, Status.HIGH)
+        self.gpio.write_pattern(bytearray([1, 0]))
+        self.assertEqual(self.gpio.read_many(3), bytearray([0, 0, 0]))
+
+    def test_python_fallback(self):
+        gpiocore = pida.gpio.gpiocore
+        pida.gpio.gpiocore = None
+        try:
+            self.gpio.status = Status.HIGH
+            self.assertEqual(self.gpio.status, Status.HIGH)
+            self.gpio.write_pattern([1, 0])
+            self.assertEqual(self.gpio.read_many(2), bytearray([0, 0]))
+        finally:
+            pida.gpio.gpiocore = gpiocore
+
+    def test_led_toggle(self):
+        with LED(25, self.root) as led:
+            led.toggle()
+            with open(self.root + 'gpio25/value') as f:
+                self.assertEqual(f.read()[0], '1')
+            led.toggle()
+            with open(self.root + 'gpio25/value') as f:
+                self.assertEqual(f.read()[0], '0')
+            # Another writer changes the pin between toggles
+            with open(self.root + 'gpio25/value', 'w') as f:
+                f.write('1')
+            led.toggle()
+            with open(self.root + 'gpio25/value') as f:
+                self.assertEqual(f.read()[0], '0')
+
+class RegisterGPIOTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = emulate_gpio_registers()
+        self.registers = GPIORegisters(self.path)
+        self.words = self.registers.words
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_backend_selection(self):
+        gpio = GPIO(18, backend=self.registers)
+        self.assertIsInstance(gpio, RegisterGPIO)
+        self.assertIs(gpio.registers, self.registers)
+        self.assertRaises(ValueError, GPIO, 54, backend=self.registers)
+
+    def test_direction(self):
+        gpio = GPIO(18, backend=self.registers)
+        self.words[GPFSEL0 + 1] = 0o7 << 24
+        self.assertRaises(ValueError, getattr, gpio, 'direction')
+        gpio.direction = Direction.OUTPUT
+        self.assertEqual(self.words[GPFSEL0 + 1], 0o1 << 24)
+        self.assertEqual(gpio.direction, Direction.OUTPUT)
+        gpio.direction = Direction.INPUT
+        self.assertEqual(gpio.direction, Direction.INPUT)
+
+    def test_status(self):
+        gpio = GPIO(40, backend=self.registers)
+        gpio.status = Status.HIGH
+        self.assertEqual(self.words[GPSET0 + 1], 1 << 8)
+        gpio.status = Status.LOW
+        self.assertEqual(self.words[GPCLR0 + 1], 1 << 8)
+        self.assertEqual(gpio.status, Status.LOW)
+        self.words[GPLEV0 + 1] = 1 << 8
+        self.assertEqual(gpio.status, Status.HIGH)
+        self.assertEqual(gpio.read_many(2), bytearray([1, 1]))
+
+    def test_edge(self):
+        gpio = GPIO(18, backend=self.registers)
+        self.words[GPFEN0] = 1 << 18
+        self.assertEqual(gpio.edge, Edge.FALLING)
+        self.assertRaises(IOError, setattr, gpio, 'edge', Edge.BOTH)
+        self.assertEqual((self.words[GPREN0], self.words[GPFEN0]), (0, 1 << 18))
+
+    def test_no_file_operations(self):
+        gpio = GPIO(18, backend=self.registers)
+        for method, args in [(gpio.fileno, ()), (gpio.wait_edge, (0.01,)),
+                             (gpio.wait_for_edge, ()), (gpio.get_stream_writer, ())]:
+            with self.assertRaises(IOError) as context:
+                method(*args)
+            self.assertEqual(context.exception.errno, errno.EOPNOTSUPP)
+
+    def test_multiple_pins(self):
+        mask = GPIORegisters.mask([4, 17, 18])
+        self.assertEqual(mask, (1 << 4) | (1 << 17) | (1 << 18))
+        self.assertRaises(ValueError, GPIORegisters.mask, [4, 40])
+        self.registers.write(mask, 1 << 17)
+        self.assertEqual(self.words[GPSET0], 1 << 17)
+        self.assertEqual(self.words[GPCLR0], (1 << 4) | (1 << 18))
+        with open(self.path, 'rb') as f:
+            f.seek(GPSET0 * 4)
+            self.assertEqual(bytearray(f.read(4)), bytearray([0, 0, 2, 0]))
+
+class GPIOEventLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = [EmulatedEdgeSource(17), EmulatedEdgeSource(27)]
+        self.loop = GPIOEventLoop(capacity=8, batch=4)
+        for source in self.sources:
+            self.loop.add(source)
+
+    def tearDown(self):
+        self.loop.close()
+        for source in self.sources:
+            source.close()
+
+    def test_poll(self):
+        self.assertEqual(self.loop.pins, [17, 27])
+        self.assertEqual(self.sources[0].edge, Edge.BOTH)
+        self.assertEqual(self.loop.poll(0), 0)
+        self.sources[0].drive(Status.HIGH)
+        self.sources[1].drive(Status.HIGH)
+        self.assertEqual(self.loop.poll(1), 2)
+        events = sorted(self.loop.get_events())
+        self.assertEqual([(event.pin, event.edge) for event in events],
+                         [(17, Edge.RISING), (27, Edge.RISING)])
+        self.assertEqual(events[0].time, events[1].time)
+        self.sources[1].drive(Status.LOW)
+        self.loop.poll(1)
+        self.assertEqual(self.loop.get_events(1), [self.loop.get_events_since(2)[0]])
+        self.assertEqual(self.loop.get_events_since(2)[0][:2], (27, Edge.FALLING))
+
+    def test_timeout_beyond_int_milliseconds(self):
+        self.sources[0].drive(Status.HIGH)
+        self.assertEqual(self.loop.poll(30 * 86400.0), 1)
+        gpiocore = pida.gpio.gpiocore
+        pida.gpio.gpiocore = None
+        try:
+            self.sources[0].drive(Status.LOW)
+            self.assertEqual(self.loop.poll(30 * 86400.0), 1)
+        finally:
+            pida.gpio.gpiocore = gpiocore
+
+    def test_python_fallback(self):
+        gpiocore = pida.gpio.gpiocore
+        pida.gpio.gpiocore = None
+        try:
+            self.sources[1].drive(Status.HIGH)
+            self.assertEqual(self.loop.poll(1), 1)
+            self.assertEqual(self.loop.get_events()[0][:2], (27, Edge.RISING))
+        finally:
+            pida.gpio.gpiocore = gpiocore
+
+    def test_ring(self):
+        for _ in range(6):
+            self.sources[0].drive(Status.HIGH)
+            self.sources[0].drive(Status.LOW)
+        while self.loop.poll(0):
+            pass
+        self.assertEqual(self.loop.count, 12)
+        self.assertEqual(self.loop.lost, 4)
+        self.assertEqual(len(self.loop.get_events()), 8)
+        self.assertEqual(len(self.loop.get_events_since(10)), 2)
+
+    def test_thread_measurements(self):
+        self.loop.start()
+        start = time()
+        for n in range(1, 4):
+            self.sources[0].drive(Status.HIGH)
+            self.assertTrue(self.loop.wait_events(2 * n - 1, 1))
+            sleep(start + 0.02 * n - 0.01)
+            self.sources[0].drive(Status.LOW)
+            self.assertTrue(self.loop.wait_events(2 * n, 1))
+            sleep(start + 0.02 * n)
+        self.assertAlmostEqual(self.loop.frequency(17), 50, delta=10)
+        widths = self.loop.pulse_widths(17)
+        self.assertEqual(len(widths), 3)
+        for width in widths:
+            self.assertAlmostEqual(width, 0.01, delta=0.004)
+        self.assertEqual(self.loop.frequency(27), 0)
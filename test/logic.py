@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pida.emulation import emulate_gpio, emulate_gpio_registers
+from pida.gpio import GPIO, GPIORegisters, Edge, GPLEV0
+from pida.logic import LogicCapture, load, DEFAULT_LOGIC_CAPACITY
+
+class SequenceWords(object):
+    # Register block whose level register returns a repeating sequence
+
+    def __init__(self, levels):
+        self._levels = levels
+        self._index = 0
+
+    def __getitem__(self, index):
+        if index != GPLEV0:
+            return 0
+        level = self._levels[self._index % len(self._levels)]
+        self._index += 1
+        return level
+
+class SequenceRegisters(object):
+
+    def __init__(self, levels):
+        self.words = SequenceWords(levels)
+
+class LogicCaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def capture(self, levels, n_count, **kwargs):
+        registers = SequenceRegisters(levels)
+        gpios = [GPIO(4, backend=registers), GPIO(17, backend=registers)]
+        capture = LogicCapture(gpios, 0, max_count=n_count, **kwargs)
+        capture.start()
+        capture.join()
+        return capture
+
+    def test_packed_samples(self):
+        high = (1 << 4) | (1 << 17)
+        capture = self.capture([0, 1 << 4, high | (1 << 5), high], 8)
+        self.assertEqual(capture.pins, [4, 17])
+        self.assertEqual(capture.status, 'stopped')
+        self.assertEqual(list(capture.get_samples()), [0, 1 << 4, high, high] * 2)
+        self.assertEqual(list(capture.get_samples(2)), [high, high])
+        self.assertEqual(capture.get_levels(17), bytearray([0, 0, 1, 1] * 2))
+        self.assertEqual(capture.get_transitions(),
+                         [(0, 0), (1, 1 << 4), (2, high), (4, 0), (5, 1 << 4), (6, high)])
+        self.assertRaises(ValueError, capture.get_levels, 5)
+
+    def test_default_capacity_is_bounded(self):
+        registers = SequenceRegisters([0])
+        gpios = [GPIO(4, backend=registers)]
+        self.assertEqual(LogicCapture(gpios, 0, max_count=10).capacity, 10)
+        self.assertEqual(LogicCapture(gpios, 0, max_count=10 ** 9).capacity,
+                         DEFAULT_LOGIC_CAPACITY)
+
+    def test_ring(self):
+        capture = self.capture([0, 0, 0, 1 << 4], 10, capacity=4)
+        self.assertEqual(capture.lost, 6)
+        self.assertEqual(list(capture.get_samples()), [0, 1 << 4, 0, 0])
+        self.assertEqual(capture.get_transitions(), [(0, 0), (3, 1 << 4), (4, 0), (7, 1 << 4), (8, 0)])
+
+    def test_no_overruns_at_maximum_rate(self):
+        capture = self.capture([0, 1 << 4], 20)
+        self.assertEqual(capture.timing.overruns, 0)
+        self.assertTrue(capture.timing.is_sustainable())
+
+    def test_save_and_load(self):
+        capture = self.capture([0, 0, 1 << 17, 1 << 17, 1 << 17], 12, capacity=4)
+        filename = os.path.join(self.directory, 'capture.logic')
+        capture.save(filename)
+        recording = load(filename)
+        self.assertEqual(recording.pins, [4, 17])
+        self.assertEqual(recording.count, 12)
+        self.assertEqual(recording.transitions, capture.get_transitions())
+        self.assertEqual(list(recording.samples()), [0, 0] + [1 << 17] * 3 + [0, 0] + [1 << 17] * 3 + [0, 0])
+        with open(filename, 'r+b') as f:
+            f.write(b'X')
+        self.assertRaises(ValueError, load, filename)
+
+    def test_edges(self):
+        capture = LogicCapture([GPIO(17, backend=SequenceRegisters([0, 0, 1 << 17]))],
+                               1000, max_count=6)
+        capture.start()
+        capture.join()
+        self.assertEqual(capture.get_edges(17), [(0.002, Edge.RISING), (0.003, Edge.FALLING),
+                                                 (0.005, Edge.RISING)])
+        self.assertEqual(capture.timing.snapshot().count, 6)
+
+    def test_gpio_backends(self):
+        root = emulate_gpio([4, 17])
+        path = emulate_gpio_registers()
+        try:
+            with open(root + 'gpio17/value', 'w') as f:
+                f.write('1\n')
+            gpios = [GPIO(4, root), GPIO(17, root)]
+            capture = LogicCapture(gpios, 0, max_count=3)
+            capture.start()
+            capture.join()
+            self.assertEqual(list(capture.get_samples()), [1 << 17] * 3)
+            for gpio in gpios:
+                gpio.close()
+
+            registers = GPIORegisters(path)
+            registers.words[GPLEV0] = (1 << 4) | (1 << 9)
+            capture = LogicCapture([GPIO(4, backend=registers)], 0, max_count=2)
+            capture.start()
+            capture.join()
+            self.assertEqual(list(capture.get_samples()), [1 << 4] * 2)
+        finally:
+            shutil.rmtree(root)
+            os.remove(path)
+        self.assertRaises(ValueError, LogicCapture, [GPIO(40, backend=registers)], 10)
@@ -0,0 +1,79 @@
+import os
+import shutil
+import unittest
+import pida.patterns
+from pida.clock import time
+from pida.emulation import emulate_gpio, emulate_gpio_registers
+from pida.gpio import GPIO, GPIORegisters, GPSET0, GPCLR0
+from pida.patterns import (PatternOutput, ALL_PINS, word_pattern, bit_pattern,
+                           clock_pattern, pwm_pattern)
+
+class PatternTest(unittest.TestCase):
+
+    def test_patterns(self):
+        pattern = bit_pattern([1, 0, 0], 1e-3)
+        self.assertEqual(list(pattern.words), [ALL_PINS, 0, 0])
+        self.assertEqual(list(pattern.durations), [1e-3] * 3)
+        self.assertEqual(list(clock_pattern(1000).durations), [0.5e-3, 0.5e-3])
+        pattern = pwm_pattern([0.25, 0, 1], 1e-3)
+        self.assertEqual(list(pattern.words), [ALL_PINS, 0, 0, ALL_PINS])
+        self.assertEqual(list(pattern.durations), [0.25e-3, 0.75e-3, 1e-3, 1e-3])
+        self.assertRaises(ValueError, pwm_pattern, [1.5], 1e-3)
+        self.assertRaises(ValueError, word_pattern, [1], 0)
+
+class PatternOutputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = emulate_gpio_registers()
+        self.registers = GPIORegisters(self.path)
+        self.gpios = [GPIO(4, backend=self.registers), GPIO(17, backend=self.registers)]
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def play(self, gpios, pattern, repeat):
+        output = PatternOutput(gpios, pattern, repeat)
+        output.start()
+        output.join()
+        return output
+
+    def test_registers(self):
+        words = self.registers.words
+        start = time()
+        output = self.play(self.gpios, word_pattern([1 << 4, (1 << 17) | (1 << 5)], 1e-3), 3)
+        self.assertGreaterEqual(time() - start, 5e-3)
+        self.assertEqual(output.status, 'stopped')
+        self.assertEqual(output.count, 6)
+        self.assertEqual(words[GPSET0], 1 << 17)
+        self.assertEqual(words[GPCLR0], 1 << 4)
+        self.assertLessEqual(output.missed, output.count)
+        self.assertGreaterEqual(output.max_lateness, output.mean_lateness)
+
+    def test_python_fallback(self):
+        gpiocore = pida.patterns.gpiocore
+        pida.patterns.gpiocore = None
+        try:
+            output = self.play(self.gpios[:1], bit_pattern([1, 0, 1], 1e-4), 2)
+            self.assertEqual(output.count, 6)
+            self.assertEqual(self.registers.words[GPSET0], 1 << 4)
+        finally:
+            pida.patterns.gpiocore = gpiocore
+
+    def test_sysfs(self):
+        root = emulate_gpio([18])
+        try:
+            gpio = GPIO(18, root)
+            self.play([gpio], bit_pattern([0, 1], 1e-4), 2)
+            self.assertEqual(gpio.status.value, '1')
+            gpio.close()
+            self.assertRaises(ValueError, PatternOutput, [gpio, GPIO(4, root)],
+                              bit_pattern([1], 1e-3))
+        finally:
+            shutil.rmtree(root)
+
+    def test_stop(self):
+        output = PatternOutput(self.gpios, clock_pattern(10000))
+        output.start()
+        output.stop()
+        output.join(1)
+        self.assertFalse(output.is_alive())
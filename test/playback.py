@@ -0,0 +1,71 @@
+import unittest
+from pida.clock import sleep, time
+from pida.converters import MCP4802
+from pida.emulation import EmulatedSPIDataLink, emulate
+from pida.interfaces import OutputChannel
+from pida.playback import WaveformPlayback
+import pida.playback
+from datalinks import RecordingDataLink, DescriptorDataLink
+
+class FakePlay(object):
+    """Stands for pida.sampling.play and records its calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, fd, frames, frame_size, start, period, number, count, stats, margin):
+        self.calls.append((start, period, number, count))
+        return count
+
+class PlaybackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.link = RecordingDataLink()
+        self.channel = OutputChannel(MCP4802(2.048, self.link), 1)
+
+    def test_frame_table(self):
+        playback = WaveformPlayback(self.channel, [0.0, 1.024, 3.0], 1000)
+        self.assertEqual(playback.codes, [0, 128, 255])
+        self.assertEqual(playback.frames, b'\xB0\x00\xB8\x00\xBF\xF0')
+        self.assertRaises(ValueError, WaveformPlayback, self.channel, [], 1000)
+        self.assertRaises(ValueError, WaveformPlayback, self.channel, [0.0], 0)
+
+    def test_play_once(self):
+        start = time()
+        playback = self.channel.play([0.0, 1.024, 2.048], 1000, loop=False)
+        playback.join()
+        self.assertGreaterEqual(time() - start, 2e-3)
+        self.assertEqual(playback.status, 'stopped')
+        self.assertEqual(playback.count, 3)
+        self.assertEqual(self.link.requests, [[0xB0, 0x00], [0xB8, 0x00], [0xBF, 0xF0]])
+        self.assertEqual(self.link.opened, 0)
+        self.assertEqual(playback.timing.count, 3)
+        self.assertLessEqual(playback.underruns, 3)
+
+    def test_loop(self):
+        link = EmulatedSPIDataLink(emulate(MCP4802(2.048)), overhead=0)
+        dac = MCP4802(2.048, link)
+        playback = OutputChannel(dac, 0).play([0.5, 1.5], 2000)
+        sleep(time() + 0.02)
+        playback.stop()
+        playback.join(1)
+        self.assertFalse(playback.is_alive())
+        self.assertGreater(playback.count, 2)
+        self.assertEqual(link.device.writes, playback.count)
+        self.assertEqual(link.device.codes[0], playback.codes[(playback.count - 1) % 2])
+
+    def test_native_blocks_continue_the_schedule(self):
+        fake = FakePlay()
+        saved = pida.playback.play
+        pida.playback.play = fake
+        try:
+            channel = OutputChannel(MCP4802(2.048, DescriptorDataLink()), 0)
+            playback = channel.play([0.0, 1.0, 2.0], 20, loop=False)
+            playback.join()
+        finally:
+            pida.playback.play = saved
+        self.assertEqual([call[2:] for call in fake.calls], [(0, 2), (2, 1)])
+        starts = set(call[0] for call in fake.calls)
+        self.assertEqual(len(starts), 1)
+        self.assertTrue(isinstance(starts.pop(), (int, long)))
+        self.assertEqual(playback.count, 3)
@@ -0,0 +1,51 @@
+import threading
+import unittest
+import warnings
+import pida.scheduling
+from pida.realtime import RealtimeProfile
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.acquisitions import SynchronousAcquisition
+from datalinks import ChannelEchoDataLink
+
+class RecordingProfile(RealtimeProfile):
+    """Harmless profile that records the thread it is applied to."""
+
+    def __init__(self):
+        RealtimeProfile.__init__(self, pida.scheduling.SCHED_OTHER, 0,
+                                 pida.scheduling.get_affinity()[:1], lock_memory=False)
+        self.threads = []
+
+    def apply(self):
+        self.threads.append(threading.current_thread())
+        RealtimeProfile.apply(self)
+
+class RealtimeProfileTest(unittest.TestCase):
+
+    def test_priority_within_range(self):
+        profile = RealtimeProfile(pida.scheduling.SCHED_FIFO, 1000)
+        self.assertEqual(profile.priority,
+                         pida.scheduling.get_priority_range(pida.scheduling.SCHED_FIFO)[1])
+        self.assertEqual(len(profile.cpus), 1)
+
+    def test_failure_warns(self):
+        profile = RealtimeProfile(pida.scheduling.SCHED_OTHER, 0, [1000], lock_memory=False)
+        self.assertRaises(OSError, profile.apply)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            self.assertFalse(profile.try_apply())
+        self.assertEqual(caught[0].category, RuntimeWarning)
+
+    def test_applied_to_sampling_thread(self):
+        profile = RecordingProfile()
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=5, realtime=profile)
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(profile.threads, [acquisition])
+        self.assertEqual(len(acquisition.get_data()), 5)
+
+    def test_default_profile(self):
+        acquisition = SynchronousAcquisition(None, realtime=True)
+        self.assertEqual(acquisition.realtime.policy, pida.scheduling.SCHED_FIFO)
+        self.assertTrue(SynchronousAcquisition(None).realtime is None)
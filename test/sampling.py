@@ -0,0 +1,132 @@
+import os
+import unittest
+from array import array
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.sampling import sample, play
+from pida.statistics import COUNT
+import pida.acquisitions
+from datalinks import NativeDataLink
+
+class SampleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.times = array('d', [0.0]) * 4
+        self.codes = array('i', [0]) * 4
+
+    def test_no_samples(self):
+        self.assertEqual(sample(-1, b'\x01\x80\x00', 0, 0xFFF, 0, 0.5, 2,
+                                self.times, self.codes, 0, 0), 0)
+
+    def test_not_an_spi_device(self):
+        fd = os.open(os.devnull, os.O_RDWR)
+        try:
+            self.assertRaises(IOError, sample, fd, b'\x01\x80\x00', 0, 0xFFF, 0, 0.0, 0,
+                              self.times, self.codes, 0, 1)
+        finally:
+            os.close(fd)
+
+    def test_buffers_mismatch(self):
+        self.assertRaises(ValueError, sample, -1, b'\x01\x80\x00', 0, 0xFFF, 0, 0.0, 0,
+                          self.times, self.codes[:2], 0, 1)
+
+    def test_stats_too_short(self):
+        self.assertRaises(ValueError, sample, -1, b'\x01\x80\x00', 0, 0xFFF, 0, 0.0, 0,
+                          self.times, self.codes, 0, 1, array('d', [0.0]) * 8)
+
+    def test_negative_sample_number(self):
+        self.assertRaises(ValueError, sample, -1, b'\x01\x80\x00', 0, 0xFFF, 0, 0.0, -1,
+                          self.times, self.codes, 0, 1)
+
+class PlayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = array('d', [0.0]) * 32
+
+    def test_no_frames(self):
+        self.assertEqual(play(-1, b'\x30\x00', 2, 0, 0.5, 3, 0, self.stats), 0)
+
+    def test_not_an_spi_device(self):
+        fd = os.open(os.devnull, os.O_RDWR)
+        try:
+            self.assertRaises(IOError, play, fd, b'\x30\x00', 2, 0, 0.0, 0, 1, self.stats)
+        finally:
+            os.close(fd)
+
+    def test_partial_frames(self):
+        self.assertRaises(ValueError, play, -1, b'\x30\x00\x30', 2, 0, 0.0, 0, 1, self.stats)
+
+    def test_stats_too_short(self):
+        self.assertRaises(ValueError, play, -1, b'\x30\x00', 2, 0, 0.0, 0, 1,
+                          array('d', [0.0]) * 8)
+
+class FakeSample(object):
+    """Stands for pida.sampling.sample: sample n is code n taken at n
+    microseconds."""
+
+    def __init__(self, link):
+        self.link = link
+        self.calls = []
+        self.taken = 0
+
+    def __call__(self, fd, request, shift, mask, start, period, number, times, codes,
+                 first, count, stats, nanoseconds, margin):
+        assert self.link.held
+        assert number == self.taken
+        self.calls.append((fd, start, first, count, nanoseconds))
+        for i in range(count):
+            index = (first + i) % len(codes)
+            times[index] = self.taken * 1000 if nanoseconds else self.taken * 1e-6
+            codes[index] = self.taken
+            self.taken += 1
+        stats[COUNT] += count
+        return count
+
+class NativeEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.link = NativeDataLink()
+        self.channel = InputChannel(MCP3202(4096, self.link), 0)
+        self.sample = FakeSample(self.link)
+        self.saved = pida.acquisitions.sample, pida.acquisitions.NATIVE_BLOCK_SIZE
+        pida.acquisitions.sample = self.sample
+        pida.acquisitions.NATIVE_BLOCK_SIZE = 4
+
+    def tearDown(self):
+        pida.acquisitions.sample, pida.acquisitions.NATIVE_BLOCK_SIZE = self.saved
+
+    def acquire(self, **kwargs):
+        acquisition = pida.acquisitions.SynchronousAcquisition(self.channel, **kwargs)
+        acquisition.start()
+        acquisition.join()
+        return acquisition
+
+    def test_ring_wraparound(self):
+        acquisition = self.acquire(max_count=25, capacity=10)
+        self.assertEqual(acquisition.count, 25)
+        self.assertEqual(list(acquisition.get_data().codes()), range(15, 25))
+        self.assertEqual([call[2:4] for call in self.sample.calls],
+                         [(0, 4), (4, 4), (8, 4), (2, 4), (6, 4), (0, 4), (4, 1)])
+        self.assertEqual(acquisition.timing.count, 25)
+        self.assertFalse(self.link.held)
+
+    def test_nanosecond_start_time(self):
+        acquisition = self.acquire(max_count=6, nanoseconds=True)
+        starts = set(call[1] for call in self.sample.calls)
+        self.assertEqual(starts, set([acquisition._start_ns]))
+        self.assertTrue(all(call[4] for call in self.sample.calls))
+        self.assertEqual(list(acquisition.get_data().times_ns()), range(0, 6000, 1000))
+
+    def test_start_time_in_nanoseconds(self):
+        acquisition = self.acquire(max_count=6)
+        starts = set(call[1] for call in self.sample.calls)
+        self.assertEqual(starts, set([acquisition._start_ns]))
+        self.assertFalse(any(call[4] for call in self.sample.calls))
+
+    def test_publishes_between_blocks(self):
+        blocks = []
+        acquisition = pida.acquisitions.SynchronousAcquisition(self.channel, max_count=12)
+        acquisition.on_block(6, lambda block: blocks.append(list(block.codes())))
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(blocks, [range(6), range(6, 12)])
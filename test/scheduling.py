@@ -5,3 +5,18 @@ class SchedulingTest(unittest.TestCase):
 
     def test_get_priority_range(self):
         min_priority, max_priority = pida.scheduling.get_priority_range(pida.scheduling.SCHED_OTHER)
+
+    def test_thread_policy(self):
+        policy, priority = pida.scheduling.get_thread_policy()
+        pida.scheduling.set_thread_policy(policy, priority)
+        self.assertEqual(pida.scheduling.get_thread_policy(), (policy, priority))
+
+    def test_affinity(self):
+        cpus = pida.scheduling.get_affinity()
+        self.assertTrue(cpus)
+        pida.scheduling.set_affinity(cpus[:1])
+        try:
+            self.assertEqual(pida.scheduling.get_affinity(), cpus[:1])
+        finally:
+            pida.scheduling.set_affinity(cpus)
+        self.assertRaises(ValueError, pida.scheduling.set_affinity, [-1])
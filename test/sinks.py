@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from threading import Event
+from pida.converters import MCP3002, MCP3202
+from pida.interfaces import InputChannel
+from pida.acquisitions import ScanAcquisition, SynchronousAcquisition
+from pida.decimation import Decimator
+from pida.emulation import DC, EmulatedSPIDataLink, emulate
+from pida.sinks import MappedFileSink, MappedFileReader, MAX_COLUMNS
+from datalinks import ChannelEchoDataLink, CountingDataLink
+
+class SlowMappedFileSink(MappedFileSink):
+    """Holds the writer thread until the acquisition finishes."""
+
+    def __init__(self, *args, **kwargs):
+        MappedFileSink.__init__(self, *args, **kwargs)
+        self.finished = Event()
+
+    def _store(self, times, codes):
+        self.finished.wait()
+        MappedFileSink._store(self, times, codes)
+
+    def close(self):
+        self.finished.set()
+        MappedFileSink.close(self)
+
+class MappedFileSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'capture.dat')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        adc = MCP3202(3.3, ChannelEchoDataLink(100))
+        sink = MappedFileSink(self.filename, capacity=20, chunk_size=4)
+        acquisition = ScanAcquisition([InputChannel(adc, 0), InputChannel(adc, 1)],
+                                      max_count=25, sampling_rate=10000, sinks=[sink])
+        acquisition.start()
+        acquisition.join()
+
+        self.assertEqual((sink.count, sink.dropped), (20, 5))
+        with MappedFileReader(self.filename) as reader:
+            self.assertEqual(reader.columns[0].converter, 'MCP3202')
+            self.assertEqual((reader.columns[0].vref, reader.columns[0].bits), (3.3, 12))
+            self.assertEqual(reader.sampling_rate, 10000.0)
+            self.assertEqual(reader.channel_ids, [0, 1])
+            self.assertEqual(len(reader), 20)
+            self.assertEqual(list(reader.times), list(acquisition.get_data().times()[:20]))
+            self.assertEqual(list(reader.codes(0)), [102] * 20)
+            self.assertEqual(list(reader.codes(1)), [103] * 20)
+
+    def test_writer_behind_the_ring_buffer(self):
+        adc = MCP3202(3.3, CountingDataLink())
+        sink = SlowMappedFileSink(self.filename, capacity=50, chunk_size=5)
+        acquisition = ScanAcquisition([InputChannel(adc, 0)], max_count=50,
+                                      capacity=20, sinks=[sink])
+        acquisition.start()
+        acquisition.join()
+
+        with MappedFileReader(self.filename) as reader:
+            self.assertEqual(list(reader.codes(0)), range(50))
+
+    def test_mixed_converters(self):
+        adc0 = MCP3002(3.3, ChannelEchoDataLink(0))
+        adc1 = MCP3202(5.0, ChannelEchoDataLink(0))
+        sink = MappedFileSink(self.filename, capacity=10, chunk_size=4)
+        acquisition = ScanAcquisition([InputChannel(adc0, 1), InputChannel(adc1, 0)],
+                                      max_count=10, sinks=[sink])
+        acquisition.start()
+        acquisition.join()
+
+        with MappedFileReader(self.filename) as reader:
+            self.assertEqual(reader.columns, [(1, 'MCP3002', 3.3, 10, 1), (0, 'MCP3202', 5.0, 12, 1)])
+            self.assertEqual(reader.to_volts(512, 0), 1.65)
+            self.assertEqual(reader.to_volts(2048, 1), 2.5)
+
+    def test_decimated_round_trip(self):
+        adc = MCP3202(3.3)
+        adc.data_link = EmulatedSPIDataLink(emulate(adc, [DC(1.0)]), overhead=0)
+        sink = MappedFileSink(self.filename, capacity=5, chunk_size=5)
+        acquisition = SynchronousAcquisition(InputChannel(adc, 0), max_count=5,
+                                             sinks=[sink], decimation=Decimator(16))
+        acquisition.start()
+        acquisition.join()
+
+        with MappedFileReader(self.filename) as reader:
+            self.assertEqual(reader.columns[0].scale, 16)
+            self.assertEqual(list(reader.codes(0)), list(acquisition.get_data().codes()))
+            self.assertAlmostEqual(reader.to_volts(reader.codes(0)[0]),
+                                   acquisition.get_data()[0][1])
+            self.assertAlmostEqual(reader.to_volts(reader.codes(0)[0]), 1.0, places=3)
+
+    def test_close_without_open(self):
+        MappedFileSink(self.filename, capacity=10).close()
+
+    def test_close_after_failed_open(self):
+        adc = MCP3202(3.3, ChannelEchoDataLink(0))
+        sink = MappedFileSink(self.filename, capacity=10)
+        acquisition = ScanAcquisition([InputChannel(adc, 0)] * (MAX_COLUMNS + 1))
+        self.assertRaises(ValueError, sink.open, acquisition)
+        sink.close()
@@ -1,10 +1,14 @@
-import matplotlib.pyplot as plt
+import unittest
+from array import array
 from benchmark import Benchmark
-from pida.clock import time
+from pida.benchmarks import SPI_SPEEDS, hardware_available
 from pida.links import SPIDataLink, SPIDataLinkConfiguration
+from pida.spidev import SpiDev
+from datalinks import EchoDataLink
 
 class SPIDataLinkTest(Benchmark):
 
+    @unittest.skipUnless(hardware_available(), "requires MOSI wired to MISO on SPI 0.0")
     def test_loopback(self):
         request = [
             0xFF, 0xFF, 0xFF, 0xFF, 0xFF, 0xFF,
@@ -15,53 +19,49 @@ class SPIDataLinkTest(Benchmark):
             0xDE, 0xAD, 0xBE, 0xEF, 0xBA, 0xAD,
             0xF0, 0x0D,
         ]
-        max_speeds = [
-            100000, # 100 KHz
-            200000, # 200 KHz
-            500000, # 500 KHz
-            1000000, # 1 MHz
-            2000000, # 2 MHz
-            4000000, # 4 MHz
-            8000000, # 8 MHz
-            16000000, # 16 MHz
-            32000000, # 32 MHz
-            48000000, # 48 MHz
-            64000000, # 64 MHz
-        ]
-        for max_speed in max_speeds:
+        failed = []
+        for max_speed in SPI_SPEEDS + [int(64e6)]:
             configuration = SPIDataLinkConfiguration(0, max_speed)
             with SPIDataLink(0, 0, configuration) as link:
-                response = link.transfer(request)
-                print('{}: {}'.format(max_speed, response == request))
+                if link.transfer(request) != request:
+                    failed.append(max_speed)
+        self.assertEqual(failed, [])
+
+    def test_request_rate(self):
+        rates = self.run_benchmark('spi_request_rate')
+        self.assertEqual(sorted(rates), SPI_SPEEDS)
+        # Faster clocks never make requests noticeably slower
+        self.assertTrue(rates[SPI_SPEEDS[-1]] > 0.9 * rates[SPI_SPEEDS[0]])
+
+class SpiDevTest(unittest.TestCase):
+
+    def test_io_lock(self):
+        spi = SpiDev()
+        spi.acquire()
+        spi.release()
+        self.assertRaises(RuntimeError, spi.release)
+        # The lock is free again for close
+        spi.close()
+
+class TransferIntoTest(unittest.TestCase):
+
+    def test_generic_fallback(self):
+        link = EchoDataLink()
+        for response in [bytearray(4), array('B', [0] * 4)]:
+            link.transfer_into(b'\x01\x80\xff', response)
+            self.assertEqual(list(response), [2, 0x81, 0, 0])
+        link.transfer_into(array('B', [7]), response)
+        self.assertEqual(link.requests, [[1, 0x80, 0xFF], [1, 0x80, 0xFF], [7]])
 
-    
-    def _test_average_time_between_requests(self, request, n_samples, max_speed_hz):
-        configuration = SPIDataLinkConfiguration(0, max_speed_hz)
-        with SPIDataLink(0, 0, configuration) as link:
-            start = time()
-            for _ in range(n_samples):
-                link.transfer(request)
-            end = time()
-        return (end - start) / n_samples
-    
-    def test_average_time_between_requests(self):
-        request = [0x00] * 3
-        n_samples = 10000
-        max_speeds = [
-            int(100e3),
-            int(200e3),
-            int(500e3),
-            int(1e6),
-            int(2e6),
-            int(4e6),
-            int(8e6),
-            int(16e6),
-            int(32e6),
-            int(48e6),]
+    def test_generic_fallback_short_response(self):
+        link = EchoDataLink()
+        self.assertRaises(ValueError, link.transfer_into, b'\x01\x80\x00', bytearray(2))
+        self.assertEqual(link.requests, [])
 
-        averages = [1 / self._test_average_time_between_requests(request, n_samples, max_speed) for max_speed in max_speeds]
-        plt.plot(max_speeds, averages, 'o-')
-        plt.xlabel('Frecuencia reloj SPI (Hz)')
-        plt.ylabel('Peticiones promedio por segundo')
-        plt.grid(True)
-        plt.show()
+    def test_spidev_buffers(self):
+        link = SPIDataLink(0, 0, SPIDataLinkConfiguration(0, 1000000))
+        self.assertRaises(ValueError, link.transfer_into, b'\x01\x80\x00', bytearray(2))
+        self.assertRaises(OverflowError, link.transfer_into, b'', bytearray(2))
+        self.assertRaises(BufferError, link.transfer_into, b'\x01', b'\x00')
+        # Not open: the buffers are accepted and the transfer fails
+        self.assertRaises(IOError, link.transfer_into, bytearray(3), array('B', [0] * 3))
@@ -0,0 +1,95 @@
+import unittest
+import random
+from pida.statistics import TimingStatistics, RunningStatistics
+
+class TimingStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stats = TimingStatistics(1000, bins=4)
+
+    def test_empty(self):
+        self.assertEqual(self.stats.count, 0)
+        self.assertEqual(self.stats.mean_lateness, 0.0)
+        self.assertEqual(self.stats.jitter, 0.0)
+        self.assertEqual(self.stats.achieved_rate, 0.0)
+        self.assertTrue(self.stats.is_sustainable())
+
+    def test_record(self):
+        self.stats.record(1e-6, 2e-4, 7e-4, False, 0.0)
+        self.stats.record(3e-6, 3e-4, 6e-4, False, 0.001)
+        self.stats.record(0.5, 2e-3, 0.0, True, 0.002)
+        self.assertEqual(self.stats.count, 3)
+        self.assertAlmostEqual(self.stats.mean_lateness, (0.5 + 4e-6) / 3)
+        self.assertEqual(self.stats.max_lateness, 0.5)
+        self.assertEqual(self.stats.overruns, 1)
+        self.assertAlmostEqual(self.stats.transfer_time, 2.5e-3)
+        self.assertAlmostEqual(self.stats.sleep_time, 1.3e-3)
+        self.assertAlmostEqual(self.stats.achieved_rate, 1000)
+        self.assertEqual(self.stats.requested_rate, 1000)
+        self.assertFalse(self.stats.is_sustainable())
+
+    def test_histogram(self):
+        for lateness in [0.0, 0.5e-6, 1.5e-6, 3e-6, 1.0, -1e-6]:
+            self.stats.record(lateness, 0.0, 0.0, False, 0.0)
+        self.assertEqual(self.stats.histogram,
+                         [(1e-6, 3), (2e-6, 1), (4e-6, 1), (float('inf'), 1)])
+
+    def test_jitter(self):
+        for lateness in [1e-3, 3e-3]:
+            self.stats.record(lateness, 0.0, 0.0, False, 0.0)
+        self.assertAlmostEqual(self.stats.jitter, 1e-3)
+        self.assertTrue(self.stats.is_sustainable(3e-3))
+        self.assertFalse(self.stats.is_sustainable(2e-3))
+
+    def test_snapshot(self):
+        self.stats.record(1e-6, 0.0, 0.0, False, 0.0)
+        snapshot = self.stats.snapshot()
+        self.stats.record(1e-6, 0.0, 0.0, False, 0.0)
+        self.assertEqual(snapshot.count, 1)
+        self.assertEqual(snapshot.requested_rate, 1000)
+        self.assertEqual(self.stats.count, 2)
+
+    def test_positive_bins(self):
+        self.assertRaises(ValueError, TimingStatistics, 0, 0)
+
+class RunningStatisticsTest(unittest.TestCase):
+
+    def check(self, stats, values):
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / len(values)
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, mean)
+        self.assertAlmostEqual(stats.variance, variance)
+        self.assertAlmostEqual(stats.rms, (sum(value * value for value in values) / len(values)) ** 0.5)
+        self.assertEqual(stats.min, min(values))
+        self.assertEqual(stats.max, max(values))
+
+    def test_empty(self):
+        stats = RunningStatistics()
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(stats.std, 0.0)
+        self.assertEqual(stats.rms, 0.0)
+
+    def test_cumulative(self):
+        values = [random.uniform(-1, 3) for _ in range(500)]
+        stats = RunningStatistics()
+        stats.update(values)
+        self.check(stats, values)
+
+    def test_window(self):
+        values = [random.uniform(0, 3.3) for _ in range(500)]
+        stats = RunningStatistics(50)
+        for end, value in enumerate(values, 1):
+            stats.add(value)
+            if end % 37 == 0:
+                self.check(stats, values[max(end - 50, 0):end])
+        self.assertEqual(stats.total, 500)
+
+    def test_snapshot(self):
+        stats = RunningStatistics(3)
+        stats.update([1.0, 2.0, 3.0])
+        snapshot = stats.snapshot()
+        stats.add(10.0)
+        self.assertEqual(snapshot.max, 3.0)
+        self.assertEqual(stats.max, 10.0)
+        self.assertEqual(stats.min, 2.0)
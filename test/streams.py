@@ -0,0 +1,114 @@
+import select
+import threading
+import unittest
+from pida.buffers import SampleBuffer
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.acquisitions import SynchronousAcquisition
+from pida.streams import BlockStream, DROP_NEWEST, BLOCK
+from datalinks import ChannelEchoDataLink
+
+class FakeAcquisition(object):
+    channels = [None]
+
+    def stop(self):
+        pass
+
+def feed(stream, n_samples, first=0):
+    buffer = SampleBuffer(n_samples)
+    for i in range(first, first + n_samples):
+        buffer.append(i * 0.5, i)
+    stream.write(buffer.view())
+
+class BlockStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+
+    def test_fixed_size_blocks(self):
+        stream = BlockStream(10)
+        acquisition = SynchronousAcquisition(self.channel, max_count=25, sinks=[stream])
+        acquisition.start()
+        blocks = list(stream)
+        self.assertEqual([block.index for block in blocks], [0, 1])
+        self.assertEqual([len(block.times) for block in blocks], [10, 10])
+        self.assertEqual(list(blocks[1].codes[0]), [2] * 10)
+        self.assertEqual(blocks[1].times.tolist(), acquisition.get_data()[10:20].times().tolist())
+
+    def test_drop_oldest(self):
+        stream = BlockStream(2, max_blocks=2)
+        stream.open(FakeAcquisition())
+        feed(stream, 8)
+        stream.close()
+        self.assertEqual(stream.dropped, 2)
+        self.assertEqual([list(block.codes[0]) for block in stream], [[4, 5], [6, 7]])
+
+    def test_drop_newest(self):
+        stream = BlockStream(2, max_blocks=2, policy=DROP_NEWEST)
+        stream.open(FakeAcquisition())
+        feed(stream, 7)
+        stream.close()
+        self.assertEqual(stream.dropped, 1)
+        self.assertEqual([block.index for block in stream], [0, 1])
+
+    def test_block_policy_waits_for_consumer(self):
+        stream = BlockStream(1, max_blocks=1, policy=BLOCK)
+        stream.open(FakeAcquisition())
+        producer = threading.Thread(target=feed, args=(stream, 3))
+        producer.start()
+        self.assertEqual([stream.get().index for _ in range(3)], [0, 1, 2])
+        producer.join()
+        self.assertEqual(stream.dropped, 0)
+
+    def test_get_timeout(self):
+        stream = BlockStream(1)
+        self.assertTrue(stream.get(0.01) is None)
+
+    def test_channel_stream(self):
+        stream = self.channel.stream(1000, 5)
+        first = stream.get()
+        stream.stop()
+        rest = list(stream)
+        self.assertEqual(len(first.times), 5)
+        self.assertEqual(stream.acquisition.status, 'stopped')
+        self.assertEqual([block.index for block in rest], list(range(1, len(rest) + 1)))
+
+    def test_event_loop_serves_several_streams(self):
+        channels = [InputChannel(MCP3202(4096, ChannelEchoDataLink(offset)), 0)
+                    for offset in (0, 10)]
+        streams = [BlockStream(5) for _ in channels]
+        for channel, stream in zip(channels, streams):
+            SynchronousAcquisition(channel, max_count=20, sampling_rate=1000,
+                                   sinks=[stream]).start()
+        codes = {}
+        pending = list(streams)
+        while pending:
+            ready, _, _ = select.select(pending, [], [], 1)
+            self.assertTrue(ready)
+            for stream in ready:
+                block = stream.get_nowait()
+                if block is not None:
+                    codes.setdefault(stream, []).extend(block.codes[0])
+                elif stream.finished:
+                    pending.remove(stream)
+        self.assertEqual(codes[streams[0]], [2] * 20)
+        self.assertEqual(codes[streams[1]], [12] * 20)
+
+    def test_fileno_readiness(self):
+        stream = BlockStream(2)
+        stream.open(FakeAcquisition())
+        fd = stream.fileno()
+        self.assertEqual(select.select([fd], [], [], 0)[0], [])
+        feed(stream, 4)
+        self.assertEqual(select.select([fd], [], [], 0)[0], [fd])
+        self.assertEqual(stream.get_nowait().index, 0)
+        self.assertEqual(stream.get_nowait().index, 1)
+        self.assertTrue(stream.get_nowait() is None)
+        self.assertFalse(stream.finished)
+        self.assertEqual(select.select([fd], [], [], 0)[0], [])
+        stream.close()
+        self.assertEqual(select.select([fd], [], [], 0)[0], [fd])
+        self.assertTrue(stream.finished)
+
+    def test_invalid_policy(self):
+        self.assertRaises(ValueError, BlockStream, 10, policy='ignore')
@@ -0,0 +1,44 @@
+import unittest
+from pida.clock import time, time_ns
+from pida.timers import PrecisionTimer, calibrate, default_timer
+from pida.converters import MCP3202
+from pida.interfaces import InputChannel
+from pida.acquisitions import SynchronousAcquisition
+from datalinks import ChannelEchoDataLink
+
+class PrecisionTimerTest(unittest.TestCase):
+
+    def test_calibrate(self):
+        margin = calibrate(20, 1e-4)
+        self.assertTrue(0 <= margin < 0.1)
+        self.assertRaises(ValueError, calibrate, 0)
+
+    def test_never_wakes_early(self):
+        timer = PrecisionTimer(200e-6)
+        for _ in range(20):
+            request = time() + 1e-3
+            timer.sleep(request)
+            self.assertTrue(time() >= request)
+            request = time_ns() + 1000000
+            timer.sleep_until_ns(request)
+            self.assertTrue(time_ns() >= request)
+
+    def test_past_deadline(self):
+        PrecisionTimer(1e-3).sleep(0.0)
+        PrecisionTimer(1e-3).sleep_until_ns(0)
+
+    def test_margin(self):
+        self.assertRaises(ValueError, PrecisionTimer, -1)
+        timer = PrecisionTimer(0)
+        timer.margin = 1e-4
+        self.assertEqual(timer.margin, 1e-4)
+        self.assertTrue(default_timer() is default_timer())
+
+    def test_precise_acquisition(self):
+        channel = InputChannel(MCP3202(4096, ChannelEchoDataLink(0)), 0)
+        acquisition = SynchronousAcquisition(channel, max_count=20, sampling_rate=1000,
+                                             precise=PrecisionTimer(500e-6))
+        acquisition.start()
+        acquisition.join()
+        self.assertEqual(len(acquisition.get_data()), 20)
+        self.assertEqual(acquisition.timing.count, 20)
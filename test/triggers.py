@@ -0,0 +1,28 @@
+import unittest
+from pida.triggers import LevelTrigger, SlopeTrigger, WindowTrigger, RISING, FALLING, BOTH
+
+class TriggerTest(unittest.TestCase):
+
+    def test_level(self):
+        codes = [0, 5, 10, 5, 0]
+        self.assertEqual(LevelTrigger(10).find(codes), 2)
+        self.assertEqual(LevelTrigger(5, FALLING).find(codes), 3)
+        self.assertEqual(LevelTrigger(3, BOTH).find(codes[2:]), 2)
+        self.assertEqual(LevelTrigger(0, RISING).find(codes), -1)
+
+    def test_level_uses_previous_code(self):
+        self.assertEqual(LevelTrigger(10).find([10, 12]), -1)
+        self.assertEqual(LevelTrigger(10).find([10, 12], previous=9), 0)
+
+    def test_slope(self):
+        codes = [0, 2, 10, 11, 1]
+        self.assertEqual(SlopeTrigger(5).find(codes), 2)
+        self.assertEqual(SlopeTrigger(-5).find(codes), 4)
+        self.assertRaises(ValueError, SlopeTrigger, 0)
+
+    def test_window(self):
+        trigger = WindowTrigger(10, 20)
+        self.assertEqual(trigger.find([15, 20, 21, 15]), 2)
+        self.assertEqual(trigger.find([5, 15, 25], previous=5), 2)
+        self.assertEqual(trigger.find([10, 20]), -1)
+        self.assertRaises(ValueError, WindowTrigger, 20, 10)